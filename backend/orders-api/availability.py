@@ -0,0 +1,188 @@
+'''
+Business: Индекс занятости исполнителей по дням и поиск свободных окон под заявку
+Args: conn - соединение psycopg2, диапазон дат и длительность работ в минутах
+Returns: Список окон {date, time, free_executors[, executor_ids]} по дате и времени
+
+Рабочий день делится на SCHEDULE_SLOTS слотов по SCHEDULE_SLOT_MINUTES минут начиная
+с SCHEDULE_DAY_START часов (по умолчанию 09:00-21:00 по часу, как в форме записи).
+Слот занят, если в executor_calendar есть строка с is_available = false или с order_id,
+либо на исполнителя (executor_id) назначена неотменённая заявка на это время.
+Индекс хранит на каждый день и слот битовую маску свободных исполнителей (бит j -
+executor_ids[j]); дни без занятых слотов ссылаются на общий кортеж "все свободны".
+Свободные на окно из слотов i..i+k-1 - это AND k масок, то есть запрос по 100
+исполнителям на 60 дней - около 700 окон по несколько AND целых чисел.
+
+Индекс строится одним проходом по БД на тёплом инстансе и живёт SCHEDULE_INDEX_TTL
+секунд; записи через orders-api сбрасывают его сразу (invalidate). Другие инстансы
+увидят чужие записи не позже чем через TTL - окно из индекса - это подсказка,
+окончательно слот закрепляется записью в БД.
+'''
+
+import os
+import threading
+import time
+from datetime import date, timedelta
+from typing import Dict, Any, List, Optional, Tuple
+
+SCHEMA = 't_p78209571_electric_service_aut'
+
+DAY_START_HOUR = int(os.environ.get('SCHEDULE_DAY_START', '9'))
+SLOTS_PER_DAY = int(os.environ.get('SCHEDULE_SLOTS', '12'))
+SLOT_MINUTES = int(os.environ.get('SCHEDULE_SLOT_MINUTES', '60'))
+HORIZON_DAYS = int(os.environ.get('SCHEDULE_HORIZON_DAYS', '90'))
+INDEX_TTL_SECONDS = float(os.environ.get('SCHEDULE_INDEX_TTL', '60'))
+MAX_RANGE_DAYS = 366
+
+FULL_DAY = (1 << SLOTS_PER_DAY) - 1
+
+SLOT_TIMES = tuple(
+    f'{(DAY_START_HOUR * 60 + i * SLOT_MINUTES) // 60:02d}:{(DAY_START_HOUR * 60 + i * SLOT_MINUTES) % 60:02d}'
+    for i in range(SLOTS_PER_DAY)
+)
+SLOT_BY_TIME = {slot_time: i for i, slot_time in enumerate(SLOT_TIMES)}
+
+def slot_index(value: Any) -> Optional[int]:
+    '''Номер слота для '10:00', '10:00:00' или datetime.time; None - вне сетки'''
+    if value is None:
+        return None
+    text = value.strftime('%H:%M') if hasattr(value, 'strftime') else str(value).strip()[:5]
+    return SLOT_BY_TIME.get(text)
+
+def mask_to_ids(mask: int, executor_ids: List[int]) -> List[int]:
+    ids = []
+    while mask:
+        low = mask & -mask
+        ids.append(executor_ids[low.bit_length() - 1])
+        mask ^= low
+    return ids
+
+class AvailabilityIndex:
+    '''Свободные исполнители: date -> маска по слотам, бит j - executor_ids[j] свободен'''
+    def __init__(self, ttl_seconds: float = INDEX_TTL_SECONDS):
+        self.ttl_seconds = ttl_seconds
+        self.executor_ids: List[int] = []
+        self.position: Dict[int, int] = {}
+        self.all_free: Tuple[int, ...] = ()
+        self.free: Dict[date, Tuple[int, ...]] = {}
+        self.range: Optional[Tuple[date, date]] = None
+        self.expires_at = 0.0
+        self.build_ms = 0.0
+        self._lock = threading.Lock()
+        self.stats: Dict[str, int] = {'hits': 0, 'builds': 0, 'invalidations': 0}
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self.expires_at = 0.0
+            self.stats['invalidations'] += 1
+
+    def ensure(self, conn, date_from: date, date_to: date) -> bool:
+        '''Перестраивает индекс, если он устарел или не покрывает диапазон; True - был готов'''
+        with self._lock:
+            fresh = time.monotonic() < self.expires_at
+            if fresh and self.range and self.range[0] <= date_from and date_to <= self.range[1]:
+                self.stats['hits'] += 1
+                return True
+            today = date.today()
+            self._build(conn, min(date_from, today), max(date_to, today + timedelta(days=HORIZON_DAYS)))
+            return False
+
+    def _build(self, conn, range_from: date, range_to: date) -> None:
+        started = time.perf_counter()
+        cur = conn.cursor()
+        cur.execute(f"SELECT id FROM {SCHEMA}.executors WHERE is_active ORDER BY id")
+        executor_ids = [row[0] for row in cur.fetchall()]
+        cur.execute(f"""
+            SELECT executor_id, date, time_slot FROM {SCHEMA}.executor_calendar
+            WHERE date BETWEEN %s AND %s AND (NOT is_available OR order_id IS NOT NULL)
+            UNION ALL
+            SELECT executor_id, scheduled_date, to_char(scheduled_time, 'HH24:MI') FROM {SCHEMA}.orders
+            WHERE executor_id IS NOT NULL AND scheduled_date BETWEEN %s AND %s
+              AND scheduled_time IS NOT NULL AND status <> 'cancelled'
+        """, (range_from, range_to, range_from, range_to))
+        rows = cur.fetchall()
+        cur.close()
+        conn.commit()
+
+        self.load(executor_ids, rows)
+        self.range = (range_from, range_to)
+        self.expires_at = time.monotonic() + self.ttl_seconds
+        self.build_ms = round((time.perf_counter() - started) * 1000, 2)
+        self.stats['builds'] += 1
+
+    def load(self, executor_ids: List[int], busy_rows: List[Tuple[int, date, Any]]) -> None:
+        '''busy_rows - занятые слоты (executor_id, date, time_slot); дни без них свободны у всех'''
+        position = {executor_id: i for i, executor_id in enumerate(executor_ids)}
+        all_free = (1 << len(executor_ids)) - 1
+        free: Dict[date, List[int]] = {}
+        for executor_id, day, slot_time in busy_rows:
+            slot = slot_index(slot_time)
+            if slot is None or executor_id not in position:
+                continue
+            if day not in free:
+                free[day] = [all_free] * SLOTS_PER_DAY
+            free[day][slot] &= ~(1 << position[executor_id])
+
+        self.executor_ids = executor_ids
+        self.position = position
+        self.all_free = (all_free,) * SLOTS_PER_DAY
+        self.free = {day: tuple(masks) for day, masks in free.items()}
+
+    def day_masks(self, day: date) -> Tuple[int, ...]:
+        '''Маски свободных исполнителей по слотам дня; бит executor - position[executor_id]'''
+        return self.free.get(day, self.all_free)
+
+    def find_slots(self, date_from: date, date_to: date, length: int,
+                   executor_ids: Optional[List[int]] = None, limit: Optional[int] = None,
+                   with_executors: bool = False) -> List[Dict[str, Any]]:
+        '''Окна из length слотов подряд: {date, time, free_executors[, executor_ids]}'''
+        index_ids, all_free, free = self.executor_ids, self.all_free, self.free
+        wanted = all_free[0] if all_free else 0
+        if executor_ids is not None:
+            wanted_ids = set(executor_ids)
+            wanted = sum(1 << i for i, executor_id in enumerate(index_ids) if executor_id in wanted_ids)
+        slots: List[Dict[str, Any]] = []
+        if not wanted:
+            return slots
+
+        last_start = SLOTS_PER_DAY - length
+        day = date_from
+        while day <= date_to:
+            masks = free.get(day, all_free)
+            day_text = day.isoformat()
+            for start in range(last_start + 1):
+                # Исполнитель подходит, если свободен во всех слотах окна
+                mask = wanted
+                for slot in range(start, start + length):
+                    mask &= masks[slot]
+                if not mask:
+                    continue
+                window = {'date': day_text, 'time': SLOT_TIMES[start], 'free_executors': bin(mask).count('1')}
+                if with_executors:
+                    window['executor_ids'] = mask_to_ids(mask, index_ids)
+                slots.append(window)
+                if limit and len(slots) >= limit:
+                    return slots
+            day += timedelta(days=1)
+        return slots
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return dict(
+                self.stats,
+                executors=len(self.executor_ids),
+                range=[self.range[0].isoformat(), self.range[1].isoformat()] if self.range else None,
+                build_ms=self.build_ms
+            )
+
+_index = AvailabilityIndex()
+
+def get_availability_index() -> AvailabilityIndex:
+    return _index
+
+def duration_slots(duration_minutes: int) -> int:
+    if duration_minutes <= 0:
+        raise ValueError('duration must be positive')
+    length = -(-duration_minutes // SLOT_MINUTES)
+    if length > SLOTS_PER_DAY:
+        raise ValueError(f'duration exceeds working day ({SLOTS_PER_DAY * SLOT_MINUTES} minutes)')
+    return length
@@ -0,0 +1,140 @@
+'''
+Business: Подбор ближайшего свободного исполнителя к заявке по координатам
+Args: conn - соединение psycopg2, координаты заявки, маски свободных слотов из availability.py
+Returns: Кандидатов {executor_id, name, rating, distance_km, free_slots, score}, лучший первым
+
+Активные исполнители с current_location_lat/lng раскладываются по сетке ячеек
+DISPATCH_GRID_CELL_KM км. Поиск идёт кольцами ячеек от ячейки заявки наружу, гаверсинус
+считается только для исполнителей в просмотренных ячейках. Поиск останавливается, когда
+набрано DISPATCH_CANDIDATES свободных исполнителей и следующее кольцо заведомо дальше
+последнего из них, или когда кольцо вышло за DISPATCH_MAX_KM.
+
+Ближайшие кандидаты ранжируются по score (меньше - лучше):
+    distance_km / DISPATCH_MAX_KM + DISPATCH_RATING_WEIGHT * (5 - rating) / 5
+    - DISPATCH_FREE_WEIGHT * доля свободных слотов исполнителя в день заявки
+
+Сетка строится на тёплом инстансе и живёт DISPATCH_INDEX_TTL секунд.
+'''
+
+import math
+import os
+import threading
+import time
+from typing import Dict, Any, List, Optional, Tuple, Callable
+
+SCHEMA = 't_p78209571_electric_service_aut'
+
+GRID_CELL_KM = float(os.environ.get('DISPATCH_GRID_CELL_KM', '5'))
+MAX_DISTANCE_KM = float(os.environ.get('DISPATCH_MAX_KM', '50'))
+CANDIDATES = int(os.environ.get('DISPATCH_CANDIDATES', '10'))
+RATING_WEIGHT = float(os.environ.get('DISPATCH_RATING_WEIGHT', '0.3'))
+FREE_WEIGHT = float(os.environ.get('DISPATCH_FREE_WEIGHT', '0.2'))
+INDEX_TTL_SECONDS = float(os.environ.get('DISPATCH_INDEX_TTL', '60'))
+
+EARTH_RADIUS_KM = 6371.0
+KM_PER_DEGREE_LAT = 111.32
+
+def haversine_km(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    d_phi = phi2 - phi1
+    d_lambda = math.radians(lng2 - lng1)
+    a = math.sin(d_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+class ExecutorGrid:
+    '''Ячейка (i, j) -> [(executor_id, lat, lng)]; шаг по долготе подобран под широту исполнителей'''
+    def __init__(self, cell_km: float = GRID_CELL_KM, ttl_seconds: float = INDEX_TTL_SECONDS):
+        self.cell_km = cell_km
+        self.ttl_seconds = ttl_seconds
+        self.lat_step = cell_km / KM_PER_DEGREE_LAT
+        self.lng_step = self.lat_step
+        self.cells: Dict[Tuple[int, int], List[Tuple[int, float, float]]] = {}
+        self.executors: Dict[int, Dict[str, Any]] = {}
+        self.expires_at = 0.0
+        self._lock = threading.Lock()
+        self.stats: Dict[str, int] = {'hits': 0, 'builds': 0}
+
+    def ensure(self, conn) -> bool:
+        with self._lock:
+            if time.monotonic() < self.expires_at:
+                self.stats['hits'] += 1
+                return True
+            cur = conn.cursor()
+            cur.execute(f"""
+                SELECT id, name, rating, current_location_lat, current_location_lng FROM {SCHEMA}.executors
+                WHERE is_active AND current_location_lat IS NOT NULL AND current_location_lng IS NOT NULL
+            """)
+            rows = cur.fetchall()
+            cur.close()
+            conn.commit()
+            self.load(rows)
+            self.expires_at = time.monotonic() + self.ttl_seconds
+            self.stats['builds'] += 1
+            return False
+
+    def load(self, rows: List[Tuple[int, str, Any, Any, Any]]) -> None:
+        '''rows - (id, name, rating, lat, lng)'''
+        executors = {
+            row[0]: {'executor_id': row[0], 'name': row[1], 'rating': float(row[2] or 0),
+                     'lat': float(row[3]), 'lng': float(row[4])}
+            for row in rows
+        }
+        # Ячейка примерно квадратная на средней широте; на других широтах города разница мала
+        mean_lat = sum(item['lat'] for item in executors.values()) / len(executors) if executors else 0.0
+        lng_step = self.lat_step / max(math.cos(math.radians(mean_lat)), 0.01)
+        cells: Dict[Tuple[int, int], List[Tuple[int, float, float]]] = {}
+        for item in executors.values():
+            key = (math.floor(item['lat'] / self.lat_step), math.floor(item['lng'] / lng_step))
+            cells.setdefault(key, []).append((item['executor_id'], item['lat'], item['lng']))
+
+        self.lng_step = lng_step
+        self.cells = cells
+        self.executors = executors
+
+    def nearest(self, lat: float, lng: float, count: int = CANDIDATES, max_km: float = MAX_DISTANCE_KM,
+                accept: Optional[Callable[[int], bool]] = None) -> List[Tuple[float, int]]:
+        '''До count ближайших (distance_km, executor_id) в радиусе max_km, прошедших accept'''
+        cells = self.cells
+        center_i, center_j = math.floor(lat / self.lat_step), math.floor(lng / self.lng_step)
+        found: List[Tuple[float, int]] = []
+        max_ring = int(max_km // self.cell_km) + 1
+        for ring in range(max_ring + 1):
+            # Всё в кольце ring не ближе (ring - 1) ячеек от точки заявки
+            if len(found) >= count and (ring - 1) * self.cell_km > found[count - 1][0]:
+                break
+            for i in range(center_i - ring, center_i + ring + 1):
+                edge = i in (center_i - ring, center_i + ring)
+                for j in (range(center_j - ring, center_j + ring + 1) if edge else (center_j - ring, center_j + ring)):
+                    for executor_id, executor_lat, executor_lng in cells.get((i, j), ()):
+                        if accept is not None and not accept(executor_id):
+                            continue
+                        distance = haversine_km(lat, lng, executor_lat, executor_lng)
+                        if distance <= max_km:
+                            found.append((distance, executor_id))
+            found.sort()
+        return found[:count]
+
+_grid = ExecutorGrid()
+
+def get_executor_grid() -> ExecutorGrid:
+    return _grid
+
+def rank_candidates(grid: ExecutorGrid, nearest: List[Tuple[float, int]],
+                    free_slots: Callable[[int], int], slots_per_day: int) -> List[Dict[str, Any]]:
+    '''free_slots(executor_id) - сколько слотов у исполнителя свободно в день заявки'''
+    ranked = []
+    for distance, executor_id in nearest:
+        executor = grid.executors[executor_id]
+        free = free_slots(executor_id)
+        score = (distance / MAX_DISTANCE_KM + RATING_WEIGHT * (5 - executor['rating']) / 5
+                 - FREE_WEIGHT * free / slots_per_day)
+        ranked.append({
+            'executor_id': executor_id,
+            'name': executor['name'],
+            'rating': executor['rating'],
+            'distance_km': round(distance, 2),
+            'free_slots': free,
+            'score': round(score, 4)
+        })
+    ranked.sort(key=lambda item: item['score'])
+    return ranked
@@ -6,212 +6,1182 @@ Returns: HTTP response с данными заявок или результат
 
 Endpoints:
 - GET / - получить все заявки (с фильтрами)
-- GET /?id=ORD-123 - получить заявку по ID
-- POST / - создать новую заявку
-- PUT /?id=ORD-123 - обновить заявку
+- GET /?limit=50&cursor=...&fields=id,order_uid,status - постраничная выдача
+  (keyset по created_at, id); ответ {orders, next_cursor}
+- GET /?format=ndjson|csv&date_from=2025-01-01&date_to=2025-01-31 - выгрузка заявок
+  серверным курсором порциями по EXPORT_CHUNK_SIZE строк (gzip при Accept-Encoding: gzip).
+  Ответ функции собирается в памяти целиком, поэтому тело ограничено EXPORT_MAX_BYTES
+  (ORDERS_EXPORT_MAX_BYTES, по умолчанию 3 МБ - под лимит ответа платформы): большая
+  выгрузка прерывается с 413, её нужно делить по date_from/date_to
+- GET /?id=ORD-123 - получить заявку по ID; повторные запросы отдаются из кэша инстанса
+  (order_cache.py, заголовок X-Order-Cache: hit|miss), запись заявки сбрасывает её из кэша
+- GET /?cache=stats - счётчики кэша заявок этого инстанса: hits, misses, evictions... (только admin/owner)
+- GET /?q=иванов ленина&limit=20&offset=0 - поиск по фрагментам имени клиента, телефона
+  и адреса (search.py), лучшие совпадения первыми; ответ {orders, next_offset}.
+  Фильтры status/assigned_to и fields работают как в постраничной выдаче
+- GET /?since=2025-11-06T10:00:00 - только заявки, изменённые после момента;
+  ответ {orders, next_since, has_more}, next_since передаётся в следующий опрос
+- GET /?id=, полный список, постраничная выдача и since= отдают ETag и отвечают 304
+  на совпадающий If-None-Match. Для заявки и полного списка версия проверяется до чтения
+  строк; страница и since= сначала читаются (по индексу), ETag - хэш отданного тела
+- GET /?slots=true&date_from=2025-11-10&date_to=2025-11-20&duration=120 - свободные окна
+  активных исполнителей (необязательно executor_id=1,2, limit и executors=true - со списком
+  исполнителей на окно); ответ {slots: [{date, time, free_executors[, executor_ids]}]},
+  считается по индексу занятости в памяти инстанса (availability.py)
+- GET /?report=categories|monthly&date_from=...&date_to=... - выручка по категориям позиций
+  и заявки/розетки/выручка по месяцам (только admin/owner)
+- GET /?report=daily|statuses|executors&date_from=...&date_to=... - выручка по дням, заявки
+  по статусам и выполнение по исполнителям из сводки order_daily_summary, которую ведёт
+  триггер на orders (только admin/owner)
+- GET /?history=true&id=ORD-123 - лента смен статуса заявки из order_status_history
+  со временем в каждом статусе (seconds; у текущего статуса - до сих пор)
+- GET /?report=status_times&date_from=...&date_to=... - сколько заявки находятся в каждом
+  статусе: число выходов из статуса, среднее, p50/p90/p95 и максимум в секундах и сколько
+  заявок в статусе сейчас (только admin/owner)
+- POST / - создать новую заявку; позиции пишутся в order_services в той же транзакции,
+  сумма и total_* пересчитываются на сервере по прайсу services (pricing.py). Позиции,
+  которых нет в прайсе, считаются по цене клиента: их названия - в unpriced_items ответа
+  и в логе, число - в orders.unpriced_items (заявку нужно перепроверить)
+- POST /?batch=true - массовый импорт: JSON-массив или NDJSON, upsert по order_uid
+  в одной транзакции; ответ с отчётом по строкам, не прошедшим валидацию, и unpriced -
+  заявками с позициями не из прайса
+- POST /?assign=true&id=ORD-123[&duration=120&dry_run=true] - назначить ближайшего
+  свободного исполнителя по координатам заявки (dispatch.py); ответ с рейтингом кандидатов
+- PUT /?id=ORD-123 - обновить заявку (в т.ч. executor_id, scheduled_date, scheduled_time,
+  location_lat, location_lng). Исполнитель и время бронируются в executor_calendar в той же
+  транзакции (reservations.py), duration - длительность брони в минутах (без неё перенос
+  сохраняет число занятых заявкой слотов); занятый слот - 409 со списком конфликтов. version в теле - ожидаемая версия заявки, иначе 409
 - DELETE /?id=ORD-123 - удалить заявку
+
+Каждая смена статуса (POST, пакетный импорт, PUT) пишется в order_status_history в той же
+транзакции (status_history.py); status_comment в теле PUT - комментарий к смене.
+
+Авторизация: подписанный токен telegram-auth в X-Auth-Token или Authorization: Bearer
+проверяется локально (session_token.py), без запроса в БД. Исполнитель видит только
+заявки с assigned_to = uid, клиенту список заявок недоступен, admin/owner видят все.
+Без токена запросы обслуживаются как раньше, пока не задан ORDERS_API_REQUIRE_AUTH=true, -
+кроме report, history, cache и assign: им токен admin/owner (history - и executor) нужен всегда.
+Автоназначение пишет в assigned_to uid исполнителя: tg_<telegram_id> связанного пользователя
+(executors.user_id) или самого исполнителя.
 '''
 
 import json
 import os
+import base64
+import hashlib
+import csv
+import io
+import zlib
 import psycopg2
 import psycopg2.extras
-from typing import Dict, Any, List, Optional
-from pydantic import BaseModel, Field
-from datetime import datetime
-
-class OrderItem(BaseModel):
-    name: str
-    price: float
-    quantity: int
-    category: Optional[str] = None
-    description: Optional[str] = None
-
-class CreateOrderRequest(BaseModel):
-    order_uid: str = Field(..., min_length=1)
-    customer_name: str
-    customer_phone: str
-    customer_email: Optional[str] = None
-    address: str
-    scheduled_date: Optional[str] = None
-    scheduled_time: Optional[str] = None
-    items: List[OrderItem]
-    total_price: float
-    total_switches: int = 0
-    total_outlets: int = 0
-    total_points: int = 0
-    estimated_cable: int = 0
-    estimated_frames: int = 0
-    status: str = 'new'
-    assigned_to: Optional[str] = None
-    assigned_to_name: Optional[str] = None
-    client_notes: Optional[str] = None
+from psycopg2.extras import execute_values
+from typing import Dict, Any, List, Optional, TYPE_CHECKING
+from datetime import datetime, date, timedelta
+from db import get_pool, DISCONNECT_ERRORS
+from session_token import verify_token, token_from_headers, TokenError
+from availability import get_availability_index, duration_slots, slot_index, SLOT_MINUTES, SLOT_TIMES, SLOTS_PER_DAY, MAX_RANGE_DAYS
+from pricing import get_service_catalog, price_items
+from reservations import lock_order, held_slots, release_slots, reserve_slots, SlotConflict
+from dispatch import get_executor_grid, rank_candidates, MAX_DISTANCE_KM
+from status_history import lock_statuses, record_status_changes, STATUS_HISTORY_TABLE
+from search import build_search_query, SEARCH_VECTOR_COLUMN, SEARCH_CANDIDATES
+from order_cache import get_order_cache
+from core import json_response, raw_json_response, error_response, options_response, json_dumps, CORS_HEADERS
+
+if TYPE_CHECKING:
+    from order_models import CreateOrderRequest
+
+ORDERS_TABLE = 't_p78209571_electric_service_aut.orders'
+
+ORDER_COLUMNS = (
+    'id', 'order_uid', 'client_id', 'executor_id', 'status',
+    'customer_name', 'customer_phone', 'customer_email',
+    'address', 'location_lat', 'location_lng',
+    'scheduled_date', 'scheduled_time', 'preferred_date', 'time_slot',
+    'items', 'total_price', 'total_switches', 'total_outlets', 'total_points',
+    'estimated_cable', 'estimated_frames', 'unpriced_items',
+    'assigned_to', 'assigned_to_name', 'client_notes',
+    'payment_status', 'paid_amount', 'payments',
+    'planfix_task_id', 'google_task_id', 'created_at', 'updated_at', 'version'
+)
+
+# NUMERIC отдаётся строкой ("1500.00"), как Decimal через core.json_dumps
+NUMERIC_COLUMNS = ('location_lat', 'location_lng', 'total_price', 'paid_amount')
+
+# Фильтры выборок (order_filters); у заявки в кэше хранятся их значения
+ORDER_FILTER_FIELDS = ('status', 'assigned_to')
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+ORDER_INSERT_COLUMNS = (
+    'order_uid', 'customer_name', 'customer_phone', 'customer_email',
+    'address', 'scheduled_date', 'scheduled_time', 'items', 'total_price',
+    'total_switches', 'total_outlets', 'total_points', 'estimated_cable', 'estimated_frames', 'unpriced_items',
+    'status', 'assigned_to', 'assigned_to_name', 'client_notes'
+)
+
+EXPORT_CHUNK_SIZE = 1000
+EXPORT_MAX_BYTES = int(os.environ.get('ORDERS_EXPORT_MAX_BYTES', str(3 * 1024 * 1024)))
+EXPORT_FORMATS = {
+    'ndjson': 'application/x-ndjson; charset=utf-8',
+    'csv': 'text/csv; charset=utf-8'
+}
+
+MAX_BATCH_SIZE = 5000
+BATCH_PAGE_SIZE = 500
+
+REQUIRE_AUTH = os.environ.get('ORDERS_API_REQUIRE_AUTH', 'false').lower() == 'true'
+ORDER_LIST_ROLES = ('executor', 'admin', 'owner')
+DISPATCH_ROLES = ('admin', 'owner')
+REPORT_ROLES = ('admin', 'owner')
+REPORTS = ('categories', 'monthly', 'daily', 'statuses', 'executors', 'status_times')
+SUMMARY_REPORTS = ('daily', 'statuses', 'executors')
+
+ORDER_SERVICES_TABLE = 't_p78209571_electric_service_aut.order_services'
+DAILY_SUMMARY_TABLE = 't_p78209571_electric_service_aut.order_daily_summary'
+EXECUTORS_TABLE = 't_p78209571_electric_service_aut.executors'
+USERS_TABLE = 't_p78209571_electric_service_aut.users'
+ORDER_LINE_COLUMNS = ('order_id', 'service_id', 'name', 'category', 'quantity', 'price', 'slots', 'line_total', 'notes')
+
+ETAG_HEADERS = {'Access-Control-Expose-Headers': 'ETag', 'Cache-Control': 'no-cache'}
 
 def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     method: str = event.get('httpMethod', 'GET')
     query_params = event.get('queryStringParameters', {}) or {}
     
     if method == 'OPTIONS':
-        return {
-            'statusCode': 200,
-            'headers': {
-                'Access-Control-Allow-Origin': '*',
-                'Access-Control-Allow-Methods': 'GET, POST, PUT, DELETE, OPTIONS',
-                'Access-Control-Allow-Headers': 'Content-Type, Authorization',
-                'Access-Control-Max-Age': '86400'
-            },
-            'body': '',
-            'isBase64Encoded': False
-        }
+        return options_response('GET, POST, PUT, DELETE, OPTIONS', 'Content-Type, Authorization, X-Auth-Token, If-None-Match')
     
     database_url = os.environ.get('DATABASE_URL')
     if not database_url:
-        return {
-            'statusCode': 500,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'error': 'DATABASE_URL not configured'}),
-            'isBase64Encoded': False
-        }
+        return error_response(500, 'DATABASE_URL not configured')
     
     try:
-        conn = psycopg2.connect(database_url)
-        
-        if method == 'GET':
-            result = handle_get(conn, query_params)
-        elif method == 'POST':
-            body_data = json.loads(event.get('body', '{}'))
-            result = handle_post(conn, body_data)
-        elif method == 'PUT':
-            body_data = json.loads(event.get('body', '{}'))
-            result = handle_put(conn, query_params, body_data)
-        elif method == 'DELETE':
-            result = handle_delete(conn, query_params)
-        else:
-            result = {
-                'statusCode': 405,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                'body': json.dumps({'error': 'Method not allowed'}),
-                'isBase64Encoded': False
-            }
-        
-        conn.close()
-        return result
+        claims = authenticate(event.get('headers') or {})
+    except TokenError as e:
+        return error_response(401, str(e))
+    except RuntimeError as e:
+        return error_response(500, str(e))
+    
+    # Свободные окна не раскрывают чужих заявок - их может смотреть и клиент
+    if method == 'GET' and claims and claims['role'] not in ORDER_LIST_ROLES and query_params.get('slots') != 'true':
+        return error_response(403, f"Orders are not available for role {claims['role']}")
+    # У отчётов, ленты статусов, счётчиков кэша и автоназначения нет прежних анонимных
+    # клиентов - токен с нужной ролью обязателен и без ORDERS_API_REQUIRE_AUTH
+    for requested, roles, name in (
+        (query_params.get('report'), REPORT_ROLES, 'Reports'),
+        (query_params.get('cache'), REPORT_ROLES, 'Cache stats'),
+        (method == 'GET' and query_params.get('history') == 'true', ORDER_LIST_ROLES, 'Order history'),
+        (query_params.get('assign') == 'true', DISPATCH_ROLES, 'Dispatch')
+    ):
+        if requested and not claims:
+            return error_response(401, 'Authentication required')
+        if requested and claims['role'] not in roles:
+            return error_response(403, f"{name} is not available for role {claims['role']}")
+    if method == 'GET' and claims and claims['role'] == 'executor':
+        # Исполнитель видит только свои заявки, что бы ни пришло в assigned_to
+        query_params = dict(query_params, assigned_to=claims['uid'])
+    
+    # Автор смены статуса для order_status_history
+    actor = f"{claims['role']}:{claims['uid']}" if claims else 'orders-api'
+    
+    pool = get_pool(database_url)
+    
+    try:
+        conn, reused = pool.acquire()
+    except Exception as e:
+        return error_response(500, f'Server error: {str(e)}')
+    
+    try:
+        try:
+            result = route_request(conn, method, event, query_params, actor)
+        except DISCONNECT_ERRORS:
+            # Соединение из пула могло умереть между вызовами; безопасно повторяем только чтение
+            if not reused or method != 'GET':
+                raise
+            conn = pool.discard(conn)
+            reused = False
+            result = route_request(conn, method, event, query_params, actor)
         
+        pool.release(conn)
     except Exception as e:
-        return {
-            'statusCode': 500,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'error': f'Server error: {str(e)}'}),
-            'isBase64Encoded': False
-        }
-
-def handle_get(conn, query_params: Dict[str, Any]) -> Dict[str, Any]:
-    cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+        pool.release(conn, broken=isinstance(e, DISCONNECT_ERRORS))
+        return error_response(500, f'Server error: {str(e)}')
     
+    stats = pool.snapshot()
+    print(f"DB pool: {'hit' if reused else 'miss'}, connect_ms={stats['last_connect_ms']}, "
+          f"hits={stats['hits']}, misses={stats['misses']}, reconnects={stats['reconnects']}")
+    result['headers']['X-Db-Pool'] = 'hit' if reused else 'miss'
+    if not reused:
+        result['headers']['X-Db-Connect-Ms'] = str(stats['last_connect_ms'])
+    return result
+
+def route_request(conn, method: str, event: Dict[str, Any], query_params: Dict[str, Any], actor: str = 'orders-api') -> Dict[str, Any]:
+    if method == 'GET':
+        if query_params.get('slots') == 'true':
+            return handle_slots(conn, query_params)
+        if query_params.get('history') == 'true':
+            return handle_history(conn, query_params)
+        if query_params.get('q'):
+            return handle_search(conn, query_params)
+        if query_params.get('report'):
+            return handle_report(conn, query_params)
+        if query_params.get('cache') == 'stats':
+            return json_response(200, get_order_cache().snapshot())
+        if query_params.get('format') in EXPORT_FORMATS:
+            return handle_export(conn, query_params, event.get('headers') or {})
+        return handle_get(conn, query_params, event.get('headers') or {})
+    elif method == 'POST':
+        if query_params.get('batch') == 'true':
+            return handle_batch_post(conn, event.get('body') or '', actor)
+        if query_params.get('assign') == 'true':
+            return handle_assign(conn, query_params)
+        body_data = json.loads(event.get('body', '{}'))
+        return handle_post(conn, body_data, actor)
+    elif method == 'PUT':
+        body_data = json.loads(event.get('body', '{}'))
+        return handle_put(conn, query_params, body_data, actor)
+    elif method == 'DELETE':
+        return handle_delete(conn, query_params)
+    else:
+        return error_response(405, 'Method not allowed')
+
+def handle_get(conn, query_params: Dict[str, Any], headers: Dict[str, str]) -> Dict[str, Any]:
     order_id = query_params.get('id')
-    status = query_params.get('status')
-    assigned_to = query_params.get('assigned_to')
+    if_none_match = get_header(headers, 'If-None-Match')
     
     if order_id:
+        cache = get_order_cache()
+        cached = cache.get(order_id)
+        if cached and order_matches_filters(cached.fields, query_params):
+            if if_none_match and etag_matches(if_none_match, cached.etag):
+                return not_modified(cached.etag)
+            return raw_json_response(200, cached.body, dict(ETAG_HEADERS, ETag=cached.etag, **{'X-Order-Cache': 'hit'}))
+        
+        # Эпоха берётся до чтения: запись, закоммиченная после него, не останется в кэше
+        token = cache.fill_token(order_id)
+        filters_sql, params = order_filters(query_params)
+        cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+        
+        if if_none_match:
+            # Дешёвая проверка версии до выборки всей строки с JSONB-полями
+            cur.execute(
+                f"SELECT id, updated_at FROM {ORDERS_TABLE} WHERE order_uid = %s{filters_sql}",
+                [order_id] + params
+            )
+            version = cur.fetchone()
+            if version and etag_matches(if_none_match, order_etag(version)):
+                cur.close()
+                return not_modified(order_etag(version))
+        
         cur.execute(
-            "SELECT * FROM t_p78209571_electric_service_aut.orders WHERE order_uid = %s",
-            (order_id,)
+            f"SELECT {', '.join(ORDER_COLUMNS)} FROM {ORDERS_TABLE} WHERE order_uid = %s{filters_sql}",
+            [order_id] + params
         )
         order = cur.fetchone()
         cur.close()
         
-        if order:
-            return {
-                'statusCode': 200,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                'body': json.dumps(dict(order), default=str),
-                'isBase64Encoded': False
-            }
+        if not order:
+            return error_response(404, 'Order not found')
+        
+        body = json_dumps(order)
+        etag = order_etag(order)
+        cache.put(order_id, body, etag, {field: order[field] for field in ORDER_FILTER_FIELDS}, token)
+        return raw_json_response(200, body, dict(ETAG_HEADERS, ETag=etag, **{'X-Order-Cache': 'miss'}))
+    
+    if query_params.get('since') or any(key in query_params for key in ('limit', 'cursor', 'fields')):
+        # Страница и дельта читают по индексу только свои строки - версия считается по отданному
+        # телу, а не max/count по всей выборке, который был бы полным сканированием на каждый запрос
+        if query_params.get('since'):
+            result = handle_get_since(conn, query_params)
         else:
-            return {
-                'statusCode': 404,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                'body': json.dumps({'error': 'Order not found'}),
-                'isBase64Encoded': False
-            }
-    
-    query = "SELECT * FROM t_p78209571_electric_service_aut.orders WHERE 1=1"
-    params = []
+            result = handle_get_page(conn, query_params)
+        if result['statusCode'] != 200:
+            return result
+        etag = body_etag(result['body'])
+        if if_none_match and etag_matches(if_none_match, etag):
+            return not_modified(etag)
+    else:
+        # Полный список и так читает всю выборку: дешёвая проверка версии до сборки JSON
+        etag = list_etag(conn, query_params)
+        if if_none_match and etag_matches(if_none_match, etag):
+            return not_modified(etag)
+        
+        # Полный список собирает в JSON сам Postgres: без разбора строк в Python-объекты
+        # и обратного кодирования (см. bench/bench_serialize.py)
+        filters_sql, params = order_filters(query_params)
+        cur = conn.cursor()
+        cur.execute(
+            f"""
+            SELECT COALESCE(json_agg(o ORDER BY o.created_at DESC, o.id DESC), '[]')::text
+            FROM (SELECT {json_select_list(ORDER_COLUMNS)} FROM {ORDERS_TABLE} WHERE 1=1{filters_sql}) o
+            """,
+            params
+        )
+        body = cur.fetchone()[0]
+        cur.close()
+        
+        result = raw_json_response(200, body)
+    
+    if result['statusCode'] == 200:
+        result['headers'].update(ETAG_HEADERS, ETag=etag)
+    return result
+
+def handle_slots(conn, query_params: Dict[str, Any]) -> Dict[str, Any]:
+    try:
+        date_from = parse_date(query_params.get('date_from'), 'date_from') or date.today()
+        date_to = parse_date(query_params.get('date_to'), 'date_to') or date_from + timedelta(days=13)
+        if date_to < date_from:
+            raise ValueError('date_to must not be earlier than date_from')
+        if (date_to - date_from).days >= MAX_RANGE_DAYS:
+            raise ValueError(f'Date range must not exceed {MAX_RANGE_DAYS} days')
+        duration = parse_int(query_params.get('duration'), 'duration', SLOT_MINUTES)
+        length = duration_slots(duration)
+        executor_ids = parse_ids(query_params.get('executor_id'), 'executor_id')
+        limit = parse_int(query_params.get('limit'), 'limit')
+        if limit is not None and limit < 1:
+            raise ValueError('limit must be positive')
+    except ValueError as e:
+        return error_response(400, str(e))
+    
+    index = get_availability_index()
+    ready = index.ensure(conn, date_from, date_to)
+    with_executors = query_params.get('executors') == 'true' or executor_ids is not None
+    slots = index.find_slots(date_from, date_to, length, executor_ids, limit, with_executors)
+    
+    return json_response(200, {
+        'date_from': date_from.isoformat(),
+        'date_to': date_to.isoformat(),
+        'duration_minutes': duration,
+        'slots': slots
+    }, {'X-Availability-Index': 'hit' if ready else 'miss'})
+
+def handle_report(conn, query_params: Dict[str, Any]) -> Dict[str, Any]:
+    report = query_params['report']
+    if report not in REPORTS:
+        return error_response(400, f"Unknown report: {report}. Available: {', '.join(REPORTS)}")
+    try:
+        date_from = parse_date(query_params.get('date_from'), 'date_from')
+        date_to = parse_date(query_params.get('date_to'), 'date_to')
+    except ValueError as e:
+        return error_response(400, str(e))
+    
+    if report in SUMMARY_REPORTS:
+        return handle_summary_report(conn, report, date_from, date_to)
+    if report == 'status_times':
+        return handle_status_times_report(conn, date_from, date_to)
+    
+    period_sql = ''
+    params: List[Any] = []
+    if date_from:
+        period_sql += " AND o.created_at >= %s"
+        params.append(date_from)
+    if date_to:
+        period_sql += " AND o.created_at < %s"
+        params.append(date_to + timedelta(days=1))
+    
+    cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+    if report == 'categories':
+        cur.execute(f"""
+            SELECT COALESCE(s.category, 'other') AS category, COUNT(DISTINCT s.order_id) AS orders,
+                   SUM(s.quantity) AS quantity, SUM(s.line_total) AS revenue
+            FROM {ORDER_SERVICES_TABLE} s
+            JOIN {ORDERS_TABLE} o ON o.id = s.order_id
+            WHERE o.status <> 'cancelled'{period_sql}
+            GROUP BY 1 ORDER BY revenue DESC NULLS LAST
+        """, params)
+    else:
+        cur.execute(f"""
+            SELECT to_char(date_trunc('month', o.created_at), 'YYYY-MM') AS month, COUNT(*) AS orders,
+                   SUM(o.total_outlets) AS outlets, SUM(o.total_switches) AS switches,
+                   SUM(o.total_price) AS revenue
+            FROM {ORDERS_TABLE} o
+            WHERE o.status <> 'cancelled'{period_sql}
+            GROUP BY 1 ORDER BY 1
+        """, params)
+    rows = cur.fetchall()
+    cur.close()
+    
+    return json_response(200, {'report': report, 'rows': rows})
+
+def handle_summary_report(conn, report: str, date_from: Optional[date], date_to: Optional[date]) -> Dict[str, Any]:
+    '''Отчёты по order_daily_summary: строк в сводке - дни x статусы x исполнители,
+    поэтому запрос не зависит от числа заявок за период'''
+    period_sql = ''
+    params: List[Any] = []
+    if date_from:
+        period_sql += " AND s.day >= %s"
+        params.append(date_from)
+    if date_to:
+        period_sql += " AND s.day <= %s"
+        params.append(date_to)
+    
+    cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+    if report == 'daily':
+        cur.execute(f"""
+            SELECT s.day,
+                   COALESCE(SUM(s.orders) FILTER (WHERE s.status <> 'cancelled'), 0) AS orders,
+                   COALESCE(SUM(s.orders) FILTER (WHERE s.status = 'completed'), 0) AS completed,
+                   COALESCE(SUM(s.orders) FILTER (WHERE s.status = 'cancelled'), 0) AS cancelled,
+                   COALESCE(SUM(s.revenue) FILTER (WHERE s.status <> 'cancelled'), 0) AS revenue
+            FROM {DAILY_SUMMARY_TABLE} s
+            WHERE true{period_sql}
+            GROUP BY s.day HAVING SUM(s.orders) > 0 ORDER BY s.day
+        """, params)
+    elif report == 'statuses':
+        cur.execute(f"""
+            SELECT s.status, SUM(s.orders) AS orders, SUM(s.revenue) AS revenue
+            FROM {DAILY_SUMMARY_TABLE} s
+            WHERE true{period_sql}
+            GROUP BY s.status HAVING SUM(s.orders) > 0 ORDER BY orders DESC
+        """, params)
+    else:
+        cur.execute(f"""
+            SELECT NULLIF(t.executor_id, 0) AS executor_id, e.name, t.orders, t.completed, t.cancelled,
+                   t.completed_revenue,
+                   ROUND(t.completed::numeric / NULLIF(t.orders + t.cancelled, 0), 3) AS completion_rate
+            FROM (
+                SELECT s.executor_id,
+                       COALESCE(SUM(s.orders) FILTER (WHERE s.status <> 'cancelled'), 0) AS orders,
+                       COALESCE(SUM(s.orders) FILTER (WHERE s.status = 'completed'), 0) AS completed,
+                       COALESCE(SUM(s.orders) FILTER (WHERE s.status = 'cancelled'), 0) AS cancelled,
+                       COALESCE(SUM(s.revenue) FILTER (WHERE s.status = 'completed'), 0) AS completed_revenue
+                FROM {DAILY_SUMMARY_TABLE} s
+                WHERE true{period_sql}
+                GROUP BY s.executor_id HAVING SUM(s.orders) > 0
+            ) t
+            LEFT JOIN {EXECUTORS_TABLE} e ON e.id = t.executor_id
+            ORDER BY t.completed DESC, t.orders DESC
+        """, params)
+    rows = cur.fetchall()
+    cur.close()
+    
+    return json_response(200, {'report': report, 'rows': rows})
+
+def handle_status_times_report(conn, date_from: Optional[date], date_to: Optional[date]) -> Dict[str, Any]:
+    '''Время в статусе пишется в строку журнала при выходе из статуса (previous_seconds),
+    период отбирает по моменту выхода. in_status_now - заявки, которые сейчас в статусе'''
+    period_sql = ''
+    params: List[Any] = []
+    if date_from:
+        period_sql += " AND h.created_at >= %s"
+        params.append(date_from)
+    if date_to:
+        period_sql += " AND h.created_at < %s"
+        params.append(date_to + timedelta(days=1))
+    
+    cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+    cur.execute(f"""
+        WITH t AS (
+            SELECT h.previous_status AS status,
+                   COUNT(*) AS transitions,
+                   AVG(h.previous_seconds)::bigint AS avg_seconds,
+                   (percentile_cont(0.5) WITHIN GROUP (ORDER BY h.previous_seconds))::bigint AS p50_seconds,
+                   (percentile_cont(0.9) WITHIN GROUP (ORDER BY h.previous_seconds))::bigint AS p90_seconds,
+                   (percentile_cont(0.95) WITHIN GROUP (ORDER BY h.previous_seconds))::bigint AS p95_seconds,
+                   MAX(h.previous_seconds) AS max_seconds
+            FROM {STATUS_HISTORY_TABLE} h
+            WHERE h.previous_status IS NOT NULL{period_sql}
+            GROUP BY h.previous_status
+        ), now AS (
+            SELECT s.status, SUM(s.orders) AS in_status_now
+            FROM {DAILY_SUMMARY_TABLE} s
+            GROUP BY s.status
+        )
+        SELECT COALESCE(t.status, now.status) AS status, COALESCE(t.transitions, 0) AS transitions,
+               COALESCE(now.in_status_now, 0) AS in_status_now,
+               t.avg_seconds, t.p50_seconds, t.p90_seconds, t.p95_seconds, t.max_seconds
+        FROM t FULL JOIN now ON now.status = t.status
+        WHERE COALESCE(t.transitions, 0) > 0 OR now.in_status_now > 0
+        ORDER BY 1
+    """, params)
+    rows = cur.fetchall()
+    cur.close()
+    
+    return json_response(200, {'report': 'status_times', 'rows': rows})
+
+def handle_history(conn, query_params: Dict[str, Any]) -> Dict[str, Any]:
+    order_uid = query_params.get('id')
+    if not order_uid:
+        return error_response(400, 'Order ID required')
+    
+    filters_sql, params = order_filters(query_params)
+    cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+    cur.execute(
+        f"SELECT id, status FROM {ORDERS_TABLE} WHERE order_uid = %s{filters_sql}",
+        [order_uid] + params
+    )
+    order = cur.fetchone()
+    if not order:
+        cur.close()
+        return error_response(404, 'Order not found')
+    
+    cur.execute(f"""
+        SELECT h.status, h.comment, h.changed_by, h.created_at,
+               EXTRACT(EPOCH FROM COALESCE(LEAD(h.created_at) OVER w, NOW()) - h.created_at)::bigint AS seconds,
+               LEAD(h.created_at) OVER w IS NULL AS current
+        FROM {STATUS_HISTORY_TABLE} h
+        WHERE h.order_id = %s
+        WINDOW w AS (ORDER BY h.created_at, h.id)
+        ORDER BY h.created_at, h.id
+    """, (order['id'],))
+    timeline = cur.fetchall()
+    cur.close()
+    
+    return json_response(200, {'order_uid': order_uid, 'status': order['status'], 'timeline': timeline})
+
+def handle_get_page(conn, query_params: Dict[str, Any]) -> Dict[str, Any]:
+    try:
+        limit = parse_limit(query_params.get('limit'))
+        columns = parse_fields(query_params.get('fields'))
+        after = decode_cursor(query_params.get('cursor'))
+    except ValueError as e:
+        return error_response(400, str(e))
+    
+    filters_sql, params = order_filters(query_params)
+    query = f"SELECT {', '.join(columns)} FROM {ORDERS_TABLE} WHERE 1=1{filters_sql}"
+    
+    if after:
+        query += " AND (created_at, id) < (%s, %s)"
+        params.extend(after)
+    
+    query += " ORDER BY created_at DESC, id DESC LIMIT %s"
+    params.append(limit + 1)
+    
+    cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+    cur.execute(query, params)
+    rows = cur.fetchall()
+    cur.close()
+    
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1]['created_at'], rows[-1]['id'])
+    
+    return json_response(200, {'orders': rows, 'next_cursor': next_cursor})
+
+def handle_search(conn, query_params: Dict[str, Any]) -> Dict[str, Any]:
+    '''Ранжированная выдача по индексу idx_orders_search. Страницы - через offset: ранг
+    считается заново на каждый запрос, keyset по нему не даёт выигрыша'''
+    try:
+        ts_query = build_search_query(query_params['q'])
+        limit = parse_limit(query_params.get('limit'))
+        columns = parse_fields(query_params.get('fields'))
+        offset = int(query_params.get('offset') or 0)
+        if not 0 <= offset < SEARCH_CANDIDATES:
+            raise ValueError(f'offset must be between 0 and {SEARCH_CANDIDATES - 1}')
+    except ValueError as e:
+        return error_response(400, str(e))
+    
+    if ts_query is None:
+        return json_response(200, {'orders': [], 'next_offset': None})
+    
+    filters_sql, params = order_filters(query_params)
+    cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+    cur.execute(
+        f"""
+        SELECT {', '.join(columns)}
+        FROM (
+            SELECT {', '.join(columns)}, {SEARCH_VECTOR_COLUMN}, query
+            FROM {ORDERS_TABLE}, to_tsquery('simple', %s) AS query
+            WHERE {SEARCH_VECTOR_COLUMN} @@ query{filters_sql}
+            ORDER BY created_at DESC, id DESC
+            LIMIT %s
+        ) AS candidates
+        ORDER BY ts_rank_cd({SEARCH_VECTOR_COLUMN}, query) DESC, created_at DESC, id DESC
+        LIMIT %s OFFSET %s
+        """,
+        [ts_query] + params + [SEARCH_CANDIDATES, limit + 1, offset]
+    )
+    rows = cur.fetchall()
+    cur.close()
+    
+    next_offset = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_offset = offset + limit
+    
+    return json_response(200, {'orders': rows, 'next_offset': next_offset})
+
+def handle_get_since(conn, query_params: Dict[str, Any]) -> Dict[str, Any]:
+    since = query_params['since']
+    try:
+        limit = parse_limit(query_params.get('limit') or str(MAX_PAGE_SIZE))
+        columns = parse_fields(query_params.get('fields'))
+        if 'updated_at' not in columns:
+            columns.append('updated_at')
+        try:
+            # next_since из предыдущего ответа: (updated_at, id) последней отданной заявки
+            after = decode_cursor(since)
+        except ValueError:
+            after = None
+        since_at = None if after else datetime.fromisoformat(since)
+    except ValueError as e:
+        return error_response(400, f'Invalid since: {str(e)}')
+    
+    filters_sql, params = order_filters(query_params)
+    query = f"SELECT {', '.join(columns)} FROM {ORDERS_TABLE} WHERE 1=1{filters_sql}"
+    
+    if after:
+        query += " AND (updated_at, id) > (%s, %s)"
+        params.extend(after)
+    else:
+        query += " AND updated_at > %s"
+        params.append(since_at)
+    
+    query += " ORDER BY updated_at, id LIMIT %s"
+    params.append(limit + 1)
+    
+    cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+    cur.execute(query, params)
+    rows = cur.fetchall()
+    cur.close()
+    
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    next_since = encode_cursor(rows[-1]['updated_at'], rows[-1]['id']) if rows else since
+    
+    return json_response(200, {'orders': rows, 'next_since': next_since, 'has_more': has_more})
+
+def order_filters(query_params: Dict[str, Any]) -> tuple:
+    filters_sql = ''
+    params: List[Any] = []
+    
+    for field in ORDER_FILTER_FIELDS:
+        if query_params.get(field):
+            filters_sql += f" AND {field} = %s"
+            params.append(query_params[field])
+    
+    return filters_sql, params
+
+def order_matches_filters(fields: Dict[str, Any], query_params: Dict[str, Any]) -> bool:
+    '''Те же фильтры, что order_filters, для заявки из кэша'''
+    return all(
+        not query_params.get(field) or str(fields.get(field)) == str(query_params[field])
+        for field in ORDER_FILTER_FIELDS
+    )
+
+def authenticate(headers: Dict[str, str]) -> Optional[Dict[str, Any]]:
+    '''Claims токена сессии; None, если токена нет и он не обязателен'''
+    token = token_from_headers(headers)
+    if not token:
+        if REQUIRE_AUTH:
+            raise TokenError('Authentication required')
+        return None
+    return verify_token(token)
+
+def get_header(headers: Dict[str, str], name: str) -> str:
+    name = name.lower()
+    return next((value for key, value in headers.items() if key.lower() == name), '') or ''
+
+def order_etag(order: Dict[str, Any]) -> str:
+    return f'W/"{order["id"]}-{order["updated_at"].timestamp():.6f}"'
+
+def list_etag(conn, query_params: Dict[str, Any]) -> str:
+    '''Версия выборки: max(updated_at) и count(*) по тем же фильтрам + параметры запроса'''
+    filters_sql, params = order_filters(query_params)
+    cur = conn.cursor()
+    cur.execute(f"SELECT max(updated_at), count(*) FROM {ORDERS_TABLE} WHERE 1=1{filters_sql}", params)
+    max_updated_at, total = cur.fetchone()
+    cur.close()
     
-    if status:
-        query += " AND status = %s"
-        params.append(status)
+    version = json.dumps([str(max_updated_at), total, sorted(query_params.items())], default=str)
+    return f'W/"{hashlib.sha1(version.encode()).hexdigest()}"'
+
+def body_etag(body: str) -> str:
+    return f'W/"{hashlib.sha1(body.encode()).hexdigest()}"'
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    candidates = [tag.strip() for tag in if_none_match.split(',')]
+    # Слабое сравнение: W/"x" и "x" считаются одной версией
+    bare = etag[2:] if etag.startswith('W/') else etag
+    return '*' in candidates or any(
+        (tag[2:] if tag.startswith('W/') else tag) == bare for tag in candidates
+    )
+
+def not_modified(etag: str) -> Dict[str, Any]:
+    return {
+        'statusCode': 304,
+        'headers': dict(CORS_HEADERS, **ETAG_HEADERS, ETag=etag),
+        'body': '',
+        'isBase64Encoded': False
+    }
+
+def handle_export(conn, query_params: Dict[str, Any], headers: Dict[str, str]) -> Dict[str, Any]:
+    export_format = query_params['format']
+    try:
+        columns = parse_fields(query_params.get('fields'))
+        date_from = parse_date(query_params.get('date_from'), 'date_from')
+        date_to = parse_date(query_params.get('date_to'), 'date_to')
+    except ValueError as e:
+        return error_response(400, str(e))
     
-    if assigned_to:
-        query += " AND assigned_to = %s"
-        params.append(assigned_to)
+    filters_sql, params = order_filters(query_params)
+    query = f"SELECT {', '.join(columns)} FROM {ORDERS_TABLE} WHERE 1=1{filters_sql}"
     
-    query += " ORDER BY created_at DESC"
+    if date_from:
+        query += " AND created_at >= %s"
+        params.append(date_from)
     
+    if date_to:
+        query += " AND created_at < %s"
+        params.append(date_to + timedelta(days=1))
+    
+    query += " ORDER BY created_at, id"
+    
+    use_gzip = 'gzip' in get_header(headers, 'Accept-Encoding').lower()
+    # wbits=31 - формат gzip; сжимаем каждую порцию сразу, чтобы не держать весь текст выгрузки
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if use_gzip else None
+    # Тело ответа целиком в памяти: сжатое уходит в base64 (+1/3), поэтому лимит делится
+    max_size = EXPORT_MAX_BYTES * 3 // 4 if compressor else EXPORT_MAX_BYTES
+    parts: List[bytes] = []
+    size = 0
+    
+    def emit(text: str) -> bool:
+        '''False - выгрузка превысила лимит тела ответа'''
+        nonlocal size
+        data = text.encode('utf-8')
+        # Z_SYNC_FLUSH на порцию: zlib не копит вывод, и размер тела виден сразу
+        part = compressor.compress(data) + compressor.flush(zlib.Z_SYNC_FLUSH) if compressor else data
+        parts.append(part)
+        size += len(part)
+        return size <= max_size
+    
+    if export_format == 'csv':
+        emit(encode_csv_chunk([columns]))
+    
+    # Именованный курсор - серверный: строки приходят порциями, а не целиком в fetchall
+    cur = conn.cursor(name='orders_export')
+    cur.itersize = EXPORT_CHUNK_SIZE
     cur.execute(query, params)
-    orders = cur.fetchall()
+    exported = 0
+    fits = True
+    while fits:
+        rows = cur.fetchmany(EXPORT_CHUNK_SIZE)
+        if not rows:
+            break
+        exported += len(rows)
+        if export_format == 'csv':
+            fits = emit(encode_csv_chunk(rows))
+        else:
+            fits = emit(''.join(
+                json_dumps(dict(zip(columns, row))) + '\n'
+                for row in rows
+            ))
     cur.close()
+    conn.commit()
+    
+    if compressor and fits:
+        parts.append(compressor.flush())
+        fits = size + len(parts[-1]) <= max_size
+    if not fits:
+        return error_response(413, f'Export is larger than {EXPORT_MAX_BYTES} bytes (stopped at {exported} rows); '
+                                   'narrow it with date_from/date_to or filters')
+    
+    response_headers = {
+        'Content-Type': EXPORT_FORMATS[export_format],
+        'Content-Disposition': f'attachment; filename="orders.{export_format}"',
+        'Access-Control-Allow-Origin': '*',
+        'X-Export-Rows': str(exported)
+    }
+    
+    if compressor:
+        response_headers['Content-Encoding'] = 'gzip'
+        return {
+            'statusCode': 200,
+            'headers': response_headers,
+            'body': base64.b64encode(b''.join(parts)).decode(),
+            'isBase64Encoded': True
+        }
     
     return {
         'statusCode': 200,
-        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-        'body': json.dumps([dict(order) for order in orders], default=str),
+        'headers': response_headers,
+        'body': b''.join(parts).decode('utf-8'),
         'isBase64Encoded': False
     }
 
-def handle_post(conn, body_data: Dict[str, Any]) -> Dict[str, Any]:
+def encode_csv_chunk(rows: List[Any]) -> str:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow([
+            json.dumps(value, ensure_ascii=False) if isinstance(value, (list, dict)) else value
+            for value in row
+        ])
+    return buffer.getvalue()
+
+def json_select_list(columns) -> str:
+    '''Список колонок для json_agg: NUMERIC приводится к text, чтобы формат совпадал с json_dumps'''
+    return ', '.join(f'{name}::text AS {name}' if name in NUMERIC_COLUMNS else name for name in columns)
+
+def parse_date(raw: Optional[str], name: str) -> Optional[date]:
+    if not raw:
+        return None
+    try:
+        return date.fromisoformat(raw)
+    except (TypeError, ValueError):
+        # TypeError - не строка, например число из JSON-тела PUT
+        raise ValueError(f'{name} must be a date in YYYY-MM-DD format')
+
+def parse_int(raw: Optional[str], name: str, default: Optional[int] = None) -> Optional[int]:
+    if not raw:
+        return default
+    try:
+        return int(raw)
+    except ValueError:
+        raise ValueError(f'{name} must be an integer')
+
+def parse_ids(raw: Optional[str], name: str) -> Optional[List[int]]:
+    '''"1,2,3" -> [1, 2, 3]; пустое значение - без фильтра'''
+    if not raw:
+        return None
+    try:
+        return [int(value) for value in raw.split(',')]
+    except ValueError:
+        raise ValueError(f'{name} must be a comma-separated list of integers')
+
+def parse_limit(raw: Optional[str]) -> int:
+    if raw is None or raw == '':
+        return DEFAULT_PAGE_SIZE
+    try:
+        limit = int(raw)
+    except (TypeError, ValueError):
+        raise ValueError('limit must be an integer')
+    if limit < 1:
+        raise ValueError('limit must be positive')
+    return min(limit, MAX_PAGE_SIZE)
+
+def parse_fields(raw: Optional[str]) -> List[str]:
+    if not raw:
+        return list(ORDER_COLUMNS)
+    requested = [name.strip() for name in raw.split(',') if name.strip()]
+    unknown = [name for name in requested if name not in ORDER_COLUMNS]
+    if unknown:
+        raise ValueError(f'Unknown fields: {", ".join(unknown)}')
+    # created_at и id нужны для построения курсора следующей страницы
+    columns = ['id', 'created_at']
+    columns.extend(name for name in requested if name not in columns)
+    return columns
+
+def encode_cursor(created_at: datetime, row_id: int) -> str:
+    raw = json.dumps([created_at.isoformat(), row_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+def decode_cursor(cursor: Optional[str]) -> Optional[tuple]:
+    if not cursor:
+        return None
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        created_at, row_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return datetime.fromisoformat(created_at), int(row_id)
+    except Exception:
+        raise ValueError('Invalid cursor')
+
+def handle_post(conn, body_data: Dict[str, Any], actor: str = 'orders-api') -> Dict[str, Any]:
+    from order_models import CreateOrderRequest
+    
     try:
         order_req = CreateOrderRequest(**body_data)
     except Exception as e:
-        return {
-            'statusCode': 400,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'error': f'Validation error: {str(e)}'}),
-            'isBase64Encoded': False
-        }
+        return error_response(400, f'Validation error: {str(e)}')
     
-    cur = conn.cursor()
+    catalog = get_service_catalog()
+    catalog.ensure(conn)
+    try:
+        lines, totals = price_items([item.dict() for item in order_req.items], catalog)
+    except ValueError as e:
+        return error_response(400, str(e))
+    log_unpriced(order_req.order_uid, totals['unpriced_items'])
     
-    items_json = json.dumps([item.dict() for item in order_req.items])
+    cur = conn.cursor()
     
-    cur.execute("""
+    cur.execute(f"""
         INSERT INTO t_p78209571_electric_service_aut.orders (
-            order_uid, customer_name, customer_phone, customer_email,
-            address, scheduled_date, scheduled_time, items, total_price,
-            total_switches, total_outlets, total_points, estimated_cable, estimated_frames,
-            status, assigned_to, assigned_to_name, client_notes,
-            created_at, updated_at
+            {', '.join(ORDER_INSERT_COLUMNS)}, created_at, updated_at
         ) VALUES (
-            %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, NOW(), NOW()
+            {', '.join(['%s'] * len(ORDER_INSERT_COLUMNS))}, NOW(), NOW()
         ) RETURNING id
-    """, (
-        order_req.order_uid, order_req.customer_name, order_req.customer_phone, order_req.customer_email,
-        order_req.address, order_req.scheduled_date, order_req.scheduled_time, items_json, order_req.total_price,
-        order_req.total_switches, order_req.total_outlets, order_req.total_points, 
-        order_req.estimated_cable, order_req.estimated_frames,
-        order_req.status, order_req.assigned_to, order_req.assigned_to_name, order_req.client_notes
-    ))
+    """, order_values(order_req, lines, totals))
     
     order_id = cur.fetchone()[0]
+    insert_order_lines(cur, [(order_id, lines)])
+    record_status_changes(cur, [(order_id, order_req.status, None)], actor)
     conn.commit()
     cur.close()
     
-    return {
-        'statusCode': 201,
-        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-        'body': json.dumps({'success': True, 'id': order_id, 'order_uid': order_req.order_uid}),
-        'isBase64Encoded': False
-    }
+    return json_response(201, {
+        'success': True,
+        'id': order_id,
+        'order_uid': order_req.order_uid,
+        'total_price': totals['total_price'],
+        'unpriced_items': totals['unpriced_items']
+    })
+
+def log_unpriced(order_uid: str, names: List[str]) -> None:
+    # Цену этих позиций задал клиент - заявку нужно перепроверить (orders.unpriced_items > 0)
+    if names:
+        print(f"Order {order_uid}: {len(names)} items not in services, client price used: {', '.join(names)}")
+
+def order_values(order_req: 'CreateOrderRequest', lines: List[Dict[str, Any]], totals: Dict[str, Any]) -> tuple:
+    # В items цена позиции - та, по которой посчитан итог (из прайса, если услуга в нём есть)
+    items_json = json.dumps([
+        dict(item.dict(), price=float(line['price']), service_id=line['service_id'])
+        for item, line in zip(order_req.items, lines)
+    ])
+    return (
+        order_req.order_uid, order_req.customer_name, order_req.customer_phone, order_req.customer_email,
+        order_req.address, order_req.scheduled_date, order_req.scheduled_time, items_json, totals['total_price'],
+        totals['total_switches'], totals['total_outlets'], totals['total_points'],
+        totals['estimated_cable'], totals['estimated_frames'], len(totals['unpriced_items']),
+        order_req.status, order_req.assigned_to, order_req.assigned_to_name, order_req.client_notes
+    )
+
+def insert_order_lines(cur, orders: List[tuple]) -> None:
+    '''orders - [(order_id, lines)]; одна пачка INSERT на все позиции'''
+    rows = [
+        (order_id,) + tuple(line[name] for name in ORDER_LINE_COLUMNS[1:])
+        for order_id, lines in orders for line in lines
+    ]
+    if rows:
+        execute_values(
+            cur,
+            f"INSERT INTO {ORDER_SERVICES_TABLE} ({', '.join(ORDER_LINE_COLUMNS)}) VALUES %s",
+            rows, page_size=BATCH_PAGE_SIZE
+        )
+
+def parse_batch_body(raw_body: str) -> List[Any]:
+    '''JSON-массив, {"orders": [...]} или NDJSON (по заявке на строку)'''
+    try:
+        payload = json.loads(raw_body)
+        if isinstance(payload, dict) and isinstance(payload.get('orders'), list):
+            return payload['orders']
+        if isinstance(payload, list):
+            return payload
+        return [payload]
+    except json.JSONDecodeError:
+        pass
+    
+    rows: List[Any] = []
+    for line in raw_body.splitlines():
+        if not line.strip():
+            continue
+        try:
+            rows.append(json.loads(line))
+        except json.JSONDecodeError as e:
+            rows.append(ValueError(f'Invalid JSON: {str(e)}'))
+    return rows
+
+def handle_batch_post(conn, raw_body: str, actor: str = 'orders-api') -> Dict[str, Any]:
+    from order_models import CreateOrderRequest
+    
+    rows = parse_batch_body(raw_body)
+    
+    if not rows:
+        return error_response(400, 'No orders in batch')
+    
+    if len(rows) > MAX_BATCH_SIZE:
+        return error_response(413, f'Batch too large: {len(rows)} orders, max {MAX_BATCH_SIZE}')
+    
+    catalog = get_service_catalog()
+    catalog.ensure(conn)
+    valid: Dict[str, tuple] = {}
+    order_lines: Dict[str, List[Dict[str, Any]]] = {}
+    order_statuses: Dict[str, str] = {}
+    unpriced: Dict[str, List[str]] = {}
+    errors = []
+    for index, row in enumerate(rows):
+        if isinstance(row, Exception):
+            errors.append({'index': index, 'order_uid': None, 'error': str(row)})
+            continue
+        try:
+            if not isinstance(row, dict):
+                raise ValueError('Order must be a JSON object')
+            order_req = CreateOrderRequest(**row)
+            lines, totals = price_items([item.dict() for item in order_req.items], catalog)
+        except Exception as e:
+            errors.append({
+                'index': index,
+                'order_uid': row.get('order_uid') if isinstance(row, dict) else None,
+                'error': f'Validation error: {str(e)}'
+            })
+            continue
+        # Повтор order_uid внутри одной пачки: ON CONFLICT не может обновить строку дважды,
+        # поэтому побеждает последняя версия заявки
+        log_unpriced(order_req.order_uid, totals['unpriced_items'])
+        valid.pop(order_req.order_uid, None)
+        valid[order_req.order_uid] = order_values(order_req, lines, totals)
+        order_lines[order_req.order_uid] = lines
+        order_statuses[order_req.order_uid] = order_req.status
+        unpriced.pop(order_req.order_uid, None)
+        if totals['unpriced_items']:
+            unpriced[order_req.order_uid] = totals['unpriced_items']
+    
+    inserted = 0
+    updated = 0
+    if valid:
+        update_columns = [col for col in ORDER_INSERT_COLUMNS if col != 'order_uid']
+        cur = conn.cursor()
+        # Прежние статусы заменяемых заявок - в журнал попадают только настоящие смены
+        previous = lock_statuses(cur, list(valid))
+        results = execute_values(cur, f"""
+            INSERT INTO t_p78209571_electric_service_aut.orders AS o (
+                {', '.join(ORDER_INSERT_COLUMNS)}, created_at, updated_at
+            ) VALUES %s
+            ON CONFLICT (order_uid) DO UPDATE SET
+                {', '.join(f'{col} = EXCLUDED.{col}' for col in update_columns)},
+                updated_at = NOW(),
+                version = o.version + 1
+            RETURNING id, order_uid, (xmax = 0) AS inserted
+        """, list(valid.values()),
+            template=f"({', '.join(['%s'] * len(ORDER_INSERT_COLUMNS))}, NOW(), NOW())",
+            page_size=BATCH_PAGE_SIZE,
+            fetch=True
+        )
+        # Обновлённые заявки получают позиции заново
+        replaced = [order_id for order_id, _, is_insert in results if not is_insert]
+        if replaced:
+            cur.execute(f"DELETE FROM {ORDER_SERVICES_TABLE} WHERE order_id = ANY(%s)", (replaced,))
+        insert_order_lines(cur, [(order_id, order_lines[order_uid]) for order_id, order_uid, _ in results])
+        record_status_changes(cur, [
+            (order_id, order_statuses[order_uid], 'Пакетный импорт')
+            for order_id, order_uid, _ in results
+            if order_uid not in previous or previous[order_uid][1] != order_statuses[order_uid]
+        ], actor)
+        conn.commit()
+        cur.close()
+        get_order_cache().invalidate([order_uid for _, order_uid, is_insert in results if not is_insert])
+        inserted = len(results) - len(replaced)
+        updated = len(replaced)
+    
+    return json_response(200 if not errors else 207, {
+        'success': not errors,
+        'received': len(rows),
+        'inserted': inserted,
+        'updated': updated,
+        'failed': len(errors),
+        'errors': errors,
+        'unpriced': [{'order_uid': order_uid, 'items': names} for order_uid, names in unpriced.items()]
+    })
 
-def handle_put(conn, query_params: Dict[str, Any], body_data: Dict[str, Any]) -> Dict[str, Any]:
+def handle_assign(conn, query_params: Dict[str, Any]) -> Dict[str, Any]:
     order_uid = query_params.get('id')
     if not order_uid:
-        return {
-            'statusCode': 400,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'error': 'Order ID required'}),
-            'isBase64Encoded': False
-        }
+        return error_response(400, 'Order ID required')
+    try:
+        length = duration_slots(parse_int(query_params.get('duration'), 'duration', SLOT_MINUTES))
+    except ValueError as e:
+        return error_response(400, str(e))
+    dry_run = query_params.get('dry_run') == 'true'
+    
+    cur = conn.cursor()
+    cur.execute(
+        f"SELECT executor_id, location_lat, location_lng, scheduled_date, scheduled_time FROM {ORDERS_TABLE} WHERE order_uid = %s",
+        (order_uid,)
+    )
+    order = cur.fetchone()
+    cur.close()
+    conn.commit()
+    
+    if not order:
+        return error_response(404, 'Order not found')
+    executor_id, lat, lng, scheduled_date, scheduled_time = order
+    if executor_id is not None and not dry_run:
+        return error_response(409, f'Order already assigned to executor {executor_id}')
+    if lat is None or lng is None:
+        return error_response(400, 'Order has no coordinates')
+    
+    grid = get_executor_grid()
+    grid.ensure(conn)
+    index = get_availability_index()
+    position: Dict[int, int] = {}
+    masks = ()
+    window = None
+    if scheduled_date:
+        index.ensure(conn, scheduled_date, scheduled_date)
+        position, masks = index.position, index.day_masks(scheduled_date)
+        start = slot_index(scheduled_time)
+        if start is not None:
+            # Маска исполнителей, свободных во всех слотах работ начиная со scheduled_time
+            window = -1 if start + length <= SLOTS_PER_DAY else 0
+            for slot_mask in masks[start:start + length]:
+                window &= slot_mask
+    
+    def accept(candidate_id: int) -> bool:
+        return window is None or (candidate_id in position and bool(window >> position[candidate_id] & 1))
+    
+    def free_slots(candidate_id: int) -> int:
+        if not scheduled_date:
+            return SLOTS_PER_DAY
+        if candidate_id not in position:
+            return 0
+        return sum(slot_mask >> position[candidate_id] & 1 for slot_mask in masks)
+    
+    nearest = grid.nearest(float(lat), float(lng), accept=accept)
+    candidates = rank_candidates(grid, nearest, free_slots, SLOTS_PER_DAY)
+    if not candidates:
+        return error_response(404, f'No free executor within {MAX_DISTANCE_KM:g} km')
+    best = candidates[0]
+    
+    if not dry_run:
+        cur = conn.cursor()
+        locked = lock_order(cur, order_uid)
+        if locked is None or locked[2] is not None:
+            conn.rollback()
+            cur.close()
+            return error_response(409, 'Order was assigned concurrently')
+        order_id = locked[0]
+        start = slot_index(scheduled_time)
+        best = None
+        for candidate in candidates:
+            if not scheduled_date or start is None:
+                best = candidate
+                break
+            try:
+                # Индекс мог устареть - слот закрепляет БД; занятого кандидата пропускаем
+                reserve_slots(cur, order_id, candidate['executor_id'], scheduled_date, start, length)
+            except SlotConflict:
+                continue
+            best = candidate
+            break
+        if best is None:
+            conn.rollback()
+            cur.close()
+            index.invalidate()
+            return error_response(409, 'All nearby executors were booked concurrently')
+        # assigned_to - uid исполнителя в токене (tg_<telegram_id>): по нему исполнитель видит свои заявки
+        cur.execute(
+            f"""
+            UPDATE {ORDERS_TABLE} SET executor_id = %s, assigned_to_name = %s, assigned_to = (
+                SELECT 'tg_' || COALESCE(u.telegram_id, e.telegram_id) FROM {EXECUTORS_TABLE} e
+                LEFT JOIN {USERS_TABLE} u ON u.id = e.user_id
+                WHERE e.id = %s
+            ), updated_at = NOW(), version = version + 1
+            WHERE id = %s
+            RETURNING assigned_to
+            """,
+            (best['executor_id'], best['name'], best['executor_id'], order_id)
+        )
+        best = dict(best, assigned_to=cur.fetchone()[0])
+        conn.commit()
+        cur.close()
+        get_order_cache().invalidate([order_uid])
+        if scheduled_date:
+            index.invalidate()
+    
+    return json_response(200, {
+        'success': True,
+        'order_uid': order_uid,
+        'dry_run': dry_run,
+        'executor': best,
+        'candidates': candidates
+    })
+
+def handle_put(conn, query_params: Dict[str, Any], body_data: Dict[str, Any], actor: str = 'orders-api') -> Dict[str, Any]:
+    order_uid = query_params.get('id')
+    if not order_uid:
+        return error_response(400, 'Order ID required')
     
     cur = conn.cursor()
     
@@ -234,50 +1204,106 @@ def handle_put(conn, query_params: Dict[str, Any], body_data: Dict[str, Any]) ->
         set_parts.append("planfix_task_id = %s")
         params.append(body_data['planfix_task_id'])
     
+    for name in ('location_lat', 'location_lng'):
+        if name in body_data:
+            set_parts.append(f"{name} = %s")
+            params.append(body_data[name])
+    
+    schedule_fields = [name for name in ('executor_id', 'scheduled_date', 'scheduled_time') if name in body_data]
+    for name in schedule_fields:
+        set_parts.append(f"{name} = %s")
+        params.append(body_data[name])
+    
     if not set_parts:
-        return {
-            'statusCode': 400,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'error': 'No fields to update'}),
-            'isBase64Encoded': False
-        }
+        return error_response(400, 'No fields to update')
     
-    set_parts.append("updated_at = NOW()")
-    params.append(order_uid)
+    try:
+        # Без duration заявка сохраняет длительность, которую держит сейчас (см. held_slots)
+        length = duration_slots(int(body_data['duration'])) if body_data.get('duration') else None
+    except (TypeError, ValueError) as e:
+        return error_response(400, str(e))
     
-    query = f"UPDATE t_p78209571_electric_service_aut.orders SET {', '.join(set_parts)} WHERE order_uid = %s"
+    locked = lock_order(cur, order_uid)
+    if locked is None:
+        conn.rollback()
+        cur.close()
+        return error_response(404, 'Order not found')
+    order_id, version, executor_id, scheduled_date, scheduled_time, status = locked
     
-    cur.execute(query, params)
-    rows_updated = cur.rowcount
+    if 'version' in body_data and str(body_data['version']) != str(version):
+        conn.rollback()
+        cur.close()
+        return json_response(409, {'error': 'Order was modified by someone else', 'version': version})
+    
+    reserved: List[str] = []
+    calendar_changed = schedule_fields or body_data.get('status') == 'cancelled'
+    try:
+        # Итоговые исполнитель и время после этого PUT
+        executor_id = body_data.get('executor_id', executor_id)
+        if 'scheduled_date' in body_data:
+            scheduled_date = parse_date(body_data['scheduled_date'], 'scheduled_date')
+        scheduled_time = body_data.get('scheduled_time', scheduled_time)
+        if body_data.get('status', status) == 'cancelled' or not (executor_id and scheduled_date and scheduled_time):
+            if calendar_changed:
+                release_slots(cur, order_id)
+        elif schedule_fields:
+            start = slot_index(scheduled_time)
+            if start is None:
+                raise ValueError('scheduled_time must be one of: ' + ', '.join(SLOT_TIMES))
+            if length is None:
+                length = held_slots(cur, order_id) or duration_slots(SLOT_MINUTES)
+            reserved = reserve_slots(cur, order_id, executor_id, scheduled_date, start, length)
+    except ValueError as e:
+        conn.rollback()
+        cur.close()
+        return error_response(400, str(e))
+    except SlotConflict as e:
+        conn.rollback()
+        cur.close()
+        return json_response(409, {'error': str(e), 'conflicts': e.slots})
+    
+    set_parts.append("updated_at = NOW()")
+    set_parts.append("version = version + 1")
+    params.append(order_id)
+    
+    cur.execute(f"UPDATE {ORDERS_TABLE} SET {', '.join(set_parts)} WHERE id = %s RETURNING version", params)
+    new_version = cur.fetchone()[0]
+    if 'status' in body_data and body_data['status'] != status:
+        record_status_changes(cur, [(order_id, body_data['status'], body_data.get('status_comment'))], actor)
     conn.commit()
     cur.close()
     
-    if rows_updated > 0:
-        return {
-            'statusCode': 200,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'success': True, 'updated': rows_updated}),
-            'isBase64Encoded': False
-        }
-    else:
-        return {
-            'statusCode': 404,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'error': 'Order not found'}),
-            'isBase64Encoded': False
-        }
+    get_order_cache().invalidate([order_uid])
+    if calendar_changed:
+        get_availability_index().invalidate()
+    
+    result = {'success': True, 'updated': 1, 'version': new_version}
+    if reserved:
+        result['reserved'] = reserved
+    return json_response(200, result)
 
 def handle_delete(conn, query_params: Dict[str, Any]) -> Dict[str, Any]:
     order_uid = query_params.get('id')
     if not order_uid:
-        return {
-            'statusCode': 400,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'error': 'Order ID required'}),
-            'isBase64Encoded': False
-        }
+        return error_response(400, 'Order ID required')
     
     cur = conn.cursor()
+    # Брони календаря ссылаются на заявку - освобождаем их в той же транзакции
+    cur.execute(
+        f"""
+        UPDATE t_p78209571_electric_service_aut.executor_calendar SET order_id = NULL, is_available = true
+        WHERE order_id IN (SELECT id FROM {ORDERS_TABLE} WHERE order_uid = %s)
+        """,
+        (order_uid,)
+    )
+    cur.execute(
+        f"DELETE FROM {ORDER_SERVICES_TABLE} WHERE order_id IN (SELECT id FROM {ORDERS_TABLE} WHERE order_uid = %s)",
+        (order_uid,)
+    )
+    cur.execute(
+        f"DELETE FROM {STATUS_HISTORY_TABLE} WHERE order_id IN (SELECT id FROM {ORDERS_TABLE} WHERE order_uid = %s)",
+        (order_uid,)
+    )
     cur.execute(
         "DELETE FROM t_p78209571_electric_service_aut.orders WHERE order_uid = %s",
         (order_uid,)
@@ -286,17 +1312,11 @@ def handle_delete(conn, query_params: Dict[str, Any]) -> Dict[str, Any]:
     conn.commit()
     cur.close()
     
+    if rows_deleted:
+        get_order_cache().invalidate([order_uid])
+        get_availability_index().invalidate()
+    
     if rows_deleted > 0:
-        return {
-            'statusCode': 200,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'success': True, 'deleted': rows_deleted}),
-            'isBase64Encoded': False
-        }
+        return json_response(200, {'success': True, 'deleted': rows_deleted})
     else:
-        return {
-            'statusCode': 404,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'error': 'Order not found'}),
-            'isBase64Encoded': False
-        }
+        return error_response(404, 'Order not found')
@@ -0,0 +1,48 @@
+'''
+Business: Модели валидации тела заявки для POST и пакетного импорта
+Args: dict заявки из JSON-тела запроса
+Returns: Проверенный CreateOrderRequest (или исключение pydantic)
+
+Вынесено из index.py и импортируется только на запись: построение схем pydantic -
+самая дорогая часть холодного старта, а GET-запросам оно не нужно.
+'''
+
+from typing import List, Optional
+from pydantic import BaseModel, Field, field_validator
+from search import normalize_phone
+
+class OrderItem(BaseModel):
+    name: str
+    price: float
+    quantity: int
+    category: Optional[str] = None
+    description: Optional[str] = None
+    slots: Optional[int] = None
+    service_id: Optional[int] = None
+
+class CreateOrderRequest(BaseModel):
+    order_uid: str = Field(..., min_length=1)
+    customer_name: str
+    customer_phone: str
+    customer_email: Optional[str] = None
+    address: str
+    scheduled_date: Optional[str] = None
+    scheduled_time: Optional[str] = None
+    items: List[OrderItem]
+    # Итоги считает сервер (pricing.py); присланные значения принимаются для совместимости
+    total_price: Optional[float] = None
+    total_switches: int = 0
+    total_outlets: int = 0
+    total_points: int = 0
+    estimated_cable: int = 0
+    estimated_frames: int = 0
+    status: str = 'new'
+    assigned_to: Optional[str] = None
+    assigned_to_name: Optional[str] = None
+    client_notes: Optional[str] = None
+    
+    @field_validator('customer_phone')
+    @classmethod
+    def normalize_customer_phone(cls, value: str) -> str:
+        # Единый формат +79161234567 - по нему ищет GET /?q= (search.py)
+        return normalize_phone(value)
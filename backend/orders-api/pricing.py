@@ -0,0 +1,115 @@
+'''
+Business: Позиции заявки для order_services и итоги заявки, посчитанные на сервере
+Args: позиции из тела заявки (name, price, quantity, category, slots, service_id), прайс services
+Returns: Строки позиций и итоги {total_price, total_switches, total_outlets, total_points,
+         estimated_frames, estimated_cable, unpriced_items}
+
+Цена позиции берётся из таблицы services, если позиция ссылается на услугу (service_id или
+точное совпадение названия без учёта регистра), иначе - цена из тела заявки. Такие позиции
+(переименованные, нет в прайсе) перечисляются в unpriced_items: фронтенд не знает id услуг,
+и итог по ним по-прежнему задаёт клиент, поэтому orders-api пишет их число в заявку и в лог. Итоги
+считаются так же, как calculateTotals на фронтенде: выключатель - quantity, розетка -
+quantity * slots, рамки - quantity для 1-3 постов и 2 * quantity для 4-5, кабель - 8 м на рамку.
+Присланные клиентом total_* больше не используются.
+
+Прайс services кэшируется на тёплом инстансе на SERVICES_CACHE_TTL секунд.
+'''
+
+import os
+import threading
+import time
+from decimal import Decimal, ROUND_HALF_UP
+from typing import Dict, Any, List, Optional, Tuple
+
+SERVICES_TABLE = 't_p78209571_electric_service_aut.services'
+SERVICES_CACHE_TTL_SECONDS = float(os.environ.get('SERVICES_CACHE_TTL', '300'))
+
+CABLE_METERS_PER_FRAME = 8
+CENTS = Decimal('0.01')
+
+class ServiceCatalog:
+    '''Активные услуги: id -> услуга и название в нижнем регистре -> услуга'''
+    def __init__(self, ttl_seconds: float = SERVICES_CACHE_TTL_SECONDS):
+        self.ttl_seconds = ttl_seconds
+        self.by_id: Dict[int, Dict[str, Any]] = {}
+        self.by_name: Dict[str, Dict[str, Any]] = {}
+        self.expires_at = 0.0
+        self._lock = threading.Lock()
+        self.stats: Dict[str, int] = {'hits': 0, 'loads': 0}
+
+    def ensure(self, conn) -> bool:
+        with self._lock:
+            if time.monotonic() < self.expires_at:
+                self.stats['hits'] += 1
+                return True
+            cur = conn.cursor()
+            cur.execute(f"SELECT id, name, base_price, category FROM {SERVICES_TABLE} WHERE is_active")
+            services = [
+                {'id': row[0], 'name': row[1], 'price': row[2], 'category': row[3]}
+                for row in cur.fetchall()
+            ]
+            cur.close()
+            self.by_id = {service['id']: service for service in services}
+            self.by_name = {service['name'].strip().lower(): service for service in services}
+            self.expires_at = time.monotonic() + self.ttl_seconds
+            self.stats['loads'] += 1
+            return False
+
+    def find(self, service_id: Optional[int], name: str) -> Optional[Dict[str, Any]]:
+        if service_id is not None:
+            return self.by_id.get(service_id)
+        return self.by_name.get(name.strip().lower())
+
+_catalog = ServiceCatalog()
+
+def get_service_catalog() -> ServiceCatalog:
+    return _catalog
+
+def frames_for(slots: Optional[int], quantity: int) -> int:
+    if slots in (1, 2, 3):
+        return quantity
+    if slots in (4, 5):
+        return quantity * 2
+    return 0
+
+def price_items(items: List[Dict[str, Any]], catalog: ServiceCatalog) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    '''items - dict позиций из CreateOrderRequest; ValueError, если service_id не найден в прайсе'''
+    lines = []
+    totals = {'total_price': Decimal('0.00'), 'total_switches': 0, 'total_outlets': 0, 'total_points': 0,
+              'estimated_frames': 0, 'estimated_cable': 0, 'unpriced_items': []}
+    for item in items:
+        service = catalog.find(item.get('service_id'), item['name'])
+        if item.get('service_id') is not None and service is None:
+            raise ValueError(f"Unknown service_id {item['service_id']}")
+        quantity = item['quantity']
+        if service is not None and service['price'] is not None:
+            price = Decimal(service['price'])
+        else:
+            price = Decimal(str(item['price']))
+            totals['unpriced_items'].append(item['name'])
+        price = price.quantize(CENTS, ROUND_HALF_UP)
+        category = (service['category'] if service is not None and not item.get('category') else item.get('category'))
+        slots = item.get('slots')
+
+        if category == 'switch':
+            totals['total_switches'] += quantity
+        elif category == 'outlet':
+            totals['total_outlets'] += quantity * (slots or 1)
+        totals['estimated_frames'] += frames_for(slots, quantity)
+        line_total = price * quantity
+        totals['total_price'] += line_total
+
+        lines.append({
+            'service_id': service['id'] if service is not None else None,
+            'name': item['name'],
+            'category': category,
+            'quantity': quantity,
+            'price': price,
+            'slots': slots,
+            'line_total': line_total,
+            'notes': item.get('description')
+        })
+
+    totals['total_points'] = totals['total_switches'] + totals['total_outlets']
+    totals['estimated_cable'] = totals['estimated_frames'] * CABLE_METERS_PER_FRAME
+    return lines, totals
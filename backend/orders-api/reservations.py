@@ -0,0 +1,94 @@
+'''
+Business: Бронирование слотов исполнителя в executor_calendar в транзакции назначения заявки
+Args: cur - курсор открытой транзакции, заявка, исполнитель, дата, первый слот и число слотов
+Returns: Забронированные time_slot или SlotConflict, если хотя бы один слот уже занят
+
+Слот бронируется INSERT ... ON CONFLICT (executor_id, date, time_slot) DO UPDATE ... WHERE
+слот свободен. Строки календаря на слот чаще всего ещё нет, поэтому SELECT ... FOR UPDATE
+(и SKIP LOCKED) блокировать нечего - сериализует уникальный ключ: вторая транзакция на тот
+же слот ждёт первую и после её COMMIT получает конфликт, а не двойную бронь. Слоты
+вставляются по возрастанию времени, так что транзакции берут блокировки в одном порядке.
+
+Заявки, у которых исполнитель и время есть только в orders (назначены до появления
+календаря), тоже занимают свой слот: их проверяет legacy_bookings, а миграция V0018
+переносит их в executor_calendar.
+
+Строка заявки блокируется SELECT ... FOR UPDATE (lock_order) - назначения одной заявки
+выполняются по очереди, а orders.version проверяет, что диспетчер видел последнюю версию.
+'''
+
+from datetime import date
+from typing import List, Optional, Tuple
+import psycopg2.extensions
+from availability import SLOT_TIMES, SLOTS_PER_DAY
+
+SCHEMA = 't_p78209571_electric_service_aut'
+
+class SlotConflict(Exception):
+    def __init__(self, message: str, slots: Optional[List[str]] = None):
+        super().__init__(message)
+        self.slots = slots or []
+
+def lock_order(cur, order_uid: str) -> Optional[Tuple]:
+    '''(id, version, executor_id, scheduled_date, scheduled_time, status) под FOR UPDATE'''
+    cur.execute(f"""
+        SELECT id, version, executor_id, scheduled_date, scheduled_time, status
+        FROM {SCHEMA}.orders WHERE order_uid = %s FOR UPDATE
+    """, (order_uid,))
+    return cur.fetchone()
+
+def held_slots(cur, order_id: int) -> int:
+    '''Сколько слотов заявка занимает сейчас - длительность при переносе без duration'''
+    cur.execute(f"SELECT count(*) FROM {SCHEMA}.executor_calendar WHERE order_id = %s", (order_id,))
+    return cur.fetchone()[0]
+
+def release_slots(cur, order_id: int) -> int:
+    cur.execute(f"""
+        UPDATE {SCHEMA}.executor_calendar SET order_id = NULL, is_available = true
+        WHERE order_id = %s
+    """, (order_id,))
+    return cur.rowcount
+
+def legacy_bookings(cur, order_id: int, executor_id: int, day: date, slot_times: List[str]) -> List[str]:
+    '''Слоты, занятые другими заявками только в orders (назначены до executor_calendar или в
+    обход PUT) - индекс свободных окон считает их занятыми, значит и бронь должна'''
+    cur.execute(f"""
+        SELECT DISTINCT to_char(scheduled_time, 'HH24:MI') FROM {SCHEMA}.orders
+        WHERE executor_id = %s AND scheduled_date = %s AND id <> %s AND status <> 'cancelled'
+          AND to_char(scheduled_time, 'HH24:MI') = ANY(%s::varchar[])
+    """, (executor_id, day, order_id, slot_times))
+    return sorted(row[0] for row in cur.fetchall())
+
+def reserve_slots(cur, order_id: int, executor_id: int, day: date, start_slot: int, length: int) -> List[str]:
+    '''Снимает прежние брони заявки и занимает length слотов с start_slot; при конфликте
+    откатывается к своей точке сохранения, так что транзакция вызывающего остаётся рабочей'''
+    if start_slot + length > SLOTS_PER_DAY:
+        raise SlotConflict('Reservation does not fit into the working day')
+    slot_times = list(SLOT_TIMES[start_slot:start_slot + length])
+
+    cur.execute("SAVEPOINT reserve_slots")
+    try:
+        release_slots(cur, order_id)
+        legacy = legacy_bookings(cur, order_id, executor_id, day, slot_times)
+        if legacy:
+            cur.execute("ROLLBACK TO SAVEPOINT reserve_slots")
+            raise SlotConflict('Slot already booked', legacy)
+        cur.execute(f"""
+            INSERT INTO {SCHEMA}.executor_calendar AS c (executor_id, date, time_slot, is_available, order_id)
+            SELECT %s, %s, slot_time, false, %s FROM unnest(%s::varchar[]) AS slot_time
+            ON CONFLICT (executor_id, date, time_slot) DO UPDATE
+                SET is_available = false, order_id = EXCLUDED.order_id
+                WHERE c.order_id IS NULL AND c.is_available
+            RETURNING time_slot
+        """, (executor_id, day, order_id, slot_times))
+        reserved = {row[0] for row in cur.fetchall()}
+    except psycopg2.extensions.TransactionRollbackError:
+        # Взаимоблокировка или сбой сериализации с параллельной бронью - тот же конфликт
+        cur.execute("ROLLBACK TO SAVEPOINT reserve_slots")
+        raise SlotConflict('Slot is being booked concurrently', slot_times)
+
+    if len(reserved) < len(slot_times):
+        cur.execute("ROLLBACK TO SAVEPOINT reserve_slots")
+        raise SlotConflict('Slot already booked', [slot_time for slot_time in slot_times if slot_time not in reserved])
+    cur.execute("RELEASE SAVEPOINT reserve_slots")
+    return slot_times
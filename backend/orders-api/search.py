@@ -0,0 +1,57 @@
+'''
+Business: Поиск заявок по фрагменту имени клиента, телефона или адреса (GET /?q=...)
+Args: строка запроса q; телефон заявки при записи
+Returns: tsquery для колонки orders.search_vector (или None для пустого запроса),
+         телефон в виде +79161234567
+
+search_vector - хранимая колонка с GIN-индексом (миграция V0016), встроенный полнотекстовый
+поиск без расширений. Каждое слово запроса ищется как префикс ('иван' найдёт «Иванов»),
+ё приравнена к е. Телефон хранится нормализованным, а в индекс кроме всех цифр попадают
+последние 10, 7 и 4 - поэтому находятся и «8 916 123», и «4567» из конца номера.
+По рангу упорядочиваются SEARCH_CANDIDATES самых новых совпадений.
+'''
+
+import os
+import re
+from typing import List, Optional
+
+MIN_QUERY_LENGTH = 2
+MAX_QUERY_TERMS = 8
+# Ранжируются только самые новые совпадения: у короткого префикса («ива») их десятки тысяч,
+# и ранжирование всех стоило бы сотни миллисекунд при почти одинаковых рангах
+SEARCH_CANDIDATES = int(os.environ.get('ORDERS_SEARCH_CANDIDATES', '1000'))
+
+# Хранимая колонка orders.search_vector с GIN-индексом (миграция V0016)
+SEARCH_VECTOR_COLUMN = 'search_vector'
+
+PHONE_QUERY = re.compile(r'^[\d\s()+\-]+$')
+TERM = re.compile(r'[^\W_]+')
+
+def normalize_phone(raw: str) -> str:
+    '''8 (916) 123-45-67, 9161234567, +7 916 123 45 67 -> +79161234567; короткие и
+    непохожие на номер значения остаются как были'''
+    digits = re.sub(r'\D', '', raw or '')
+    if len(digits) == 11 and digits[0] == '8':
+        return '+7' + digits[1:]
+    if len(digits) == 10 and digits[0] == '9':
+        return '+7' + digits
+    if 11 <= len(digits) <= 15:
+        return '+' + digits
+    return (raw or '').strip()
+
+def build_search_query(q: str) -> Optional[str]:
+    '''Строка для to_tsquery('simple', ...); ValueError для слишком короткого запроса'''
+    q = (q or '').strip()
+    if len(q) < MIN_QUERY_LENGTH:
+        raise ValueError(f'q must be at least {MIN_QUERY_LENGTH} characters')
+    digits = re.sub(r'\D', '', q)
+    if digits and PHONE_QUERY.match(q):
+        variants: List[str] = [digits]
+        # Номер, набранный с 8, хранится с 7; «8...» может быть и концом номера - ищем оба
+        if len(digits) > 1 and digits[0] == '8':
+            variants.append('7' + digits[1:])
+        return ' | '.join(f'{variant}:*' for variant in variants)
+    terms = TERM.findall(q.lower().replace('ё', 'е'))[:MAX_QUERY_TERMS]
+    if not terms:
+        return None
+    return ' & '.join(f'{term}:*' for term in terms)
@@ -4,9 +4,19 @@ Args: event - dict с httpMethod, body, queryStringParameters
       context - object с request_id
 Returns: HTTP response с результатом создания задачи или обработки webhook
 
-Два режима работы:
-1. POST / - создание задачи в Планфиксе из заявки (отправка)
-2. POST /?webhook=true - получение обновлений из Планфикса (webhook)
+Режимы работы:
+1. POST / - постановка задачи в очередь на создание в Планфиксе (outbox, ответ сразу)
+2. POST /?drain=true - воркер очереди: отправляет накопленные задачи с повторами
+   (вызывается по расписанию с заголовком X-Worker-Secret = WORKER_SECRET; limit
+   1..PLANFIX_DRAIN_MAX_LIMIT и concurrency 1..PLANFIX_HTTP_POOL_SIZE в query). Повторная попытка
+   сначала ищет задачу, созданную прошлой (task/list по названию), - дублей не будет
+3. POST /?webhook=true - получение обновлений из Планфикса (webhook)
+   Тело - одно событие, массив событий или {"events": [...]}. В пачке события
+   схлопываются по задаче: в БД пишется только последний статус каждой заявки
+   (по timestamp события - эпоха или дата; события без него считаются последними)
+   одним UPDATE на всю пачку. Смены статуса пишутся в order_status_history
+   в той же транзакции (status_history.py). Обновлённые заявки сбрасываются из кэша
+   GET /?id= в orders-api через общее хранилище ORDER_CACHE_SHARED_URL (order_cache.py)
 
 Требования к настройке:
 1. Создайте API ключ в Планфиксе: Настройки → API → Создать ключ
@@ -15,25 +25,72 @@ Returns: HTTP response с результатом создания задачи 
    - PLANFIX_API_KEY: ваш API ключ из Планфикса
    - PLANFIX_ACCOUNT: название аккаунта (например, "konigkomfort" для konigkomfort.planfix.ru)
    - DATABASE_URL: строка подключения к PostgreSQL
+   - WORKER_SECRET: секрет воркера ?drain=true (заголовок X-Worker-Secret)
+   - PLANFIX_BASE_URL (необязательно): адрес API вместо https://<account>.planfix.ru,
+     например http://localhost:8099 для локальной заглушки bench/planfix_stub.py
+   - PLANFIX_REQUIRE_AUTH=true (необязательно): POST / только с токеном сессии
+     telegram-auth (X-Auth-Token); токен проверяется локально, без запроса в БД
+   - ORDER_CACHE_SHARED_URL (необязательно): тот же redis://..., что у orders-api
 '''
 
 import json
+import math
 import os
-import requests
-import re
-from typing import Dict, Any
-from pydantic import BaseModel, Field
+from datetime import datetime, timezone
+from psycopg2.extras import execute_values
+from typing import Dict, Any, List, Optional, TYPE_CHECKING
+from db import get_pool
+from task_queue import enqueue_task, drain_queue, PlanfixError
+from status_mapping import get_status_mapper, extract_order_id
+from status_history import lock_statuses, record_status_changes
+from order_cache import get_order_cache
+from session_token import verify_token, token_from_headers, TokenError
+from worker_auth import verify_worker, WorkerAuthError
+from core import json_response, error_response, options_response
 
-class OrderData(BaseModel):
-    order_id: str = Field(..., min_length=1)
-    customer_name: str
-    customer_phone: str
-    address: str
-    date: str
-    time: str
-    total_amount: float
-    items: list
-    status: str
+if TYPE_CHECKING:
+    import requests
+    from planfix_models import OrderData
+
+PLANFIX_TIMEOUT_SECONDS = 10
+HTTP_POOL_SIZE = int(os.environ.get('PLANFIX_HTTP_POOL_SIZE', '8'))
+HTTP_RETRIES = int(os.environ.get('PLANFIX_HTTP_RETRIES', '2'))
+DRAIN_DEFAULT_LIMIT = 50
+DRAIN_DEFAULT_CONCURRENCY = 4
+DRAIN_MAX_LIMIT = int(os.environ.get('PLANFIX_DRAIN_MAX_LIMIT', '200'))
+DRAIN_MAX_CONCURRENCY = HTTP_POOL_SIZE
+REQUIRE_AUTH = os.environ.get('PLANFIX_REQUIRE_AUTH', 'false').lower() == 'true'
+# Эпоха больше этого числа - миллисекунды (1e11 секунд - это 5138 год)
+EPOCH_MILLIS_THRESHOLD = 1e11
+# Фильтр task/list по названию задачи; название совпадает ещё и проверкой в find_planfix_task
+TASK_NAME_FILTER_TYPE = int(os.environ.get('PLANFIX_TASK_NAME_FILTER_TYPE', '8'))
+
+_session: Optional['requests.Session'] = None
+
+def get_session() -> 'requests.Session':
+    '''
+    Общая keep-alive сессия на весь тёплый инстанс: TCP/TLS к Планфиксу не открывается заново.
+    Адаптер сам повторяет только идемпотентные методы; создание задачи повторяет очередь.
+    requests импортируется здесь: webhook и постановка в очередь в Планфикс не ходят.
+    '''
+    global _session
+    if _session is None:
+        import requests
+        from requests.adapters import HTTPAdapter
+        from urllib3.util.retry import Retry
+        
+        retry = Retry(
+            total=HTTP_RETRIES,
+            backoff_factor=0.3,
+            status_forcelist=(502, 503, 504),
+            allowed_methods=frozenset(['GET', 'PUT', 'DELETE'])
+        )
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=HTTP_POOL_SIZE, max_retries=retry)
+        session = requests.Session()
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        _session = session
+    return _session
 
 def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     method: str = event.get('httpMethod', 'GET')
@@ -41,66 +98,75 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     is_webhook = query_params.get('webhook') == 'true'
     
     if method == 'OPTIONS':
-        return {
-            'statusCode': 200,
-            'headers': {
-                'Access-Control-Allow-Origin': '*',
-                'Access-Control-Allow-Methods': 'POST, OPTIONS',
-                'Access-Control-Allow-Headers': 'Content-Type, X-Planfix-Signature',
-                'Access-Control-Max-Age': '86400'
-            },
-            'body': '',
-            'isBase64Encoded': False
-        }
+        return options_response('POST, OPTIONS', 'Content-Type, X-Planfix-Signature, X-Auth-Token')
     
     if method != 'POST':
-        return {
-            'statusCode': 405,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'error': 'Method not allowed'}),
-            'isBase64Encoded': False
-        }
+        return error_response(405, 'Method not allowed')
     
     if is_webhook:
         return handle_webhook(event, context)
     
     api_key = os.environ.get('PLANFIX_API_KEY')
     account = os.environ.get('PLANFIX_ACCOUNT')
+    database_url = os.environ.get('DATABASE_URL')
     
     if not api_key:
-        return {
-            'statusCode': 500,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'error': 'PLANFIX_API_KEY не установлен. Добавьте секрет в настройках проекта.'}),
-            'isBase64Encoded': False
-        }
+        return error_response(500, 'PLANFIX_API_KEY не установлен. Добавьте секрет в настройках проекта.')
     
-    if not account:
-        return {
-            'statusCode': 500,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'error': 'PLANFIX_ACCOUNT не установлен. Добавьте секрет в настройках проекта.'}),
-            'isBase64Encoded': False
-        }
+    if not account and not os.environ.get('PLANFIX_BASE_URL'):
+        return error_response(500, 'PLANFIX_ACCOUNT не установлен. Добавьте секрет в настройках проекта.')
+    
+    if not database_url:
+        return error_response(500, 'DATABASE_URL не установлен. Добавьте секрет в настройках проекта.')
+    
+    if query_params.get('drain') == 'true':
+        try:
+            verify_worker(event.get('headers'))
+        except WorkerAuthError as e:
+            return error_response(401, str(e))
+        except RuntimeError as e:
+            return error_response(500, str(e))
+        return handle_drain(database_url, query_params)
+    
+    token = token_from_headers(event.get('headers'))
+    if token or REQUIRE_AUTH:
+        try:
+            if not token:
+                raise TokenError('Authentication required')
+            claims = verify_token(token)
+        except TokenError as e:
+            return error_response(401, str(e))
+        except RuntimeError as e:
+            return error_response(500, str(e))
+        print(f"Planfix: задачу ставит {claims['uid']} ({claims['role']})")
+    
+    from planfix_models import OrderData
     
     try:
         body_data = json.loads(event.get('body', '{}'))
         order_data = OrderData(**body_data)
     except json.JSONDecodeError as e:
-        return {
-            'statusCode': 400,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'error': f'Невалидный JSON: {str(e)}'}),
-            'isBase64Encoded': False
-        }
+        return error_response(400, f'Невалидный JSON: {str(e)}')
     except Exception as e:
-        return {
-            'statusCode': 400,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'error': f'Ошибка валидации данных: {str(e)}'}),
-            'isBase64Encoded': False
-        }
+        return error_response(400, f'Ошибка валидации данных: {str(e)}')
     
+    try:
+        with get_pool(database_url).connection() as conn:
+            queued = enqueue_task(conn, order_data.order_id, build_task_payload(order_data))
+    except Exception as e:
+        return error_response(500, f'Ошибка постановки задачи в очередь: {str(e)}')
+    
+    task_id = queued['planfix_task_id']
+    return json_response(200, {
+        'success': True,
+        'queued': queued['status'] != 'done',
+        'order_id': order_data.order_id,
+        'queue_status': queued['status'],
+        'task_id': task_id,
+        'task_url': f'{planfix_base_url()}/task/{task_id}' if task_id else None
+    })
+
+def build_task_payload(order_data: 'OrderData') -> Dict[str, Any]:
     items_text = '\n'.join([
         f"• {item.get('name', 'Услуга')} x{item.get('quantity', 1)} - {item.get('price', 0)}₽"
         for item in order_data.items
@@ -121,66 +187,108 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
 Статус: {order_data.status}
 '''
     
-    account_clean = account.replace('.planfix.ru', '')
-    planfix_url = f'https://{account_clean}.planfix.ru/rest/task/create'
-    
-    payload = {
+    return {
         'name': f'Заявка #{order_data.order_id} - {order_data.customer_name}',
         'description': task_description,
         'template': 1
     }
+
+def planfix_base_url() -> str:
+    base_url = os.environ.get('PLANFIX_BASE_URL')
+    if base_url:
+        return base_url.rstrip('/')
+    account_clean = os.environ.get('PLANFIX_ACCOUNT', '').replace('.planfix.ru', '')
+    return f'https://{account_clean}.planfix.ru'
+
+def planfix_post(method: str, payload: Dict[str, Any]) -> 'requests.Response':
+    import requests
     
     headers = {
-        'Authorization': f'Bearer {api_key}',
+        'Authorization': f'Bearer {os.environ.get("PLANFIX_API_KEY", "")}',
         'Content-Type': 'application/json; charset=utf-8'
     }
-    
     try:
-        response = requests.post(planfix_url, json=payload, headers=headers, timeout=10)
-        
-        if response.status_code == 200 or response.status_code == 201:
-            planfix_data = response.json()
-            return {
-                'statusCode': 200,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                'body': json.dumps({
-                    'success': True,
-                    'task_id': planfix_data.get('id'),
-                    'task_url': f'https://{account_clean}.planfix.ru/task/{planfix_data.get("id")}'
-                }),
-                'isBase64Encoded': False
-            }
-        
-        return {
-            'statusCode': response.status_code,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({
-                'error': 'Ошибка создания задачи в Планфикс',
-                'status_code': response.status_code,
-                'details': response.text,
-                'url': planfix_url
-            }),
-            'isBase64Encoded': False
-        }
+        return get_session().post(
+            f'{planfix_base_url()}/rest/{method}', json=payload, headers=headers, timeout=PLANFIX_TIMEOUT_SECONDS
+        )
     except requests.exceptions.Timeout:
-        return {
-            'statusCode': 504,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'error': 'Таймаут при обращении к Планфикс'}),
-            'isBase64Encoded': False
-        }
+        raise PlanfixError('Таймаут при обращении к Планфикс')
     except requests.exceptions.RequestException as e:
-        return {
-            'statusCode': 500,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'error': f'Ошибка запроса к Планфикс: {str(e)}'}),
-            'isBase64Encoded': False
-        }
+        raise PlanfixError(f'Ошибка запроса к Планфикс: {str(e)}')
+
+def response_json(response: 'requests.Response') -> Dict[str, Any]:
+    try:
+        body = response.json()
+    except ValueError:
+        body = None
+    if not isinstance(body, dict):
+        raise PlanfixError(f'Планфикс вернул не JSON-объект: HTTP {response.status_code}: {response.text[:200]}')
+    return body
+
+def create_planfix_task(payload: Dict[str, Any]) -> str:
+    response = planfix_post('task/create', payload)
+    
+    if response.status_code == 200 or response.status_code == 201:
+        # Задача могла создаться - повтор сначала поищет её (find_planfix_task), а не создаст вторую
+        task_id = response_json(response).get('id')
+        if task_id in (None, ''):
+            raise PlanfixError(f'Планфикс не вернул id задачи: {response.text[:200]}')
+        return str(task_id)
+    
+    # 4xx (кроме 408/429) - ошибка в самой задаче, повтор не поможет
+    retryable = response.status_code >= 500 or response.status_code in (408, 429)
+    raise PlanfixError(
+        f'Ошибка создания задачи в Планфикс: HTTP {response.status_code}: {response.text[:500]}',
+        retryable=retryable
+    )
+
+def find_planfix_task(payload: Dict[str, Any]) -> Optional[str]:
+    '''id задачи с тем же названием (в нём номер заявки) или None; при ошибке поиска - PlanfixError,
+    чтобы не создать дубль вслепую'''
+    response = planfix_post('task/list', {
+        'offset': 0,
+        'pageSize': 10,
+        'fields': 'id,name',
+        'filters': [{'type': TASK_NAME_FILTER_TYPE, 'operator': 'equal', 'value': payload['name']}]
+    })
+    if response.status_code != 200:
+        raise PlanfixError(f'Ошибка поиска задачи в Планфикс: HTTP {response.status_code}: {response.text[:500]}')
+    for task in response_json(response).get('tasks') or []:
+        if isinstance(task, dict) and task.get('name') == payload['name'] and task.get('id') not in (None, ''):
+            return str(task['id'])
+    return None
+
+def handle_drain(database_url: str, query_params: Dict[str, Any]) -> Dict[str, Any]:
+    try:
+        limit = int(query_params.get('limit', DRAIN_DEFAULT_LIMIT))
+        concurrency = int(query_params.get('concurrency', DRAIN_DEFAULT_CONCURRENCY))
+    except ValueError:
+        return error_response(400, 'limit и concurrency должны быть числами')
+    # Взятые задачи заняты до истечения блокировки - прогон берёт не больше, чем успеет
+    if not 1 <= limit <= DRAIN_MAX_LIMIT:
+        return error_response(400, f'limit должен быть от 1 до {DRAIN_MAX_LIMIT}')
+    if not 1 <= concurrency <= DRAIN_MAX_CONCURRENCY:
+        return error_response(400, f'concurrency должен быть от 1 до {DRAIN_MAX_CONCURRENCY}')
+    
+    try:
+        with get_pool(database_url).connection() as conn:
+            stats = drain_queue(
+                conn, create_planfix_task, limit=limit, concurrency=concurrency, find_task=find_planfix_task
+            )
+    except Exception as e:
+        return error_response(500, f'Ошибка обработки очереди: {str(e)}')
+    
+    print(f"Planfix queue drain: {stats}")
+    return json_response(200, {'success': True, **stats})
 
 def handle_webhook(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     try:
         body_data = json.loads(event.get('body', '{}'))
         
+        if isinstance(body_data, list) or 'events' in body_data:
+            events = body_data if isinstance(body_data, list) else body_data.get('events') or []
+            return handle_webhook_batch(events)
+        
         webhook_event = body_data.get('event')
         task = body_data.get('task', {})
         task_id = task.get('id')
@@ -188,73 +296,164 @@ def handle_webhook(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
         task_title = task.get('title', '')
         
         if not webhook_event or not task_id:
-            return {
-                'statusCode': 200,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                'body': json.dumps({'success': True, 'message': 'Webhook accepted but no action needed'}),
-                'isBase64Encoded': False
-            }
+            return json_response(200, {'success': True, 'message': 'Webhook accepted but no action needed'})
         
         order_id = extract_order_id(task_title)
         if not order_id:
-            return {
-                'statusCode': 200,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                'body': json.dumps({'success': True, 'message': 'Not an order task, skipped'}),
-                'isBase64Encoded': False
-            }
+            return json_response(200, {'success': True, 'message': 'Not an order task, skipped'})
         
-        new_status = map_planfix_status_to_order(task_status_name)
+        database_url = os.environ.get('DATABASE_URL')
+        if not database_url:
+            return error_response(500, 'DATABASE_URL не установлен. Добавьте секрет в настройках проекта.')
         
-        update_response = requests.put(
-            f'https://functions.poehali.dev/011a42c8-fcaa-413f-b611-d66cb669ba4e?id={order_id}',
-            json={'status': new_status, 'planfix_task_id': str(task_id)},
-            timeout=10
-        )
+        # Обновляем заявку напрямую в БД, без HTTP-вызова функции orders-api
+        with get_pool(database_url).connection() as conn:
+            mapper = get_status_mapper()
+            mapper.refresh(conn)
+            new_status = mapper.map(task_status_name)
+            if new_status is None:
+                print(f"Planfix webhook: unknown status '{task_status_name}' for {order_id}, order left unchanged")
+                return json_response(200, {
+                    'success': True,
+                    'message': 'Unknown Planfix status, order left unchanged',
+                    'order_id': order_id,
+                    'task_id': task_id,
+                    'planfix_status': task_status_name,
+                    'new_status': None
+                })
+            rows_updated = len(apply_status_updates(conn, [(order_id, new_status, str(task_id))]))
         
-        return {
-            'statusCode': 200,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({
-                'success': True,
-                'message': 'Webhook processed and DB updated',
-                'order_id': order_id,
-                'task_id': task_id,
-                'planfix_status': task_status_name,
-                'new_status': new_status,
-                'db_update_status': update_response.status_code
-            }),
-            'isBase64Encoded': False
-        }
+        return json_response(200, {
+            'success': True,
+            'message': 'Webhook processed and DB updated' if rows_updated else 'Order not found in DB',
+            'order_id': order_id,
+            'task_id': task_id,
+            'planfix_status': task_status_name,
+            'new_status': new_status,
+            'db_update_status': 200 if rows_updated else 404
+        })
     except Exception as e:
-        return {
-            'statusCode': 500,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'error': f'Error processing webhook: {str(e)}'}),
-            'isBase64Encoded': False
-        }
+        return error_response(500, f'Error processing webhook: {str(e)}')
 
-def extract_order_id(title: str) -> str:
-    match = re.search(r'Заявка #([A-Z]+-\d+)', title)
-    if match:
-        return match.group(1)
-    return ''
+def event_time(value: Any) -> Optional[float]:
+    '''timestamp события в секундах эпохи: число или строка-число (секунды или миллисекунды),
+    ISO 8601 или ДД-ММ-ГГГГ ЧЧ:ММ Планфикса; время без пояса считается UTC. None - не разобрать'''
+    if isinstance(value, bool) or value is None:
+        return None
+    if isinstance(value, str):
+        value = value.strip()
+        try:
+            value = float(value)
+        except ValueError:
+            pass
+    if isinstance(value, (int, float)):
+        if not math.isfinite(value):
+            return None
+        return value / 1000 if value > EPOCH_MILLIS_THRESHOLD else float(value)
+    if not isinstance(value, str) or not value:
+        return None
+    for parse in (lambda text: datetime.fromisoformat(text.replace('Z', '+00:00')),
+                  lambda text: datetime.strptime(text, '%d-%m-%Y %H:%M')):
+        try:
+            parsed = parse(value)
+        except ValueError:
+            continue
+        return (parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)).timestamp()
+    return None
 
-def map_planfix_status_to_order(planfix_status: str) -> str:
-    status_mapping = {
-        'новая': 'new',
-        'новое': 'new',
-        'в работе': 'in_progress',
-        'выполняется': 'in_progress',
-        'принято': 'confirmed',
-        'подтверждено': 'confirmed',
-        'завершена': 'completed',
-        'завершено': 'completed',
-        'выполнена': 'completed',
-        'закрыта': 'completed',
-        'отменена': 'cancelled',
-        'отменено': 'cancelled'
-    }
+def event_order(timestamp: Any, position: int) -> tuple:
+    '''Ключ порядка событий пачки: по времени события, события без (или с неразборчивым)
+    timestamp - после них, в порядке прихода'''
+    seconds = event_time(timestamp)
+    return (seconds is None, seconds or 0.0, position)
+
+def handle_webhook_batch(events: List[Any]) -> Dict[str, Any]:
+    latest: Dict[str, Dict[str, Any]] = {}
+    skipped = 0
+    
+    for position, payload in enumerate(events):
+        task = payload.get('task', {}) if isinstance(payload, dict) else {}
+        task_id = task.get('id')
+        order_id = extract_order_id(task.get('title', ''))
+        if not isinstance(payload, dict) or not payload.get('event') or not task_id or not order_id:
+            skipped += 1
+            continue
+        
+        candidate = {
+            'order_id': order_id,
+            'task_id': str(task_id),
+            'planfix_status': task.get('status', {}).get('name', ''),
+            'order': event_order(payload.get('timestamp'), position)
+        }
+        current = latest.get(candidate['task_id'])
+        if current is None or candidate['order'] >= current['order']:
+            latest[candidate['task_id']] = candidate
+    
+    # Две задачи на одну заявку: побеждает самое позднее событие
+    per_order: Dict[str, Dict[str, Any]] = {}
+    for item in sorted(latest.values(), key=lambda item: item['order']):
+        per_order[item['order_id']] = item
     
-    status_lower = planfix_status.lower()
-    return status_mapping.get(status_lower, 'new')
\ No newline at end of file
+    collapsed = len(events) - skipped - len(per_order)
+    
+    updates: List[tuple] = []
+    unknown_status = 0
+    updated_orders: List[str] = []
+    if per_order:
+        database_url = os.environ.get('DATABASE_URL')
+        if not database_url:
+            return error_response(500, 'DATABASE_URL не установлен. Добавьте секрет в настройках проекта.')
+        with get_pool(database_url).connection() as conn:
+            mapper = get_status_mapper()
+            mapper.refresh(conn)
+            for item in per_order.values():
+                new_status = mapper.map(item['planfix_status'])
+                if new_status is None:
+                    unknown_status += 1
+                    continue
+                updates.append((item['order_id'], new_status, item['task_id']))
+            if updates:
+                updated_orders = apply_status_updates(conn, updates)
+    
+    print(f"Planfix webhook batch: received={len(events)}, applied={len(updates)}, "
+          f"collapsed={collapsed}, skipped={skipped}, unknown_status={unknown_status}")
+    return json_response(200, {
+        'success': True,
+        'received': len(events),
+        'applied': len(updates),
+        'collapsed': collapsed,
+        'skipped': skipped,
+        'unknown_status': unknown_status,
+        'updated': len(updated_orders),
+        'not_found': sorted(set(order_id for order_id, _, _ in updates) - set(updated_orders))
+    })
+
+def apply_status_updates(conn, updates: List[tuple]) -> List[str]:
+    '''Один UPDATE ... FROM (VALUES ...) на все заявки; возвращает order_uid обновлённых'''
+    cur = conn.cursor()
+    # Прежние статусы под блокировкой: в журнал идут только заявки, у которых статус сменился
+    previous = lock_statuses(cur, [order_uid for order_uid, _, _ in updates])
+    updated = execute_values(cur, """
+        UPDATE t_p78209571_electric_service_aut.orders AS o
+        SET status = v.status, planfix_task_id = v.task_id, updated_at = NOW(), version = o.version + 1
+        FROM (VALUES %s) AS v(order_uid, status, task_id)
+        WHERE o.order_uid = v.order_uid
+        RETURNING o.order_uid
+    """, updates, fetch=True)
+    cancelled = [order_uid for order_uid, status, _ in updates if status == 'cancelled']
+    if cancelled:
+        # Отменённая заявка освобождает забронированные слоты исполнителя
+        cur.execute("""
+            UPDATE t_p78209571_electric_service_aut.executor_calendar SET order_id = NULL, is_available = true
+            WHERE order_id IN (SELECT id FROM t_p78209571_electric_service_aut.orders WHERE order_uid = ANY(%s))
+        """, (cancelled,))
+    record_status_changes(cur, [
+        (previous[order_uid][0], status, f'Planfix task {task_id}')
+        for order_uid, status, task_id in updates
+        if order_uid in previous and previous[order_uid][1] != status
+    ], 'planfix')
+    conn.commit()
+    cur.close()
+    updated_uids = [order_uid for (order_uid,) in updated]
+    get_order_cache().invalidate(updated_uids)
+    return updated_uids
@@ -0,0 +1,166 @@
+'''
+Business: Кэш ответов GET /?id= на тёплом инстансе: LRU с TTL по order_uid и сброс при записи
+Args: ORDER_CACHE_SIZE (1000 заявок, 0 - выключен), ORDER_CACHE_TTL (30 секунд),
+      ORDER_CACHE_SHARED_URL (необязательно, redis://... - общий сброс для всех инстансов)
+Returns: Закэшированное тело заявки с ETag или None; счётчики hits/misses/evictions
+
+Без общего хранилища запись сбрасывает кэш только своего инстанса, на остальных заявка
+может устареть не дольше ORDER_CACHE_TTL. С ORDER_CACHE_SHARED_URL каждая запись
+увеличивает эпоху заявки в общем хранилище (INCR), а попадание в локальный кэш сверяет
+свою эпоху с общей (GET) - сброс сразу виден всем инстансам, и orders-api, и planfix.
+Тела заявок в общее хранилище не пишутся: одно короткое число на попадание вместо
+выборки заявки с JSONB-полями и сериализации. redis-py импортируется, только если задан
+ORDER_CACHE_SHARED_URL, - не на холодном старте.
+
+Эпоха запоминается до чтения заявки из БД (fill_token): если запись успела
+закоммититься между чтением и put, кэш сохранит заявку со старой эпохой, и следующее
+попадание её отбросит. Общее хранилище подключается любое - объект с read(order_uid)
+и bump(order_uids).
+
+Модуль лежит одинаковой копией в orders-api и planfix.
+'''
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional, Tuple
+
+CACHE_SIZE = int(os.environ.get('ORDER_CACHE_SIZE', '1000'))
+CACHE_TTL_SECONDS = float(os.environ.get('ORDER_CACHE_TTL', '30'))
+SHARED_URL = os.environ.get('ORDER_CACHE_SHARED_URL', '')
+SHARED_TIMEOUT_SECONDS = 0.2
+EPOCH_KEY_PREFIX = 'orders-api:order-epoch:'
+
+class CachedOrder:
+    __slots__ = ('body', 'etag', 'fields', 'epoch', 'expires_at')
+
+    def __init__(self, body: str, etag: str, fields: Dict[str, Any], epoch: Optional[int], expires_at: float):
+        self.body = body
+        self.etag = etag
+        self.fields = fields
+        self.epoch = epoch
+        self.expires_at = expires_at
+
+class RedisEpochs:
+    '''Эпохи заявок в Redis; ключ живёт дольше локального TTL, иначе после его истечения
+    старая запись с эпохой 0 снова совпала бы с общей'''
+    def __init__(self, client: Any, key_ttl_seconds: int):
+        self.client = client
+        self.key_ttl_seconds = key_ttl_seconds
+
+    def read(self, order_uid: str) -> int:
+        return int(self.client.get(EPOCH_KEY_PREFIX + order_uid) or 0)
+
+    def bump(self, order_uids: List[str]) -> None:
+        pipe = self.client.pipeline(transaction=False)
+        for order_uid in order_uids:
+            pipe.incr(EPOCH_KEY_PREFIX + order_uid)
+            pipe.expire(EPOCH_KEY_PREFIX + order_uid, self.key_ttl_seconds)
+        pipe.execute()
+
+class OrderCache:
+    def __init__(self, max_entries: int = CACHE_SIZE, ttl_seconds: float = CACHE_TTL_SECONDS, shared: Any = None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.shared = shared
+        self.entries: 'OrderedDict[str, CachedOrder]' = OrderedDict()
+        self.writes = 0
+        self._lock = threading.Lock()
+        self.stats: Dict[str, int] = {
+            'hits': 0, 'misses': 0, 'evictions': 0, 'expired': 0, 'stale': 0,
+            'invalidations': 0, 'shared_errors': 0
+        }
+
+    def get(self, order_uid: str) -> Optional[CachedOrder]:
+        if self.max_entries <= 0:
+            return None
+        with self._lock:
+            entry = self.entries.get(order_uid)
+            if entry is not None and time.monotonic() >= entry.expires_at:
+                del self.entries[order_uid]
+                self.stats['expired'] += 1
+                entry = None
+            if entry is None:
+                self.stats['misses'] += 1
+                return None
+            self.entries.move_to_end(order_uid)
+
+        if self.shared is not None:
+            epoch = self._read_epoch(order_uid)
+            if epoch is None or epoch != entry.epoch:
+                with self._lock:
+                    if self.entries.get(order_uid) is entry:
+                        del self.entries[order_uid]
+                    self.stats['stale' if epoch is not None else 'misses'] += 1
+                return None
+
+        with self._lock:
+            self.stats['hits'] += 1
+        return entry
+
+    def fill_token(self, order_uid: str) -> Tuple[int, Optional[int]]:
+        '''Брать до чтения заявки из БД и передать в put'''
+        epoch = self._read_epoch(order_uid) if self.shared is not None else None
+        return self.writes, epoch
+
+    def put(self, order_uid: str, body: str, etag: str, fields: Dict[str, Any], token: Tuple[int, Optional[int]]) -> None:
+        writes, epoch = token
+        if self.max_entries <= 0 or (self.shared is not None and epoch is None):
+            return
+        with self._lock:
+            # Пока заявку читали, на этом инстансе что-то записали - не рискуем
+            if writes != self.writes:
+                return
+            self.entries[order_uid] = CachedOrder(body, etag, fields, epoch, time.monotonic() + self.ttl_seconds)
+            self.entries.move_to_end(order_uid)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.stats['evictions'] += 1
+
+    def invalidate(self, order_uids: List[str]) -> None:
+        '''Вызывать после COMMIT записи'''
+        if not order_uids:
+            return
+        with self._lock:
+            self.writes += 1
+            for order_uid in order_uids:
+                self.entries.pop(order_uid, None)
+            self.stats['invalidations'] += len(order_uids)
+        if self.shared is not None:
+            try:
+                self.shared.bump(list(order_uids))
+            except Exception as e:
+                self.stats['shared_errors'] += 1
+                print(f"Order cache: shared invalidation failed for {len(order_uids)} orders: {str(e)}")
+
+    def _read_epoch(self, order_uid: str) -> Optional[int]:
+        try:
+            return self.shared.read(order_uid)
+        except Exception as e:
+            self.stats['shared_errors'] += 1
+            print(f"Order cache: shared epoch read failed: {str(e)}")
+            return None
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self.stats, size=len(self.entries), max_entries=self.max_entries,
+                        ttl_seconds=self.ttl_seconds, shared=self.shared is not None)
+
+def shared_backend_from_env() -> Any:
+    if not SHARED_URL:
+        return None
+    try:
+        import redis
+    except ImportError:
+        print('Order cache: ORDER_CACHE_SHARED_URL is set but redis is not installed, using local cache only')
+        return None
+    client = redis.Redis.from_url(
+        SHARED_URL, socket_timeout=SHARED_TIMEOUT_SECONDS, socket_connect_timeout=SHARED_TIMEOUT_SECONDS
+    )
+    return RedisEpochs(client, int(CACHE_TTL_SECONDS * 2) + 1)
+
+_cache = OrderCache(shared=shared_backend_from_env())
+
+def get_order_cache() -> OrderCache:
+    return _cache
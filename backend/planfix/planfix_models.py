@@ -0,0 +1,21 @@
+'''
+Business: Модель заявки, которую фронтенд присылает для создания задачи в Планфиксе
+Args: dict из JSON-тела POST /
+Returns: Проверенный OrderData (или исключение pydantic)
+
+Импортируется только при постановке задачи: webhook и воркер очереди обходятся
+без pydantic, и холодный старт на них не платит за построение схем.
+'''
+
+from pydantic import BaseModel, Field
+
+class OrderData(BaseModel):
+    order_id: str = Field(..., min_length=1)
+    customer_name: str
+    customer_phone: str
+    address: str
+    date: str
+    time: str
+    total_amount: float
+    items: list
+    status: str
@@ -0,0 +1,53 @@
+'''
+Business: Журнал смен статуса заявок order_status_history (только добавление строк)
+Args: cur - курсор транзакции, в которой меняется статус; смены (order_id, status, comment), автор
+Returns: Число записанных строк журнала
+
+Строки пишутся в той же транзакции, что и UPDATE заявки, поэтому журнал не расходится
+с orders.status. Каждая строка хранит прежний статус и время в нём (previous_status,
+previous_seconds) - отчёт о времени в статусах не пересчитывает интервалы по всему журналу.
+Заявка при смене статуса заблокирована FOR UPDATE, так что последняя строка её журнала
+не меняется между чтением и вставкой.
+Модуль лежит одинаковой копией в orders-api и planfix.
+'''
+
+from typing import Dict, List, Optional, Tuple
+from psycopg2.extras import execute_values
+
+STATUS_HISTORY_TABLE = 't_p78209571_electric_service_aut.order_status_history'
+ORDERS_TABLE = 't_p78209571_electric_service_aut.orders'
+CHANGED_BY_MAX_LENGTH = 50
+
+def lock_statuses(cur, order_uids: List[str]) -> Dict[str, Tuple[int, Optional[str]]]:
+    '''order_uid -> (id, текущий статус) под FOR UPDATE; статус не сменится до конца транзакции'''
+    if not order_uids:
+        return {}
+    cur.execute(
+        f"SELECT order_uid, id, status FROM {ORDERS_TABLE} WHERE order_uid = ANY(%s) ORDER BY id FOR UPDATE",
+        (list(order_uids),)
+    )
+    return {order_uid: (order_id, status) for order_uid, order_id, status in cur.fetchall()}
+
+def record_status_changes(cur, changes: List[Tuple[int, str, Optional[str]]], changed_by: str) -> int:
+    '''changes - [(order_id, новый статус, комментарий)]; одна пачка INSERT на все смены.
+    previous_status и previous_seconds берутся из последней строки журнала заявки'''
+    if not changes:
+        return 0
+    execute_values(
+        cur,
+        f"""
+        INSERT INTO {STATUS_HISTORY_TABLE} (
+            order_id, status, comment, changed_by, created_at, previous_status, previous_seconds
+        )
+        SELECT v.order_id, v.status, v.comment, v.changed_by, NOW(),
+               last.status, EXTRACT(EPOCH FROM NOW() - last.created_at)::integer
+        FROM (VALUES %s) AS v(order_id, status, comment, changed_by)
+        LEFT JOIN LATERAL (
+            SELECT p.status, p.created_at FROM {STATUS_HISTORY_TABLE} p
+            WHERE p.order_id = v.order_id ORDER BY p.created_at DESC, p.id DESC LIMIT 1
+        ) AS last ON true
+        """,
+        [(order_id, status, comment, changed_by[:CHANGED_BY_MAX_LENGTH]) for order_id, status, comment in changes],
+        template="(%s::integer, %s::varchar, %s::text, %s::varchar)"
+    )
+    return len(changes)
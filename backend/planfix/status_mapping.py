@@ -0,0 +1,102 @@
+'''
+Business: Соответствие статусов Планфикса статусам заявок и разбор ID заявки из названия задачи
+Args: conn - соединение psycopg2 для подгрузки таблицы planfix_status_mapping
+Returns: Статус заявки (или None для неизвестного статуса) и order_id из заголовка
+
+Таблица соответствий живёт в БД и перечитывается не чаще раза в
+PLANFIX_STATUS_MAPPING_TTL секунд (по умолчанию 300) на тёплый инстанс.
+Встроенный DEFAULT_STATUS_MAPPING используется, пока таблица пуста или недоступна.
+Неизвестный статус больше не превращается в 'new' - заявка остаётся как есть.
+'''
+
+import os
+import re
+import time
+from functools import lru_cache
+from typing import Dict, Optional
+
+DEFAULT_STATUS_MAPPING = {
+    'новая': 'new',
+    'новое': 'new',
+    'в работе': 'in_progress',
+    'выполняется': 'in_progress',
+    'принято': 'confirmed',
+    'подтверждено': 'confirmed',
+    'завершена': 'completed',
+    'завершено': 'completed',
+    'выполнена': 'completed',
+    'закрыта': 'completed',
+    'отменена': 'cancelled',
+    'отменено': 'cancelled'
+}
+
+ORDER_STATUSES = ('new', 'confirmed', 'in_progress', 'completed', 'cancelled')
+
+MAPPING_TABLE = 't_p78209571_electric_service_aut.planfix_status_mapping'
+MAPPING_TTL_SECONDS = float(os.environ.get('PLANFIX_STATUS_MAPPING_TTL', '300'))
+
+# Форматы названий задач: "Заявка #ORD-123 - Иван", "Заявка № ORD-123", "[ORD-123] ...", "Order #ORD-123"
+ORDER_ID_PATTERN = re.compile(
+    r'(?:Заявка\s*(?:#|№)\s*|Order\s*#\s*|\[)([A-Z]+-\d+)\]?',
+    re.IGNORECASE
+)
+
+_WHITESPACE = re.compile(r'\s+')
+
+def normalize_status(name: str) -> str:
+    return _WHITESPACE.sub(' ', name.strip().lower().replace('ё', 'е'))
+
+class StatusMapper:
+    def __init__(self, ttl_seconds: float = MAPPING_TTL_SECONDS):
+        self.ttl_seconds = ttl_seconds
+        self.mapping: Dict[str, str] = {normalize_status(k): v for k, v in DEFAULT_STATUS_MAPPING.items()}
+        # Сырое название из webhook -> статус; в потоке событий названий единицы
+        self._resolved: Dict[str, Optional[str]] = {}
+        self.loaded_at = 0.0
+        self.source = 'default'
+
+    def refresh(self, conn) -> None:
+        '''Перечитывает таблицу соответствий, если истёк TTL; ошибки БД не ломают webhook'''
+        if time.monotonic() - self.loaded_at < self.ttl_seconds:
+            return
+        self.loaded_at = time.monotonic()
+        try:
+            cur = conn.cursor()
+            cur.execute(f"SELECT planfix_status, order_status FROM {MAPPING_TABLE} WHERE is_active")
+            rows = cur.fetchall()
+            cur.close()
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            print(f"Planfix status mapping: using cached table, reload failed: {str(e)}")
+            return
+
+        if rows:
+            self.mapping = {
+                normalize_status(planfix_status): order_status
+                for planfix_status, order_status in rows
+                if order_status in ORDER_STATUSES
+            }
+            self._resolved = {}
+            self.source = 'db'
+
+    def map(self, planfix_status: str) -> Optional[str]:
+        try:
+            return self._resolved[planfix_status]
+        except KeyError:
+            status = self.mapping.get(normalize_status(planfix_status))
+            if len(self._resolved) < 1024:
+                self._resolved[planfix_status] = status
+            return status
+
+_mapper = StatusMapper()
+
+def get_status_mapper() -> StatusMapper:
+    return _mapper
+
+@lru_cache(maxsize=4096)
+def extract_order_id(title: str) -> str:
+    match = ORDER_ID_PATTERN.search(title)
+    if match:
+        return match.group(1).upper()
+    return ''
@@ -0,0 +1,159 @@
+'''
+Business: Очередь (outbox) создания задач в Планфиксе поверх PostgreSQL
+Args: conn - соединение psycopg2, create_task - функция отправки payload в Планфикс
+Returns: Состояние задачи в очереди и статистику прогона воркера
+
+Одна строка на order_id (UNIQUE), поэтому повторная отправка заявки не создаёт
+вторую задачу: пока строка pending/processing - она просто ждёт воркера, а после
+успеха хранит planfix_task_id. Неудачные попытки откладываются с экспоненциальной
+задержкой, после PLANFIX_QUEUE_MAX_ATTEMPTS строка переходит в failed.
+
+Прошлая попытка могла создать задачу, не дождавшись ответа (таймаут, обрыв, 200 без id,
+воркер упал и строку забрал другой). Поэтому со второй попытки воркер сначала ищет уже
+созданную задачу (find_task) и создаёт новую, только если её нет.
+'''
+
+import json
+import os
+import random
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Callable, Optional
+import psycopg2.extras
+from order_cache import get_order_cache
+
+QUEUE_TABLE = 't_p78209571_electric_service_aut.planfix_task_queue'
+ORDERS_TABLE = 't_p78209571_electric_service_aut.orders'
+
+MAX_ATTEMPTS = int(os.environ.get('PLANFIX_QUEUE_MAX_ATTEMPTS', '8'))
+BACKOFF_BASE_SECONDS = float(os.environ.get('PLANFIX_QUEUE_BACKOFF_BASE', '5'))
+BACKOFF_MAX_SECONDS = float(os.environ.get('PLANFIX_QUEUE_BACKOFF_MAX', '3600'))
+LOCK_TIMEOUT_SECONDS = int(os.environ.get('PLANFIX_QUEUE_LOCK_TIMEOUT', '300'))
+
+class PlanfixError(Exception):
+    def __init__(self, message: str, retryable: bool = True):
+        super().__init__(message)
+        self.retryable = retryable
+
+class ExistingTask(str):
+    '''id задачи, найденной в Планфиксе вместо создания новой'''
+
+def enqueue_task(conn, order_id: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+    '''Ставит задачу в очередь; для уже известного order_id возвращает текущее состояние'''
+    cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+    cur.execute(f"""
+        INSERT INTO {QUEUE_TABLE} AS q (order_id, payload, status, attempts, next_attempt_at, created_at, updated_at)
+        VALUES (%s, %s, 'pending', 0, NOW(), NOW(), NOW())
+        ON CONFLICT (order_id) DO UPDATE SET
+            payload = CASE WHEN q.status IN ('pending', 'failed') THEN EXCLUDED.payload ELSE q.payload END,
+            attempts = CASE WHEN q.status = 'failed' THEN 0 ELSE q.attempts END,
+            next_attempt_at = CASE WHEN q.status = 'failed' THEN NOW() ELSE q.next_attempt_at END,
+            status = CASE WHEN q.status = 'failed' THEN 'pending' ELSE q.status END,
+            updated_at = NOW()
+        RETURNING id, order_id, status, attempts, planfix_task_id, (xmax = 0) AS created
+    """, (order_id, json.dumps(payload, ensure_ascii=False)))
+    row = dict(cur.fetchone())
+    conn.commit()
+    cur.close()
+    return row
+
+def claim_tasks(conn, limit: int) -> List[Dict[str, Any]]:
+    '''Забирает готовые к отправке строки; SKIP LOCKED позволяет запускать воркеры параллельно'''
+    cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+    cur.execute(f"""
+        UPDATE {QUEUE_TABLE} SET
+            status = 'processing',
+            locked_at = NOW(),
+            attempts = attempts + 1,
+            updated_at = NOW()
+        WHERE id IN (
+            SELECT id FROM {QUEUE_TABLE}
+            WHERE (status = 'pending' AND next_attempt_at <= NOW())
+               OR (status = 'processing' AND locked_at < NOW() - make_interval(secs => %s))
+            ORDER BY next_attempt_at
+            LIMIT %s
+            FOR UPDATE SKIP LOCKED
+        )
+        RETURNING id, order_id, payload, attempts
+    """, (LOCK_TIMEOUT_SECONDS, limit))
+    rows = [dict(row) for row in cur.fetchall()]
+    conn.commit()
+    cur.close()
+    return rows
+
+def mark_done(conn, queue_id: int, order_id: str, task_id: str) -> None:
+    cur = conn.cursor()
+    cur.execute(f"""
+        UPDATE {QUEUE_TABLE} SET
+            status = 'done', planfix_task_id = %s, locked_at = NULL, last_error = NULL, updated_at = NOW()
+        WHERE id = %s
+    """, (task_id, queue_id))
+    cur.execute(
+        f"UPDATE {ORDERS_TABLE} SET planfix_task_id = %s, updated_at = NOW(), version = version + 1 WHERE order_uid = %s",
+        (task_id, order_id)
+    )
+    order_updated = cur.rowcount > 0
+    conn.commit()
+    cur.close()
+    # Как apply_status_updates: orders-api не должен отдавать заявку без planfix_task_id из кэша
+    if order_updated:
+        get_order_cache().invalidate([order_id])
+
+def mark_failed(conn, queue_id: int, attempts: int, error: PlanfixError) -> str:
+    '''Откладывает повтор с экспоненциальной задержкой или переводит строку в failed'''
+    dead = not error.retryable or attempts >= MAX_ATTEMPTS
+    delay = min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * (2 ** (attempts - 1)))
+    delay *= random.uniform(0.5, 1.0)
+
+    cur = conn.cursor()
+    cur.execute(f"""
+        UPDATE {QUEUE_TABLE} SET
+            status = %s,
+            next_attempt_at = NOW() + make_interval(secs => %s),
+            locked_at = NULL,
+            last_error = %s,
+            updated_at = NOW()
+        WHERE id = %s
+    """, ('failed' if dead else 'pending', delay, str(error)[:2000], queue_id))
+    conn.commit()
+    cur.close()
+    return 'failed' if dead else 'retry'
+
+def drain_queue(conn, create_task: Callable[[Dict[str, Any]], str],
+                limit: int = 50, concurrency: int = 4,
+                find_task: Optional[Callable[[Dict[str, Any]], Optional[str]]] = None) -> Dict[str, Any]:
+    '''
+    Отправляет до limit задач, не более concurrency запросов к Планфиксу одновременно.
+    HTTP-вызовы идут в потоках, а запись результатов - в этом же соединении последовательно.
+    find_task(payload) - id задачи, созданной прошлой попыткой, или None.
+    '''
+    tasks = claim_tasks(conn, limit)
+    stats: Dict[str, Any] = {'claimed': len(tasks), 'done': 0, 'retry': 0, 'failed': 0, 'found_existing': 0}
+    if not tasks:
+        return stats
+
+    def send(task: Dict[str, Any]) -> Optional[Any]:
+        try:
+            # attempts уже учитывает эту попытку: > 1 - задачу могли создать раньше
+            if find_task is not None and task['attempts'] > 1:
+                existing = find_task(task['payload'])
+                if existing:
+                    return ExistingTask(existing)
+            return create_task(task['payload'])
+        except PlanfixError as e:
+            return e
+        except Exception as e:
+            return PlanfixError(str(e))
+
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+        results = list(executor.map(send, tasks))
+
+    for task, result in zip(tasks, results):
+        if isinstance(result, PlanfixError):
+            stats[mark_failed(conn, task['id'], task['attempts'], result)] += 1
+        else:
+            if isinstance(result, ExistingTask):
+                stats['found_existing'] += 1
+            mark_done(conn, task['id'], task['order_id'], str(result))
+            stats['done'] += 1
+
+    return stats
@@ -0,0 +1,32 @@
+'''
+Business: Доступ к служебным воркерам (POST /?drain=true) по общему секрету
+Args: WORKER_SECRET из переменных окружения, заголовки запроса
+Returns: None, если в X-Worker-Secret передан секрет, иначе WorkerAuthError
+
+Воркер вызывает расписание, а не пользователь, поэтому токен сессии ему не нужен -
+достаточно секрета, который знают только функция и настройки расписания. Без
+WORKER_SECRET воркер не запускается: открытый воркер позволил бы любому забрать очередь.
+
+Модуль лежит одинаковой копией в send-email и planfix.
+'''
+
+import hmac
+import os
+from typing import Dict, Any, Optional
+
+WORKER_SECRET_HEADER = 'X-Worker-Secret'
+
+class WorkerAuthError(Exception):
+    pass
+
+def verify_worker(headers: Optional[Dict[str, Any]]) -> None:
+    secret = os.environ.get('WORKER_SECRET', '')
+    if not secret:
+        # Ошибка конфигурации - вызывающий отвечает 500, а не 401
+        raise RuntimeError('WORKER_SECRET not configured')
+    lowered = WORKER_SECRET_HEADER.lower()
+    provided = next((value for name, value in (headers or {}).items() if name.lower() == lowered and value), '')
+    if not provided:
+        raise WorkerAuthError(f'{WORKER_SECRET_HEADER} header is required')
+    if not hmac.compare_digest(secret.encode(), provided.strip().encode('utf-8', 'surrogateescape')):
+        raise WorkerAuthError('Invalid worker secret')
@@ -0,0 +1,199 @@
+'''
+Business: Очередь исходящих писем (outbox) поверх PostgreSQL
+Args: conn - соединение psycopg2, send - функция отправки одного письма
+Returns: id поставленных писем, статистику прогона воркера и состояние очереди
+
+Обработчики только кладут письма в email_outbox и сразу отвечают; воркер
+(send-email POST /?drain=true) отправляет их с ограничением скорости на провайдера
+(EMAIL_RATE_LIMITS, например "yandex=2" - писем в секунду), повторяет временные
+ошибки с экспоненциальной задержкой и после EMAIL_OUTBOX_MAX_ATTEMPTS попыток
+или постоянной ошибки (5xx SMTP) переводит письмо в dead.
+
+Письмо ставится либо готовым (subject, html), либо шаблоном (template, variables):
+тогда тему и HTML рендерит воркер send-email, где лежит email_templates.
+
+Модуль лежит одинаковой копией в send-email и send-feedback.
+'''
+
+import os
+import random
+import threading
+import time
+from typing import Dict, Any, List, Callable
+import psycopg2.extras
+from psycopg2.extras import execute_values, Json
+
+OUTBOX_TABLE = 't_p78209571_electric_service_aut.email_outbox'
+
+MAX_ATTEMPTS = int(os.environ.get('EMAIL_OUTBOX_MAX_ATTEMPTS', '6'))
+BACKOFF_BASE_SECONDS = float(os.environ.get('EMAIL_OUTBOX_BACKOFF_BASE', '30'))
+BACKOFF_MAX_SECONDS = float(os.environ.get('EMAIL_OUTBOX_BACKOFF_MAX', '3600'))
+LOCK_TIMEOUT_SECONDS = int(os.environ.get('EMAIL_OUTBOX_LOCK_TIMEOUT', '300'))
+DEFAULT_RATE_PER_SECOND = 2.0
+
+class DeliveryError(Exception):
+    def __init__(self, message: str, retryable: bool = True):
+        super().__init__(message)
+        self.retryable = retryable
+
+class RateLimiter:
+    '''Token bucket: не больше rate писем в секунду с запасом burst'''
+    def __init__(self, rate: float, burst: float = 1):
+        self.rate = rate
+        self.capacity = max(1.0, burst)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> float:
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            wait = 0.0
+            if self.tokens < 1:
+                wait = (1 - self.tokens) / self.rate
+                time.sleep(wait)
+                self.updated = time.monotonic()
+                self.tokens = 1
+            self.tokens -= 1
+            return wait
+
+def parse_rate_limits(raw: str) -> Dict[str, float]:
+    limits: Dict[str, float] = {}
+    for part in raw.split(','):
+        if '=' in part:
+            provider, rate = part.split('=', 1)
+            limits[provider.strip()] = float(rate)
+    return limits
+
+_limiters: Dict[str, RateLimiter] = {}
+
+def get_rate_limiter(provider: str) -> RateLimiter:
+    if provider not in _limiters:
+        limits = parse_rate_limits(os.environ.get('EMAIL_RATE_LIMITS', ''))
+        _limiters[provider] = RateLimiter(limits.get(provider, DEFAULT_RATE_PER_SECOND))
+    return _limiters[provider]
+
+def enqueue_emails(conn, messages: List[Dict[str, Any]], source: str, provider: str = 'yandex') -> List[int]:
+    '''messages: [{to, subject, html}] или [{to, template, variables, subject?}]; все письма ставятся одной вставкой'''
+    cur = conn.cursor()
+    ids = execute_values(cur, f"""
+        INSERT INTO {OUTBOX_TABLE} (source, provider, to_email, subject, html, template, variables, status, next_attempt_at, created_at)
+        VALUES %s
+        RETURNING id
+    """, [
+        (source, provider, message['to'],
+         message.get('subject') or (None if message.get('template') else 'Уведомление'),
+         message.get('html'), message.get('template'), Json(message.get('variables') or {}) if message.get('template') else None)
+        for message in messages
+    ], template="(%s, %s, %s, %s, %s, %s, %s, 'pending', NOW(), NOW())", fetch=True)
+    conn.commit()
+    cur.close()
+    return [row[0] for row in ids]
+
+def claim_emails(conn, limit: int) -> List[Dict[str, Any]]:
+    cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+    cur.execute(f"""
+        UPDATE {OUTBOX_TABLE} SET
+            status = 'processing',
+            locked_at = NOW(),
+            attempts = attempts + 1
+        WHERE id IN (
+            SELECT id FROM {OUTBOX_TABLE}
+            WHERE (status = 'pending' AND next_attempt_at <= NOW())
+               OR (status = 'processing' AND locked_at < NOW() - make_interval(secs => %s))
+            ORDER BY next_attempt_at
+            LIMIT %s
+            FOR UPDATE SKIP LOCKED
+        )
+        RETURNING id, provider, to_email, subject, html, template, variables, attempts
+    """, (LOCK_TIMEOUT_SECONDS, limit))
+    rows = [dict(row) for row in cur.fetchall()]
+    conn.commit()
+    cur.close()
+    return rows
+
+def mark_sent(conn, email_id: int, send_ms: float) -> None:
+    cur = conn.cursor()
+    cur.execute(f"""
+        UPDATE {OUTBOX_TABLE} SET
+            status = 'sent', sent_at = NOW(), send_ms = %s, locked_at = NULL, last_error = NULL
+        WHERE id = %s
+    """, (send_ms, email_id))
+    conn.commit()
+    cur.close()
+
+def mark_failed(conn, email_id: int, attempts: int, error: DeliveryError) -> str:
+    dead = not error.retryable or attempts >= MAX_ATTEMPTS
+    delay = min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * (2 ** (attempts - 1)))
+    delay *= random.uniform(0.5, 1.0)
+
+    cur = conn.cursor()
+    cur.execute(f"""
+        UPDATE {OUTBOX_TABLE} SET
+            status = %s,
+            next_attempt_at = NOW() + make_interval(secs => %s),
+            locked_at = NULL,
+            last_error = %s
+        WHERE id = %s
+    """, ('dead' if dead else 'pending', delay, str(error)[:2000], email_id))
+    conn.commit()
+    cur.close()
+    return 'dead' if dead else 'retry'
+
+def drain_outbox(conn, send: Callable[[Dict[str, Any]], None], limit: int = 50) -> Dict[str, Any]:
+    '''Письма уходят последовательно через одну SMTP-сессию, с паузами лимитера провайдера'''
+    emails = claim_emails(conn, limit)
+    stats: Dict[str, Any] = {'claimed': len(emails), 'sent': 0, 'retry': 0, 'dead': 0, 'throttled_ms': 0.0}
+
+    for email in emails:
+        stats['throttled_ms'] += get_rate_limiter(email['provider']).acquire() * 1000
+        started = time.perf_counter()
+        try:
+            send(email)
+        except DeliveryError as e:
+            stats[mark_failed(conn, email['id'], email['attempts'], e)] += 1
+            continue
+        except Exception as e:
+            stats[mark_failed(conn, email['id'], email['attempts'], DeliveryError(str(e)))] += 1
+            continue
+        mark_sent(conn, email['id'], round((time.perf_counter() - started) * 1000, 2))
+        stats['sent'] += 1
+
+    stats['throttled_ms'] = round(stats['throttled_ms'], 2)
+    return stats
+
+def outbox_stats(conn) -> Dict[str, Any]:
+    '''Глубина очереди по статусам и перцентили задержек отправки за последний час'''
+    cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+    cur.execute(f"""
+        SELECT status, count(*) AS total,
+               EXTRACT(EPOCH FROM NOW() - min(created_at)) AS oldest_age_seconds
+        FROM {OUTBOX_TABLE}
+        WHERE status <> 'sent'
+        GROUP BY status
+    """)
+    depth = {row['status']: {'total': row['total'], 'oldest_age_seconds': float(row['oldest_age_seconds'] or 0)}
+             for row in cur.fetchall()}
+
+    cur.execute(f"""
+        SELECT count(*) AS sent,
+               percentile_cont(0.5) WITHIN GROUP (ORDER BY send_ms) AS send_p50_ms,
+               percentile_cont(0.95) WITHIN GROUP (ORDER BY send_ms) AS send_p95_ms,
+               percentile_cont(0.99) WITHIN GROUP (ORDER BY send_ms) AS send_p99_ms,
+               percentile_cont(0.5) WITHIN GROUP (ORDER BY EXTRACT(EPOCH FROM sent_at - created_at)) AS delivery_p50_seconds,
+               percentile_cont(0.95) WITHIN GROUP (ORDER BY EXTRACT(EPOCH FROM sent_at - created_at)) AS delivery_p95_seconds
+        FROM {OUTBOX_TABLE}
+        WHERE status = 'sent' AND sent_at > NOW() - INTERVAL '1 hour'
+    """)
+    latency = {key: (round(float(value), 3) if value is not None else None) for key, value in cur.fetchone().items()}
+    latency['sent'] = int(latency['sent'])
+    cur.close()
+    conn.commit()
+
+    return {
+        'queue_depth': sum(item['total'] for status, item in depth.items() if status in ('pending', 'processing')),
+        'by_status': depth,
+        'last_hour': latency
+    }
@@ -0,0 +1,282 @@
+'''
+Business: Серверные шаблоны писем (order-created, status-changed, feedback)
+Args: имя шаблона и словарь переменных от вызывающей стороны
+Returns: (subject, html) готового письма; значения в HTML экранируются
+
+Шаблон разбирается и компилируется в Python-функцию один раз на тёплый инстанс,
+дальше рендер - это только склейка строк. Синтаксис:
+- {{ name }}, {{ item.price|money }} - вставка с экранированием HTML
+- {{ html_fragment|raw }} - вставка без экранирования (только для доверенных данных)
+- {% if name %}...{% else %}...{% endif %}, {% for item in items %}...{% endfor %}
+Фильтры: money (1 234 567), status (подпись статуса заявки), raw.
+
+Шаблоны рендерит только send-email: send-feedback ставит в email_outbox
+имя шаблона и переменные, HTML собирает воркер send-email ?drain=true.
+'''
+
+import keyword
+import re
+from html import escape
+from typing import Dict, Any, List, Callable, Tuple
+
+STATUS_LABELS = {
+    'new': '🆕 Новая',
+    'pending': '⏳ Ожидает подтверждения',
+    'confirmed': '✅ Подтверждена',
+    'in_progress': '🔧 В работе',
+    'in-progress': '🔧 В работе',
+    'completed': '✔️ Завершена',
+    'cancelled': '❌ Отменена'
+}
+
+ORDER_CREATED_HTML = '''<!DOCTYPE html>
+<html>
+<head>
+  <meta charset="utf-8">
+  <style>
+    body { font-family: Arial, sans-serif; line-height: 1.6; color: #333; }
+    .container { max-width: 600px; margin: 0 auto; padding: 20px; }
+    .header { background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); color: white; padding: 20px; border-radius: 8px 8px 0 0; }
+    .content { background: #f9f9f9; padding: 20px; border-radius: 0 0 8px 8px; }
+    .order-id { font-size: 24px; font-weight: bold; margin: 10px 0; }
+    .info-row { margin: 10px 0; padding: 10px; background: white; border-radius: 4px; }
+    .label { font-weight: bold; color: #667eea; }
+    .items { margin-top: 20px; }
+    .item { background: white; padding: 10px; margin: 5px 0; border-left: 3px solid #667eea; }
+    .footer { margin-top: 20px; padding: 15px; background: #667eea; color: white; text-align: center; border-radius: 4px; }
+  </style>
+</head>
+<body>
+  <div class="container">
+    <div class="header">
+      <h1>🔌 Новая заявка на электромонтаж</h1>
+      <div class="order-id">Заявка #{{ order_number }}</div>
+    </div>
+    <div class="content">
+      {% if customer_name %}<div class="info-row"><span class="label">👤 Клиент:</span> {{ customer_name }}</div>{% endif %}
+      <div class="info-row"><span class="label">📞 Телефон:</span> {{ phone }}</div>
+      <div class="info-row"><span class="label">📍 Адрес:</span> {{ address }}</div>
+      <div class="info-row"><span class="label">📅 Дата и время:</span> {{ date }} в {{ time }}</div>
+      <div class="info-row"><span class="label">💰 Сумма:</span> {{ total_amount|money }} ₽</div>
+      {% if comments %}<div class="info-row"><span class="label">💬 Комментарии:</span> {{ comments }}</div>{% endif %}
+      <div class="items">
+        <h3>Состав заказа:</h3>
+        {% for item in items %}<div class="item">
+          <strong>{{ item.name }}</strong><br>
+          Количество: {{ item.quantity }} шт.{% if item.price %} × {{ item.price|money }} ₽{% endif %} = {{ item.total|money }} ₽
+          {% if item.description %}<br><small>{{ item.description }}</small>{% endif %}
+        </div>{% endfor %}
+      </div>
+      {% if total_switches %}<div class="info-row">
+        <span class="label">📊 Итого:</span><br>
+        Выключателей: {{ total_switches }} шт.<br>
+        Розеток: {{ total_outlets }} шт.<br>
+        Точек: {{ total_points }} шт.<br>
+        Кабеля (оценка): {{ estimated_cable }} м<br>
+        Рамок: {{ estimated_frames }} шт.
+      </div>{% endif %}
+    </div>
+    <div class="footer">
+      {% if created_at %}<p>Создано: {{ created_at }}</p>{% endif %}
+      <p>Статус: <strong>{{ status|status }}</strong></p>
+    </div>
+  </div>
+</body>
+</html>
+'''
+
+STATUS_CHANGED_HTML = '''<!DOCTYPE html>
+<html>
+<head>
+  <meta charset="utf-8">
+  <style>
+    body { font-family: Arial, sans-serif; line-height: 1.6; color: #333; }
+    .container { max-width: 600px; margin: 0 auto; padding: 20px; }
+    .header { background: linear-gradient(135deg, #10b981 0%, #059669 100%); color: white; padding: 20px; border-radius: 8px 8px 0 0; }
+    .content { background: #f9f9f9; padding: 20px; border-radius: 0 0 8px 8px; }
+    .status-change { background: white; padding: 15px; border-radius: 4px; margin: 15px 0; }
+    .old-status { color: #9ca3af; text-decoration: line-through; }
+    .new-status { color: #10b981; font-weight: bold; font-size: 18px; }
+  </style>
+</head>
+<body>
+  <div class="container">
+    <div class="header">
+      <h1>📋 Обновление статуса заявки</h1>
+      <div style="font-size: 20px; margin-top: 10px;">Заявка #{{ order_number }}</div>
+    </div>
+    <div class="content">
+      <div class="status-change">
+        <p>Статус изменён:</p>
+        <div class="old-status">{{ old_status|status }}</div>
+        <div style="font-size: 30px; margin: 10px 0;">↓</div>
+        <div class="new-status">{{ status|status }}</div>
+      </div>
+      <div style="background: white; padding: 15px; border-radius: 4px; margin-top: 15px;">
+        <p><strong>📞 Телефон:</strong> {{ phone }}</p>
+        <p><strong>📍 Адрес:</strong> {{ address }}</p>
+        <p><strong>💰 Сумма:</strong> {{ total_amount|money }} ₽</p>
+        {% if electrician_name %}<p><strong>👷 Исполнитель:</strong> {{ electrician_name }}</p>{% endif %}
+      </div>
+    </div>
+  </div>
+</body>
+</html>
+'''
+
+FEEDBACK_HTML = '''<html>
+  <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333;">
+    <h2 style="color: #f59e0b;">💡 Новая идея от пользователя</h2>
+    <div style="background-color: #fef3c7; padding: 15px; border-radius: 8px; margin: 20px 0;">
+      <p style="font-size: 16px; margin: 0;">{{ feedback_text }}</p>
+    </div>
+    <hr style="border: none; border-top: 1px solid #e5e7eb; margin: 20px 0;">
+    <p style="color: #6b7280; font-size: 14px;">
+      <strong>Время получения:</strong> {{ received_at }}<br>
+      <strong>Request ID:</strong> {{ request_id }}
+    </p>
+  </body>
+</html>
+'''
+
+# Имя шаблона -> (тема, HTML); тема рендерится без экранирования - это заголовок письма, не HTML
+TEMPLATES: Dict[str, Tuple[str, str]] = {
+    'order-created': ('🔌 Новая заявка #{{ order_number }} на {{ total_amount|money }} ₽', ORDER_CREATED_HTML),
+    'status-changed': ('📋 Заявка #{{ order_number }}: {{ status|status }}', STATUS_CHANGED_HTML),
+    'feedback': ('💡 Новая идея от пользователя - {{ received_at_short }}', FEEDBACK_HTML)
+}
+
+class TemplateError(Exception):
+    pass
+
+def format_money(value: Any) -> str:
+    '''Как toLocaleString('ru-RU'): неразрывный пробел между разрядами, запятая в дробной части'''
+    if value is None or value == '':
+        return ''
+    try:
+        number = float(value)
+        if number == int(number):
+            return f'{int(number):,}'.replace(',', '\u00a0')
+    except (TypeError, ValueError, OverflowError):
+        return str(value)
+    return f'{number:,.2f}'.replace(',', '\u00a0').replace('.', ',')
+
+def format_status(value: Any) -> str:
+    return STATUS_LABELS.get(value, '' if value is None else str(value))
+
+FILTERS: Dict[str, Callable[[Any], str]] = {
+    'money': format_money,
+    'status': format_status
+}
+
+def lookup(value: Any, key: str) -> Any:
+    if isinstance(value, dict):
+        return value.get(key)
+    return getattr(value, key, None)
+
+def to_text(value: Any) -> str:
+    return '' if value is None else str(value)
+
+_TOKEN = re.compile(r'(\{\{.*?\}\}|\{%.*?%\})', re.DOTALL)
+# Без ведущего _: из шаблона не достать служебные атрибуты объектов
+_NAME = re.compile(r'[A-Za-z][A-Za-z0-9_]*$')
+_RESERVED = set(keyword.kwlist) | {'ctx', 'escape', 'to_text', 'lookup', 'FILTERS'}
+
+def _compile_expr(expr: str, loop_vars: List[str]) -> Tuple[str, bool]:
+    '''Возвращает (python-выражение, raw) для "name.attr|filter"'''
+    parts = [part.strip() for part in expr.split('|')]
+    path, filters = parts[0].split('.'), parts[1:]
+    if not all(_NAME.match(name) for name in path):
+        raise TemplateError(f'Bad expression: {expr!r}')
+
+    code = path[0] if path[0] in loop_vars else f'ctx.get({path[0]!r})'
+    for attr in path[1:]:
+        code = f'lookup({code}, {attr!r})'
+
+    raw = False
+    for name in filters:
+        if name == 'raw':
+            raw = True
+        elif name in FILTERS:
+            code = f'FILTERS[{name!r}]({code})'
+        else:
+            raise TemplateError(f'Unknown filter: {name!r}')
+    return code, raw
+
+def compile_template(source: str, autoescape: bool = True) -> Callable[[Dict[str, Any]], str]:
+    '''Разбирает шаблон и собирает из него функцию render(ctx) -> str'''
+    lines = ['def render(ctx):', ' _out = []', ' _w = _out.append']
+    indent = 1
+    loop_vars: List[str] = []
+    blocks: List[str] = []
+
+    for token in _TOKEN.split(source):
+        if not token:
+            continue
+        pad = ' ' * indent
+        if token.startswith('{{'):
+            code, raw = _compile_expr(token[2:-2].strip(), loop_vars)
+            if autoescape and not raw:
+                lines.append(f'{pad}_w(escape(to_text({code})))')
+            else:
+                lines.append(f'{pad}_w(to_text({code}))')
+            continue
+        if not token.startswith('{%'):
+            lines.append(f'{pad}_w({token!r})')
+            continue
+
+        words = token[2:-2].split()
+        if not words:
+            raise TemplateError('Empty tag')
+        tag = words[0]
+        if tag == 'if' and len(words) == 2:
+            lines.append(f'{pad}if {_compile_expr(words[1], loop_vars)[0]}:')
+            blocks.append('if')
+            indent += 1
+        elif tag == 'else' and blocks and blocks[-1] == 'if':
+            # pass держит пустую ветку {% if %}{% else %} синтаксически корректной
+            lines.append(f'{pad}pass')
+            lines.append(f'{" " * (indent - 1)}else:')
+        elif tag == 'for' and len(words) == 4 and words[2] == 'in' and _NAME.match(words[1]) and words[1] not in _RESERVED:
+            lines.append(f'{pad}for {words[1]} in ({_compile_expr(words[3], loop_vars)[0]} or ()):')
+            loop_vars.append(words[1])
+            blocks.append('for')
+            indent += 1
+        elif tag in ('endif', 'endfor') and blocks and blocks[-1] == tag[3:]:
+            if blocks.pop() == 'for':
+                loop_vars.pop()
+            lines.append(f'{" " * indent}pass')
+            indent -= 1
+        else:
+            raise TemplateError(f'Bad tag: {token!r}')
+
+    if blocks:
+        raise TemplateError(f'Unclosed {blocks[-1]}')
+    lines.append(" return ''.join(_out)")
+
+    namespace = {'escape': escape, 'to_text': to_text, 'lookup': lookup, 'FILTERS': FILTERS}
+    exec(compile('\n'.join(lines), '<email_template>', 'exec'), namespace)
+    return namespace['render']
+
+_compiled: Dict[str, Tuple[Callable[[Dict[str, Any]], str], Callable[[Dict[str, Any]], str]]] = {}
+
+stats: Dict[str, int] = {'compiled': 0, 'rendered': 0}
+
+def get_template(name: str) -> Tuple[Callable[[Dict[str, Any]], str], Callable[[Dict[str, Any]], str]]:
+    '''Компилирует шаблон при первом обращении, дальше отдаёт из кэша инстанса'''
+    try:
+        return _compiled[name]
+    except KeyError:
+        if name not in TEMPLATES:
+            raise TemplateError(f'Unknown template: {name}')
+        subject, html = TEMPLATES[name]
+        _compiled[name] = (compile_template(subject, autoescape=False), compile_template(html))
+        stats['compiled'] += 1
+        return _compiled[name]
+
+def render_email(name: str, variables: Dict[str, Any]) -> Tuple[str, str]:
+    if not isinstance(variables, dict):
+        raise TemplateError('variables must be an object')
+    render_subject, render_html = get_template(name)
+    stats['rendered'] += 1
+    return render_subject(variables), render_html(variables)
@@ -1,72 +1,113 @@
 '''
 Business: Отправка email уведомлений через Yandex SMTP
 Args: event с body содержащим to, subject, html
-Returns: Статус отправки письма
-Version: 1.1
+      или to, template (order-created, status-changed, feedback), variables - письмо
+      собирается из серверного шаблона, subject необязателен
+      POST /?batch=true - body {"messages": [{to, subject, html} или {to, template, variables}, ...]}
+      POST /?drain=true - воркер очереди: отправляет накопленные письма (limit в query,
+      1..EMAIL_DRAIN_MAX_LIMIT), только с заголовком X-Worker-Secret = WORKER_SECRET;
+      без его вызова по расписанию письма не уходят (EMAIL_SETUP.md)
+      GET /?stats=true - глубина очереди и перцентили задержек отправки
+Returns: Письмо ставится в очередь email_outbox, ответ приходит сразу (queued: true)
+Version: 1.4
 '''
 
 import json
-import smtplib
 import os
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
-from typing import Dict, Any
+from typing import Dict, Any, List, TYPE_CHECKING
+from db import get_pool
+from email_outbox import enqueue_emails, drain_outbox, outbox_stats, DeliveryError
+from email_templates import render_email, TemplateError
+from core import json_response, error_response, options_response
+from worker_auth import verify_worker, WorkerAuthError
+
+if TYPE_CHECKING:
+    from email.mime.multipart import MIMEMultipart
+
+MAX_BATCH_SIZE = 100
+DRAIN_DEFAULT_LIMIT = 50
+DRAIN_MAX_LIMIT = int(os.environ.get('EMAIL_DRAIN_MAX_LIMIT', '100'))
 
 
 def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     method: str = event.get('httpMethod', 'POST')
+    query_params = event.get('queryStringParameters', {}) or {}
     
     # Handle CORS
     if method == 'OPTIONS':
-        return {
-            'statusCode': 200,
-            'headers': {
-                'Access-Control-Allow-Origin': '*',
-                'Access-Control-Allow-Methods': 'POST, OPTIONS',
-                'Access-Control-Allow-Headers': 'Content-Type',
-                'Access-Control-Max-Age': '86400'
-            },
-            'body': ''
-        }
-    
-    if method != 'POST':
-        return {
-            'statusCode': 405,
-            'headers': {'Content-Type': 'application/json'},
-            'body': json.dumps({'error': 'Method not allowed'})
-        }
-    
-    # Parse request
-    body_data = json.loads(event.get('body', '{}'))
-    to_email: str = body_data.get('to', '')
-    subject: str = body_data.get('subject', 'Уведомление')
-    html_content: str = body_data.get('html', '')
+        return options_response('GET, POST, OPTIONS')
     
-    print(f"Получен запрос на отправку email: to={to_email}, subject={subject}")
+    is_stats = method == 'GET' and query_params.get('stats') == 'true'
+    if method != 'POST' and not is_stats:
+        return error_response(405, 'Method not allowed')
     
-    if not to_email or not html_content:
-        return {
-            'statusCode': 400,
-            'headers': {'Content-Type': 'application/json'},
-            'body': json.dumps({'error': 'Missing required fields: to, html'})
-        }
+    database_url = os.environ.get('DATABASE_URL')
+    if not database_url:
+        return error_response(500, 'DATABASE_URL not configured')
     
     # Get credentials from env
     smtp_user = os.environ.get('YANDEX_SMTP_USER', '').strip()
     smtp_password = os.environ.get('YANDEX_SMTP_PASSWORD', '').strip().replace(' ', '')
     
-    print(f"SMTP user: {smtp_user}")
-    print(f"Password length: {len(smtp_password)}")
-    print(f"Password first 4 chars: {smtp_password[:4] if len(smtp_password) >= 4 else 'too short'}")
+    if is_stats:
+        return handle_stats(database_url)
     
-    if not smtp_user or not smtp_password:
-        return {
-            'statusCode': 500,
-            'headers': {'Content-Type': 'application/json'},
-            'body': json.dumps({'error': 'SMTP credentials not configured'})
-        }
+    if query_params.get('drain') == 'true':
+        try:
+            verify_worker(event.get('headers'))
+        except WorkerAuthError as e:
+            return error_response(401, str(e))
+        except RuntimeError as e:
+            return error_response(500, str(e))
+        return handle_drain(database_url, query_params, smtp_user, smtp_password)
+    
+    if query_params.get('batch') == 'true':
+        return handle_batch(event, database_url)
+    
+    # Parse request
+    body_data = json.loads(event.get('body', '{}'))
+    
+    try:
+        message = build_outbox_message(body_data)
+    except (ValueError, TemplateError) as e:
+        return error_response(400, str(e))
+    
+    to_email = message['to']
+    print(f"Получен запрос на отправку email: to={to_email}, subject={message['subject']}, template={body_data.get('template')}")
+    
+    try:
+        with get_pool(database_url).connection() as conn:
+            email_ids = enqueue_emails(conn, [message], 'send-email')
+        
+        print(f"Письмо на {to_email} поставлено в очередь, id={email_ids[0]}")
+        return json_response(200, {'success': True, 'queued': True, 'id': email_ids[0], 'message': 'Email queued'})
+    except Exception as e:
+        print(f"Ошибка постановки email в очередь: {str(e)}")
+        return error_response(500, f'Failed to queue email: {str(e)}')
+
+
+def build_outbox_message(item: Any) -> Dict[str, Any]:
+    '''Запрос {to, subject, html} или {to, template, variables, subject?} -> письмо для email_outbox'''
+    if not isinstance(item, dict):
+        raise ValueError('Message must be an object')
+    to_email: str = item.get('to', '')
+    template_name = item.get('template')
+    if template_name:
+        subject, html_content = render_email(template_name, item.get('variables') or {})
+        subject = item.get('subject') or subject
+    else:
+        subject = item.get('subject', 'Уведомление')
+        html_content = item.get('html', '')
+    
+    if not to_email or not html_content:
+        raise ValueError('Missing required fields: to, html or template')
+    return {'to': to_email, 'subject': subject, 'html': html_content}
+
+
+def build_message(smtp_user: str, to_email: str, subject: str, html_content: str) -> 'MIMEMultipart':
+    from email.mime.text import MIMEText
+    from email.mime.multipart import MIMEMultipart
     
-    # Create message
     msg = MIMEMultipart('alternative')
     msg['Subject'] = subject
     msg['From'] = smtp_user
@@ -74,34 +115,102 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     
     html_part = MIMEText(html_content, 'html', 'utf-8')
     msg.attach(html_part)
+    return msg
+
+
+def handle_batch(event: Dict[str, Any], database_url: str) -> Dict[str, Any]:
+    body_data = json.loads(event.get('body', '{}'))
+    messages: List[Any] = body_data if isinstance(body_data, list) else body_data.get('messages', [])
+    
+    if not messages:
+        return error_response(400, 'Missing required field: messages')
+    
+    if len(messages) > MAX_BATCH_SIZE:
+        return error_response(413, f'Too many messages: {len(messages)}, max {MAX_BATCH_SIZE}')
+    
+    results: List[Dict[str, Any]] = []
+    valid: List[Dict[str, Any]] = []
+    for index, item in enumerate(messages):
+        to_email = item.get('to', '') if isinstance(item, dict) else ''
+        try:
+            message = build_outbox_message(item)
+        except (ValueError, TemplateError) as e:
+            results.append({'index': index, 'to': to_email, 'success': False, 'error': str(e)})
+            continue
+        result = {'index': index, 'to': to_email, 'success': True}
+        results.append(result)
+        valid.append(dict(message, result=result))
     
-    # Send email
     try:
-        print(f"Подключение к SMTP серверу через порт 587...")
-        server = smtplib.SMTP('smtp.yandex.ru', 587)
-        server.starttls()
-        print(f"Авторизация для {smtp_user}...")
-        server.login(smtp_user, smtp_password)
-        print(f"Отправка письма на {to_email}...")
-        server.send_message(msg)
-        server.quit()
-        
-        print(f"Письмо успешно отправлено на {to_email}")
-        return {
-            'statusCode': 200,
-            'headers': {
-                'Content-Type': 'application/json',
-                'Access-Control-Allow-Origin': '*'
-            },
-            'body': json.dumps({'success': True, 'message': 'Email sent'})
-        }
+        if valid:
+            with get_pool(database_url).connection() as conn:
+                email_ids = enqueue_emails(conn, valid, 'send-email')
+            for item, email_id in zip(valid, email_ids):
+                item['result']['id'] = email_id
     except Exception as e:
-        print(f"Ошибка отправки email: {str(e)}")
-        return {
-            'statusCode': 500,
-            'headers': {
-                'Content-Type': 'application/json',
-                'Access-Control-Allow-Origin': '*'
-            },
-            'body': json.dumps({'error': f'Failed to send email: {str(e)}'})
-        }
\ No newline at end of file
+        print(f"Ошибка постановки пачки писем в очередь: {str(e)}")
+        return error_response(500, f'Failed to queue emails: {str(e)}')
+    
+    queued = len(valid)
+    print(f"Пакетная постановка: {queued}/{len(messages)} писем")
+    return json_response(200 if queued == len(messages) else 207, {
+        'success': queued == len(messages),
+        'queued': queued,
+        'failed': len(messages) - queued,
+        'results': results
+    })
+
+
+def handle_drain(database_url: str, query_params: Dict[str, Any], smtp_user: str, smtp_password: str) -> Dict[str, Any]:
+    # SMTP и MIME нужны только воркеру - приём писем в очередь их не импортирует
+    import smtplib
+    from smtp_pool import get_sender, DeliveryUncertain
+    
+    if not smtp_user or not smtp_password:
+        return error_response(500, 'SMTP credentials not configured')
+    
+    try:
+        limit = int(query_params.get('limit', DRAIN_DEFAULT_LIMIT))
+    except ValueError:
+        return error_response(400, 'limit must be an integer')
+    # Взятые письма заняты до EMAIL_OUTBOX_LOCK_TIMEOUT - брать не больше, чем успеет прогон
+    if not 1 <= limit <= DRAIN_MAX_LIMIT:
+        return error_response(400, f'limit must be between 1 and {DRAIN_MAX_LIMIT}')
+    
+    sender = get_sender(smtp_user, smtp_password)
+    
+    def send(email: Dict[str, Any]) -> None:
+        subject, html_content = email['subject'], email['html']
+        if email.get('template'):
+            # Письма send-feedback приходят шаблоном - рендер здесь, единственная копия email_templates
+            try:
+                rendered_subject, html_content = render_email(email['template'], email.get('variables') or {})
+            except TemplateError as e:
+                raise DeliveryError(f'Template error: {e}', retryable=False)
+            subject = subject or rendered_subject
+        try:
+            sender.send(build_message(smtp_user, email['to_email'], subject, html_content))
+        except smtplib.SMTPRecipientsRefused as e:
+            raise DeliveryError(f'Recipient refused: {e.recipients}', retryable=False)
+        except smtplib.SMTPResponseException as e:
+            # 5xx - постоянная ошибка (адрес, содержимое), повтор не поможет
+            raise DeliveryError(f'SMTP {e.smtp_code}: {e.smtp_error!r}', retryable=not 500 <= e.smtp_code < 600)
+        except DeliveryUncertain as e:
+            # Письмо могло уйти - лучше не доставить повторно, чем отправить дубль
+            raise DeliveryError(str(e), retryable=False)
+    
+    try:
+        with get_pool(database_url).connection() as conn:
+            stats = drain_outbox(conn, send, limit=limit)
+    except Exception as e:
+        print(f"Ошибка обработки очереди писем: {str(e)}")
+        return error_response(500, f'Failed to drain outbox: {str(e)}')
+    
+    print(f"Очередь писем: {stats}, SMTP: {sender.stats}")
+    return json_response(200, {'success': True, **stats})
+
+
+def handle_stats(database_url: str) -> Dict[str, Any]:
+    with get_pool(database_url).connection() as conn:
+        stats = outbox_stats(conn)
+    return json_response(200, stats)
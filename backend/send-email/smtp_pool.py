@@ -0,0 +1,131 @@
+'''
+Business: Постоянное SMTP-соединение, переживающее тёплые вызовы функции
+Args: SMTP_HOST, SMTP_PORT, SMTP_STARTTLS, SMTP_NOOP_INTERVAL из переменных окружения
+Returns: SmtpSender, который держит авторизованную сессию и сам переподключается
+
+STARTTLS и авторизация выполняются один раз на инстанс. Если соединение простаивало
+дольше SMTP_NOOP_INTERVAL секунд, перед отправкой делается NOOP. Если сессия оборвалась
+до команды DATA, она открывается заново, и письмо отправляется повторно (один раз).
+Обрыв после DATA - DeliveryUncertain: сервер мог уже принять письмо, повтор дал бы дубль.
+Ответы сервера с кодом (4xx/5xx, SMTPResponseException) не повторяются - их разбирает outbox.
+Для локальной проверки: SMTP_HOST=127.0.0.1 SMTP_PORT=8025 SMTP_STARTTLS=false
+и `python -m aiosmtpd -n -l 127.0.0.1:8025`.
+'''
+
+import os
+import smtplib
+import socket
+import threading
+import time
+from email.message import Message
+from typing import Dict, Any, Optional
+
+# Только обрывы соединения: SMTPException - подкласс OSError, и отказ 550 сюда попадать не должен
+RECONNECT_ERRORS = (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError, ConnectionError, socket.timeout)
+
+class DeliveryUncertain(Exception):
+    '''Соединение оборвалось после DATA - неизвестно, принял ли сервер письмо'''
+
+class TrackingSMTP(smtplib.SMTP):
+    '''Запоминает, дошла ли отправка до DATA: до неё повтор безопасен'''
+    data_started = False
+
+    def data(self, msg):
+        self.data_started = True
+        return super().data(msg)
+
+class SmtpSender:
+    def __init__(self, host: str, port: int, user: str, password: str,
+                 use_starttls: bool = True, noop_interval: float = 30, timeout: float = 15):
+        self.host = host
+        self.port = port
+        self.user = user
+        self.password = password
+        self.use_starttls = use_starttls
+        self.noop_interval = noop_interval
+        self.timeout = timeout
+        self._server: Optional[TrackingSMTP] = None
+        self._last_used = 0.0
+        self._lock = threading.Lock()
+        self.stats: Dict[str, Any] = {'connects': 0, 'reused': 0, 'reconnects': 0, 'sent': 0}
+
+    def send(self, msg: Message) -> None:
+        with self._lock:
+            for attempt in (1, 2):
+                server = self._ensure_connected()
+                server.data_started = False
+                try:
+                    server.send_message(msg)
+                    break
+                except RECONNECT_ERRORS as e:
+                    self._drop()
+                    if server.data_started:
+                        raise DeliveryUncertain(f'Connection lost after DATA: {str(e)}') from e
+                    if attempt == 2:
+                        raise
+                    self.stats['reconnects'] += 1
+            self._last_used = time.monotonic()
+            self.stats['sent'] += 1
+
+    def close(self) -> None:
+        with self._lock:
+            if self._server is not None:
+                try:
+                    self._server.quit()
+                except Exception:
+                    pass
+            self._server = None
+
+    def _ensure_connected(self) -> TrackingSMTP:
+        if self._server is not None:
+            if time.monotonic() - self._last_used < self.noop_interval or self._is_alive():
+                self.stats['reused'] += 1
+                return self._server
+            self.stats['reconnects'] += 1
+            self._drop()
+
+        server = TrackingSMTP(self.host, self.port, timeout=self.timeout)
+        try:
+            if self.use_starttls:
+                server.starttls()
+            if self.user and self.password:
+                server.login(self.user, self.password)
+        except Exception:
+            server.close()
+            raise
+        self.stats['connects'] += 1
+        self._server = server
+        self._last_used = time.monotonic()
+        return server
+
+    def _is_alive(self) -> bool:
+        try:
+            code, _ = self._server.noop()
+            return code == 250
+        except OSError:
+            return False
+
+    def _drop(self) -> None:
+        try:
+            self._server.close()
+        except Exception:
+            pass
+        self._server = None
+
+_sender: Optional[SmtpSender] = None
+
+def get_sender(user: str, password: str) -> SmtpSender:
+    '''Создаётся при первом письме и живёт, пока жив инстанс; смена учётки пересоздаёт сессию'''
+    global _sender
+    if _sender is None or _sender.user != user or _sender.password != password:
+        if _sender is not None:
+            _sender.close()
+        _sender = SmtpSender(
+            host=os.environ.get('SMTP_HOST', 'smtp.yandex.ru'),
+            port=int(os.environ.get('SMTP_PORT', '587')),
+            user=user,
+            password=password,
+            use_starttls=os.environ.get('SMTP_STARTTLS', 'true').lower() != 'false',
+            noop_interval=float(os.environ.get('SMTP_NOOP_INTERVAL', '30'))
+        )
+    return _sender
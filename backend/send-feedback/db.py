@@ -0,0 +1,149 @@
+'''
+Business: Пул соединений с PostgreSQL, переживающий тёплые вызовы функции
+Args: DATABASE_URL и настройки DB_POOL_* из переменных окружения
+Returns: Соединения psycopg2 с проверкой живости и статистикой hit/miss
+
+Настройки:
+- DB_POOL_MAX_SIZE - сколько простаивающих соединений держать (по умолчанию 4)
+- DB_POOL_IDLE_TIMEOUT - через сколько секунд простоя закрывать соединение (300)
+- DB_POOL_HEALTHCHECK_INTERVAL - после скольких секунд простоя делать SELECT 1 (30)
+
+Каждая функция деплоится своим каталогом, поэтому модуль лежит одинаковой копией
+в каждой функции, работающей с БД - правки вносить во все копии.
+'''
+
+import os
+import time
+import threading
+from contextlib import contextmanager
+import psycopg2
+import psycopg2.extensions
+from typing import Dict, Any, List, Optional, Tuple
+
+DISCONNECT_ERRORS = (psycopg2.OperationalError, psycopg2.InterfaceError)
+
+class ConnectionPool:
+    def __init__(self, dsn: str, max_size: int = 4, idle_timeout: float = 300,
+                 health_check_interval: float = 30):
+        self.dsn = dsn
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.health_check_interval = health_check_interval
+        self._idle: List[Tuple[Any, float]] = []
+        self._lock = threading.Lock()
+        self.stats: Dict[str, Any] = {
+            'hits': 0,
+            'misses': 0,
+            'reconnects': 0,
+            'expired': 0,
+            'last_connect_ms': None,
+            'total_connect_ms': 0.0
+        }
+
+    def acquire(self) -> Tuple[Any, bool]:
+        '''Возвращает (conn, reused): reused=False если пришлось открыть новое соединение'''
+        while True:
+            with self._lock:
+                if not self._idle:
+                    break
+                conn, released_at = self._idle.pop()
+
+            idle_for = time.monotonic() - released_at
+            if conn.closed or idle_for > self.idle_timeout:
+                self.stats['expired'] += 1
+                self._close(conn)
+                continue
+
+            if idle_for > self.health_check_interval and not self._is_alive(conn):
+                self.stats['reconnects'] += 1
+                self._close(conn)
+                continue
+
+            self.stats['hits'] += 1
+            return conn, True
+
+        self.stats['misses'] += 1
+        return self._connect(), False
+
+    def release(self, conn: Any, broken: bool = False) -> None:
+        if broken or conn.closed:
+            self._close(conn)
+            return
+
+        try:
+            if conn.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                conn.rollback()
+        except DISCONNECT_ERRORS:
+            self._close(conn)
+            return
+
+        with self._lock:
+            if len(self._idle) < self.max_size:
+                self._idle.append((conn, time.monotonic()))
+                return
+        self._close(conn)
+
+    @contextmanager
+    def connection(self):
+        '''with pool.connection() as conn: - вернёт соединение в пул, сломанное закроет'''
+        conn, _ = self.acquire()
+        try:
+            yield conn
+        except DISCONNECT_ERRORS:
+            self.release(conn, broken=True)
+            raise
+        except Exception:
+            self.release(conn)
+            raise
+        self.release(conn)
+
+    def discard(self, conn: Any) -> Any:
+        '''Закрывает сломанное соединение и сразу открывает новое'''
+        self._close(conn)
+        self.stats['reconnects'] += 1
+        return self._connect()
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            idle = len(self._idle)
+        return dict(self.stats, idle=idle, max_size=self.max_size)
+
+    def _connect(self) -> Any:
+        started = time.perf_counter()
+        conn = psycopg2.connect(self.dsn)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        self.stats['last_connect_ms'] = round(elapsed_ms, 2)
+        self.stats['total_connect_ms'] += elapsed_ms
+        return conn
+
+    def _is_alive(self, conn: Any) -> bool:
+        try:
+            cur = conn.cursor()
+            cur.execute('SELECT 1')
+            cur.fetchone()
+            cur.close()
+            conn.rollback()
+            return True
+        except DISCONNECT_ERRORS:
+            return False
+
+    @staticmethod
+    def _close(conn: Any) -> None:
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+_pool: Optional[ConnectionPool] = None
+
+def get_pool(dsn: str) -> ConnectionPool:
+    '''Пул создаётся лениво при первом вызове и живёт, пока жив инстанс функции'''
+    global _pool
+    if _pool is None or _pool.dsn != dsn:
+        _pool = ConnectionPool(
+            dsn,
+            max_size=int(os.environ.get('DB_POOL_MAX_SIZE', '4')),
+            idle_timeout=float(os.environ.get('DB_POOL_IDLE_TIMEOUT', '300')),
+            health_check_interval=float(os.environ.get('DB_POOL_HEALTHCHECK_INTERVAL', '30'))
+        )
+    return _pool
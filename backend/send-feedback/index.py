@@ -1,116 +1,53 @@
 '''
 Business: Send feedback via email using Yandex SMTP
 Args: event with httpMethod, body (JSON with feedback field)
-Returns: HTTP response with status
+Returns: HTTP response with status; the email is queued in email_outbox
+         as the 'feedback' template and rendered and delivered by the
+         send-email drain worker
 '''
 
 import json
-import smtplib
 import os
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
 from typing import Dict, Any
 from datetime import datetime
+from core import json_response, error_response, options_response
+from db import get_pool
+from email_outbox import enqueue_emails
 
 def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     method: str = event.get('httpMethod', 'GET')
     
     if method == 'OPTIONS':
-        return {
-            'statusCode': 200,
-            'headers': {
-                'Access-Control-Allow-Origin': '*',
-                'Access-Control-Allow-Methods': 'POST, OPTIONS',
-                'Access-Control-Allow-Headers': 'Content-Type',
-                'Access-Control-Max-Age': '86400'
-            },
-            'body': ''
-        }
+        return options_response('POST, OPTIONS')
     
     if method != 'POST':
-        return {
-            'statusCode': 405,
-            'headers': {
-                'Access-Control-Allow-Origin': '*',
-                'Content-Type': 'application/json'
-            },
-            'isBase64Encoded': False,
-            'body': json.dumps({'error': 'Method not allowed'})
-        }
+        return error_response(405, 'Method not allowed')
     
     body_data = json.loads(event.get('body', '{}'))
     feedback_text = body_data.get('feedback', '').strip()
     
     if not feedback_text:
-        return {
-            'statusCode': 400,
-            'headers': {
-                'Access-Control-Allow-Origin': '*',
-                'Content-Type': 'application/json'
-            },
-            'isBase64Encoded': False,
-            'body': json.dumps({'error': 'Feedback text is required'})
-        }
+        return error_response(400, 'Feedback text is required')
     
     smtp_user = os.environ.get('YANDEX_SMTP_USER')
-    smtp_password = os.environ.get('YANDEX_SMTP_PASSWORD')
+    database_url = os.environ.get('DATABASE_URL')
     
-    if not smtp_user or not smtp_password:
-        return {
-            'statusCode': 500,
-            'headers': {
-                'Access-Control-Allow-Origin': '*',
-                'Content-Type': 'application/json'
-            },
-            'isBase64Encoded': False,
-            'body': json.dumps({'error': 'Email configuration missing'})
-        }
+    if not smtp_user or not database_url:
+        return error_response(500, 'Email configuration missing')
     
-    msg = MIMEMultipart()
-    msg['From'] = smtp_user
-    msg['To'] = smtp_user
-    msg['Subject'] = f'💡 Новая идея от пользователя - {datetime.now().strftime("%d.%m.%Y %H:%M")}'
-    
-    body = f"""
-    <html>
-      <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333;">
-        <h2 style="color: #f59e0b;">💡 Новая идея от пользователя</h2>
-        <div style="background-color: #fef3c7; padding: 15px; border-radius: 8px; margin: 20px 0;">
-          <p style="font-size: 16px; margin: 0;">{feedback_text}</p>
-        </div>
-        <hr style="border: none; border-top: 1px solid #e5e7eb; margin: 20px 0;">
-        <p style="color: #6b7280; font-size: 14px;">
-          <strong>Время получения:</strong> {datetime.now().strftime("%d.%m.%Y в %H:%M:%S")}<br>
-          <strong>Request ID:</strong> {context.request_id}
-        </p>
-      </body>
-    </html>
-    """
-    
-    msg.attach(MIMEText(body, 'html', 'utf-8'))
+    now = datetime.now()
+    variables = {
+        'feedback_text': feedback_text,
+        'received_at': now.strftime("%d.%m.%Y в %H:%M:%S"),
+        'received_at_short': now.strftime("%d.%m.%Y %H:%M"),
+        'request_id': context.request_id
+    }
     
     try:
-        with smtplib.SMTP_SSL('smtp.yandex.ru', 465) as server:
-            server.login(smtp_user, smtp_password)
-            server.send_message(msg)
+        with get_pool(database_url).connection() as conn:
+            enqueue_emails(conn, [{'to': smtp_user, 'template': 'feedback', 'variables': variables}], 'send-feedback')
         
-        return {
-            'statusCode': 200,
-            'headers': {
-                'Access-Control-Allow-Origin': '*',
-                'Content-Type': 'application/json'
-            },
-            'isBase64Encoded': False,
-            'body': json.dumps({'success': True, 'message': 'Feedback sent successfully'})
-        }
+        return json_response(200, {'success': True, 'queued': True, 'message': 'Feedback queued for delivery'})
     
     except Exception as e:
-        return {
-            'statusCode': 500,
-            'headers': {
-                'Access-Control-Allow-Origin': '*',
-                'Content-Type': 'application/json'
-            },
-            'isBase64Encoded': False,
-            'body': json.dumps({'error': f'Failed to send email: {str(e)}'})
-        }
+        return error_response(500, f'Failed to queue email: {str(e)}')
@@ -0,0 +1,74 @@
+'''
+Business: Общие заготовки HTTP-ответов облачных функций
+Args: статус, данные для JSON-тела, дополнительные заголовки
+Returns: dict ответа в формате платформы (statusCode, headers, body, isBase64Encoded)
+
+Заголовки собраны заранее в константы. JSON кодирует orjson, если он установлен
+(datetime, date, time и UUID он пишет сам, из Python вызывается только для Decimal),
+иначе - один переиспользуемый json.JSONEncoder. Вывод у обоих одинаковый: компактный,
+UTF-8 без \\u-экранирования, даты в ISO 8601 (2025-01-01T10:00:00+00:00), Decimal строкой.
+Каждый ответ получает свою копию заголовков - обработчики дописывают в них своё.
+
+Модуль лежит одинаковой копией в каждой функции - правки вносить во все копии.
+'''
+
+import json
+from datetime import date, time
+from typing import Dict, Any, Optional, Tuple
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+CORS_HEADERS = {'Access-Control-Allow-Origin': '*'}
+JSON_HEADERS = {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'}
+
+def _to_json(value: Any) -> Any:
+    '''Значения без JSON-типа: даты и время - ISO 8601, Decimal и прочее - строкой'''
+    if isinstance(value, (date, time)):
+        return value.isoformat()
+    return str(value)
+
+if orjson is not None:
+    def json_dumps(payload: Any) -> str:
+        return orjson.dumps(payload, default=_to_json).decode()
+else:
+    json_dumps = json.JSONEncoder(default=_to_json, ensure_ascii=False, separators=(',', ':')).encode
+
+def json_response(status: int, payload: Any, headers: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+    return raw_json_response(status, json_dumps(payload), headers)
+
+def raw_json_response(status: int, body: str, headers: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+    '''Тело уже в JSON (например, собрано в Postgres через json_agg) - отдаётся как есть'''
+    response_headers = dict(JSON_HEADERS)
+    if headers:
+        response_headers.update(headers)
+    return {
+        'statusCode': status,
+        'headers': response_headers,
+        'body': body,
+        'isBase64Encoded': False
+    }
+
+def error_response(status: int, message: str) -> Dict[str, Any]:
+    return json_response(status, {'error': message})
+
+_preflight: Dict[Tuple[str, str], Dict[str, str]] = {}
+
+def options_response(methods: str, allow_headers: str = 'Content-Type') -> Dict[str, Any]:
+    '''Ответ на CORS preflight; заголовки собираются один раз на пару (methods, allow_headers)'''
+    key = (methods, allow_headers)
+    if key not in _preflight:
+        _preflight[key] = {
+            'Access-Control-Allow-Origin': '*',
+            'Access-Control-Allow-Methods': methods,
+            'Access-Control-Allow-Headers': allow_headers,
+            'Access-Control-Max-Age': '86400'
+        }
+    return {
+        'statusCode': 200,
+        'headers': dict(_preflight[key]),
+        'body': '',
+        'isBase64Encoded': False
+    }
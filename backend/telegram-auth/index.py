@@ -1,17 +1,37 @@
 '''
 Business: Telegram authentication for users with role selection (client/executor)
 Args: event with httpMethod, body containing initData from Telegram WebApp
-Returns: JWT token and user info with selected role
+Returns: Signed session token (session_token.py) and user info with selected role
+         POST /?refresh=true с X-Auth-Token - новый токен взамен действующего или недавно истёкшего
+         GET /?stats=true - доля попаданий в кэш профилей и кэш проверенных initData
+
+Секрет HMAC считается из TELEGRAM_BOT_TOKEN один раз на тёплый инстанс. Недавно
+проверенные initData хранятся в LRU (TELEGRAM_VERIFY_CACHE_SIZE записей, не дольше
+TELEGRAM_VERIFY_CACHE_TTL секунд и не дольше auth_date + TELEGRAM_AUTH_MAX_AGE).
+Пользователь записывается в users (user_profiles.py); роль в токене берётся из профиля.
+Нужны секреты TELEGRAM_BOT_TOKEN, DATABASE_URL и SESSION_TOKEN_SECRET - последний общий
+с orders-api и planfix, которые проверяют выданные здесь токены (TELEGRAM_AUTH_SETUP.md).
 '''
 
 import json
 import hmac
 import hashlib
 import os
-from typing import Dict, Any, Optional
-from urllib.parse import parse_qs
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Tuple
+from urllib.parse import parse_qsl
 from dataclasses import dataclass
 import time
+from core import json_response, error_response, options_response
+from db import get_pool
+from user_profiles import login_user, get_profile, get_profile_cache
+from session_token import ensure_secret, issue_token, verify_token, token_from_headers, TokenError, REFRESH_GRACE_SECONDS
+
+# Сколько секунд после auth_date initData считается действительным (0 - не проверять)
+AUTH_MAX_AGE_SECONDS = int(os.environ.get('TELEGRAM_AUTH_MAX_AGE', '86400'))
+VERIFY_CACHE_SIZE = int(os.environ.get('TELEGRAM_VERIFY_CACHE_SIZE', '1024'))
+VERIFY_CACHE_TTL_SECONDS = float(os.environ.get('TELEGRAM_VERIFY_CACHE_TTL', '300'))
 
 @dataclass
 class TelegramUser:
@@ -21,68 +41,98 @@ class TelegramUser:
     username: Optional[str]
     photo_url: Optional[str]
 
-def verify_telegram_auth(init_data: str, bot_token: str) -> Optional[TelegramUser]:
-    try:
-        params = parse_qs(init_data)
-        
-        data_check_string_parts = []
-        for key in sorted(params.keys()):
-            if key != 'hash':
-                value = params[key][0]
-                data_check_string_parts.append(f'{key}={value}')
-        
-        data_check_string = '\n'.join(data_check_string_parts)
-        
-        secret_key = hmac.new(
-            'WebAppData'.encode(),
-            bot_token.encode(),
-            hashlib.sha256
-        ).digest()
-        
-        calculated_hash = hmac.new(
-            secret_key,
-            data_check_string.encode(),
-            hashlib.sha256
-        ).hexdigest()
-        
-        received_hash = params.get('hash', [''])[0]
-        
-        if calculated_hash != received_hash:
+class TelegramVerifier:
+    '''Проверка подписи initData с секретом, вычисленным один раз на инстанс'''
+    def __init__(self, bot_token: str, cache_size: int = VERIFY_CACHE_SIZE,
+                 cache_ttl: float = VERIFY_CACHE_TTL_SECONDS, max_age: int = AUTH_MAX_AGE_SECONDS):
+        self.bot_token = bot_token
+        self.secret_key = hmac.new(b'WebAppData', bot_token.encode(), hashlib.sha256).digest()
+        self.cache_size = cache_size
+        self.cache_ttl = cache_ttl
+        self.max_age = max_age
+        # initData -> (пользователь, момент истечения); ключ - строка целиком, а не только hash,
+        # иначе к чужому hash можно было бы подставить другие поля
+        self._verified: 'OrderedDict[str, Tuple[TelegramUser, float]]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats: Dict[str, int] = {'hits': 0, 'misses': 0, 'evictions': 0, 'rejected': 0}
+
+    def verify(self, init_data: str) -> Optional[TelegramUser]:
+        now = time.time()
+        with self._lock:
+            cached = self._verified.get(init_data)
+            if cached is not None:
+                if cached[1] > now:
+                    self._verified.move_to_end(init_data)
+                    self.stats['hits'] += 1
+                    return cached[0]
+                del self._verified[init_data]
+        self.stats['misses'] += 1
+
+        user, auth_date = self._check_signature(init_data)
+        if user is None or (self.max_age and now - auth_date > self.max_age):
+            self.stats['rejected'] += 1
             return None
-        
-        user_data = json.loads(params.get('user', ['{}'])[0])
-        
-        return TelegramUser(
-            id=user_data.get('id'),
-            first_name=user_data.get('first_name', ''),
-            last_name=user_data.get('last_name'),
-            username=user_data.get('username'),
-            photo_url=user_data.get('photo_url')
-        )
-    except Exception:
-        return None
+
+        expires_at = now + self.cache_ttl
+        if self.max_age:
+            expires_at = min(expires_at, auth_date + self.max_age)
+        with self._lock:
+            self._verified[init_data] = (user, expires_at)
+            if len(self._verified) > self.cache_size:
+                self._verified.popitem(last=False)
+                self.stats['evictions'] += 1
+        return user
+
+    def _check_signature(self, init_data: str) -> Tuple[Optional[TelegramUser], int]:
+        try:
+            params = dict(parse_qsl(init_data, keep_blank_values=True))
+            received_hash = params.pop('hash', '')
+            data_check_string = '\n'.join(f'{key}={params[key]}' for key in sorted(params))
+            calculated_hash = hmac.new(self.secret_key, data_check_string.encode(), hashlib.sha256).hexdigest()
+
+            if not received_hash or not hmac.compare_digest(calculated_hash, received_hash):
+                return None, 0
+
+            user_data = json.loads(params.get('user', '{}'))
+            user = TelegramUser(
+                id=user_data.get('id'),
+                first_name=user_data.get('first_name', ''),
+                last_name=user_data.get('last_name'),
+                username=user_data.get('username'),
+                photo_url=user_data.get('photo_url')
+            )
+            return user, int(params.get('auth_date') or 0)
+        except Exception:
+            return None, 0
+
+_verifier: Optional[TelegramVerifier] = None
+
+def get_verifier(bot_token: str) -> TelegramVerifier:
+    '''Живёт, пока жив инстанс; смена токена бота пересоздаёт секрет и сбрасывает кэш'''
+    global _verifier
+    if _verifier is None or _verifier.bot_token != bot_token:
+        _verifier = TelegramVerifier(bot_token)
+    return _verifier
+
+def verify_telegram_auth(init_data: str, bot_token: str) -> Optional[TelegramUser]:
+    return get_verifier(bot_token).verify(init_data)
 
 def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     method: str = event.get('httpMethod', 'GET')
     
     if method == 'OPTIONS':
-        return {
-            'statusCode': 200,
-            'headers': {
-                'Access-Control-Allow-Origin': '*',
-                'Access-Control-Allow-Methods': 'GET, POST, OPTIONS',
-                'Access-Control-Allow-Headers': 'Content-Type, X-Auth-Token',
-                'Access-Control-Max-Age': '86400'
-            },
-            'body': ''
-        }
+        return options_response('GET, POST, OPTIONS', 'Content-Type, X-Auth-Token')
+    
+    query_params = event.get('queryStringParameters', {}) or {}
+    if method == 'GET' and query_params.get('stats') == 'true':
+        return handle_stats()
     
     if method != 'POST':
-        return {
-            'statusCode': 405,
-            'headers': {'Content-Type': 'application/json'},
-            'body': json.dumps({'error': 'Method not allowed'})
-        }
+        return error_response(405, 'Method not allowed')
+    
+    database_url = os.environ.get('DATABASE_URL', '')
+    if query_params.get('refresh') == 'true':
+        return handle_refresh(event, database_url)
     
     try:
         body_data = json.loads(event.get('body', '{}'))
@@ -90,69 +140,101 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
         role = body_data.get('role', 'client')
         
         if not init_data:
-            return {
-                'statusCode': 400,
-                'headers': {'Content-Type': 'application/json'},
-                'body': json.dumps({'error': 'initData is required'})
-            }
+            return error_response(400, 'initData is required')
         
         if role not in ['client', 'executor']:
-            return {
-                'statusCode': 400,
-                'headers': {'Content-Type': 'application/json'},
-                'body': json.dumps({'error': 'Invalid role. Must be client or executor'})
-            }
+            return error_response(400, 'Invalid role. Must be client or executor')
         
         bot_token = os.environ.get('TELEGRAM_BOT_TOKEN', '')
         if not bot_token:
-            return {
-                'statusCode': 500,
-                'headers': {'Content-Type': 'application/json'},
-                'body': json.dumps({'error': 'Bot token not configured'})
-            }
+            return error_response(500, 'Bot token not configured')
+        
+        if not database_url:
+            return error_response(500, 'DATABASE_URL not configured')
+        
+        try:
+            # Без секрета токен не выдать - отказываем до того, как login_user запишет пользователя
+            ensure_secret()
+        except RuntimeError as e:
+            return error_response(500, str(e))
         
         telegram_user = verify_telegram_auth(init_data, bot_token)
         
         if not telegram_user:
-            return {
-                'statusCode': 401,
-                'headers': {'Content-Type': 'application/json'},
-                'body': json.dumps({'error': 'Invalid Telegram authentication'})
-            }
+            return error_response(401, 'Invalid Telegram authentication')
+        
+        profile, cached = login_user(
+            get_pool(database_url).connection,
+            telegram_id=telegram_user.id,
+            name=f'{telegram_user.first_name} {telegram_user.last_name or ""}'.strip(),
+            username=telegram_user.username,
+            avatar_url=telegram_user.photo_url,
+            role=role
+        )
+        print(f"Профиль tg_{telegram_user.id}: {'cache' if cached else 'db'}, кэш: {get_profile_cache().snapshot()}")
+        
+        if not profile['is_active']:
+            return error_response(403, 'User is blocked')
         
         user_info = {
             'uid': f'tg_{telegram_user.id}',
+            'user_id': profile['user_id'],
             'telegram_id': telegram_user.id,
-            'name': f'{telegram_user.first_name} {telegram_user.last_name or ""}'.strip(),
-            'username': telegram_user.username,
-            'photo_url': telegram_user.photo_url,
-            'role': role,
-            'created_at': int(time.time())
+            'name': profile['name'],
+            'username': profile['username'],
+            'photo_url': profile['avatar_url'],
+            'role': profile['role'],
+            'created_at': profile['created_at']
         }
+        session = issue_token(user_info['uid'], profile['role'])
         
-        return {
-            'statusCode': 200,
-            'headers': {
-                'Content-Type': 'application/json',
-                'Access-Control-Allow-Origin': '*'
-            },
-            'isBase64Encoded': False,
-            'body': json.dumps({
-                'success': True,
-                'user': user_info,
-                'token': f'tg_token_{telegram_user.id}_{int(time.time())}'
-            })
-        }
+        return json_response(200, {
+            'success': True,
+            'user': user_info,
+            'token': session['token'],
+            'expires_at': session['expires_at']
+        }, {'X-Profile-Cache': 'hit' if cached else 'miss'})
         
     except json.JSONDecodeError:
-        return {
-            'statusCode': 400,
-            'headers': {'Content-Type': 'application/json'},
-            'body': json.dumps({'error': 'Invalid JSON'})
-        }
+        return error_response(400, 'Invalid JSON')
     except Exception as e:
-        return {
-            'statusCode': 500,
-            'headers': {'Content-Type': 'application/json'},
-            'body': json.dumps({'error': str(e)})
-        }
+        return error_response(500, str(e))
+
+
+def handle_refresh(event: Dict[str, Any], database_url: str) -> Dict[str, Any]:
+    token = token_from_headers(event.get('headers'))
+    if not token:
+        try:
+            token = json.loads(event.get('body') or '{}').get('token', '')
+        except (json.JSONDecodeError, AttributeError):
+            token = ''
+    
+    if not token:
+        return error_response(400, 'X-Auth-Token is required')
+    
+    if not database_url:
+        return error_response(500, 'DATABASE_URL not configured')
+    
+    try:
+        claims = verify_token(token, leeway=REFRESH_GRACE_SECONDS)
+        role = claims['role']
+        if claims['uid'].startswith('tg_'):
+            # Роль и блокировка берутся из профиля: из кэша инстанса, при промахе - из users
+            profile, _ = get_profile(get_pool(database_url).connection, int(claims['uid'][3:]))
+            if profile is None or not profile['is_active']:
+                raise TokenError('User not found or blocked')
+            role = profile['role']
+        session = issue_token(claims['uid'], role)
+    except TokenError as e:
+        return error_response(401, str(e))
+    except Exception as e:
+        return error_response(500, str(e))
+    
+    return json_response(200, {'success': True, 'token': session['token'], 'expires_at': session['expires_at']})
+
+
+def handle_stats() -> Dict[str, Any]:
+    return json_response(200, {
+        'profile_cache': get_profile_cache().snapshot(),
+        'verify_cache': _verifier.stats if _verifier else None
+    })
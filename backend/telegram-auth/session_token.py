@@ -0,0 +1,96 @@
+'''
+Business: Подписанные токены сессии (HMAC-SHA256) с claims uid, role, exp
+Args: SESSION_TOKEN_SECRET, SESSION_TOKEN_TTL, SESSION_TOKEN_REFRESH_GRACE из переменных окружения
+Returns: Строку токена при выдаче и словарь claims при проверке (или TokenError)
+
+Формат: v1.<base64url(json claims)>.<base64url(hmac)>. Проверка не ходит в БД -
+достаточно общего секрета, поэтому её делают сами функции (orders-api, planfix).
+Токен выдаёт telegram-auth; истёкший не дольше SESSION_TOKEN_REFRESH_GRACE секунд
+назад токен можно обменять на новый через POST /?refresh=true.
+
+Модуль лежит одинаковой копией в telegram-auth, orders-api и planfix.
+'''
+
+import base64
+import hashlib
+import hmac
+import json
+import os
+import time
+from functools import lru_cache
+from typing import Dict, Any, Optional
+
+TOKEN_VERSION = 'v1'
+TOKEN_TTL_SECONDS = int(os.environ.get('SESSION_TOKEN_TTL', '43200'))
+REFRESH_GRACE_SECONDS = int(os.environ.get('SESSION_TOKEN_REFRESH_GRACE', '604800'))
+ROLES = ('client', 'executor', 'admin', 'owner')
+
+class TokenError(Exception):
+    def __init__(self, message: str, expired: bool = False):
+        super().__init__(message)
+        self.expired = expired
+
+@lru_cache(maxsize=4)
+def _signing_key(secret: str) -> bytes:
+    return hashlib.sha256(secret.encode()).digest()
+
+def _secret() -> str:
+    secret = os.environ.get('SESSION_TOKEN_SECRET', '')
+    if not secret:
+        # Ошибка конфигурации, а не плохой токен - вызывающий отвечает 500, а не 401
+        raise RuntimeError('SESSION_TOKEN_SECRET not configured')
+    return secret
+
+def ensure_secret() -> None:
+    '''RuntimeError, если секрет не задан: вход проверяет его до записи пользователя в БД'''
+    _secret()
+
+def _b64encode(raw: bytes) -> str:
+    return base64.urlsafe_b64encode(raw).rstrip(b'=').decode()
+
+def _b64decode(value: str) -> bytes:
+    return base64.urlsafe_b64decode(value + '=' * (-len(value) % 4))
+
+def _sign(signing_input: str, secret: str) -> str:
+    return _b64encode(hmac.new(_signing_key(secret), signing_input.encode(), hashlib.sha256).digest())
+
+def issue_token(uid: str, role: str, ttl_seconds: Optional[int] = None) -> Dict[str, Any]:
+    '''Возвращает {token, expires_at}'''
+    if role not in ROLES:
+        raise TokenError(f'Unknown role: {role}')
+    now = int(time.time())
+    claims = {'uid': uid, 'role': role, 'iat': now, 'exp': now + (ttl_seconds or TOKEN_TTL_SECONDS)}
+    payload = _b64encode(json.dumps(claims, separators=(',', ':')).encode())
+    signing_input = f'{TOKEN_VERSION}.{payload}'
+    return {'token': f'{signing_input}.{_sign(signing_input, _secret())}', 'expires_at': claims['exp']}
+
+def verify_token(token: str, leeway: int = 0) -> Dict[str, Any]:
+    '''Проверяет подпись и срок; leeway - сколько секунд после exp токен ещё принимается'''
+    parts = token.split('.')
+    if len(parts) != 3 or parts[0] != TOKEN_VERSION:
+        raise TokenError('Malformed token')
+
+    expected = _sign(f'{parts[0]}.{parts[1]}', _secret())
+    # compare_digest с str принимает только ASCII - сравниваем байты, иначе «Bearer a.b.ж» дал бы 500
+    if not hmac.compare_digest(expected.encode(), parts[2].encode('utf-8', 'surrogateescape')):
+        raise TokenError('Invalid token signature')
+
+    try:
+        claims = json.loads(_b64decode(parts[1]))
+    except ValueError:
+        raise TokenError('Malformed token')
+    if not isinstance(claims, dict) or claims.get('role') not in ROLES or not claims.get('uid'):
+        raise TokenError('Malformed token')
+    if int(claims.get('exp', 0)) + leeway < time.time():
+        raise TokenError('Token expired', expired=True)
+    return claims
+
+def token_from_headers(headers: Optional[Dict[str, Any]]) -> str:
+    '''X-Auth-Token или Authorization: Bearer; имена заголовков без учёта регистра'''
+    for name, value in (headers or {}).items():
+        lowered = name.lower()
+        if lowered == 'x-auth-token' and value:
+            return value.strip()
+        if lowered == 'authorization' and value and value[:7].lower() == 'bearer ':
+            return value[7:].strip()
+    return ''
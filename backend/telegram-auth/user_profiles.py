@@ -0,0 +1,135 @@
+'''
+Business: Профили пользователей Telegram в таблице users и их кэш на тёплом инстансе
+Args: conn - соединение psycopg2, данные пользователя из проверенного initData
+Returns: Профиль {user_id, telegram_id, name, username, avatar_url, role, is_active, created_at}
+
+Вход делает один INSERT ... ON CONFLICT (telegram_id) DO UPDATE ... RETURNING.
+Повторный вход с теми же именем, аватаром и ролью в пределах USER_PROFILE_CACHE_TTL
+секунд обслуживается из кэша без запроса в БД (last_login_at обновляется не чаще
+раза за TTL). Роли admin и owner назначаются только в БД - вход с ролью client или
+executor их не затирает.
+'''
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Tuple, Callable
+import psycopg2.extras
+
+USERS_TABLE = 't_p78209571_electric_service_aut.users'
+PRIVILEGED_ROLES = ('admin', 'owner')
+
+PROFILE_CACHE_SIZE = int(os.environ.get('USER_PROFILE_CACHE_SIZE', '2048'))
+PROFILE_CACHE_TTL_SECONDS = float(os.environ.get('USER_PROFILE_CACHE_TTL', '300'))
+
+class ProfileCache:
+    '''LRU с TTL: telegram_id -> профиль'''
+    def __init__(self, max_size: int = PROFILE_CACHE_SIZE, ttl_seconds: float = PROFILE_CACHE_TTL_SECONDS):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._items: 'OrderedDict[int, Tuple[Dict[str, Any], float]]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats: Dict[str, int] = {'hits': 0, 'misses': 0, 'evictions': 0}
+
+    def get(self, telegram_id: int, accept: Optional[Callable[[Dict[str, Any]], bool]] = None) -> Optional[Dict[str, Any]]:
+        '''accept - профиль годится только если предикат истинен, иначе это промах'''
+        with self._lock:
+            item = self._items.get(telegram_id)
+            if item is not None and item[1] > time.monotonic() and (accept is None or accept(item[0])):
+                self._items.move_to_end(telegram_id)
+                self.stats['hits'] += 1
+                return item[0]
+            if item is not None and item[1] <= time.monotonic():
+                del self._items[telegram_id]
+            self.stats['misses'] += 1
+            return None
+
+    def put(self, profile: Dict[str, Any]) -> None:
+        with self._lock:
+            self._items[profile['telegram_id']] = (profile, time.monotonic() + self.ttl_seconds)
+            self._items.move_to_end(profile['telegram_id'])
+            if len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+                self.stats['evictions'] += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        lookups = self.stats['hits'] + self.stats['misses']
+        with self._lock:
+            size = len(self._items)
+        return dict(self.stats, size=size, hit_ratio=round(self.stats['hits'] / lookups, 4) if lookups else None)
+
+_cache = ProfileCache()
+
+def get_profile_cache() -> ProfileCache:
+    return _cache
+
+def _row_to_profile(row: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        'user_id': row['id'],
+        'telegram_id': row['telegram_id'],
+        'name': row['name'],
+        'username': row['username'],
+        'avatar_url': row['avatar_url'],
+        'role': row['role'],
+        'is_active': row['is_active'],
+        'created_at': int(row['created_at'].timestamp()) if row['created_at'] else None
+    }
+
+def _is_current(profile: Dict[str, Any], name: str, username: Optional[str],
+                avatar_url: Optional[str], role: str) -> bool:
+    '''Кэшированный профиль совпадает с тем, что записал бы upsert'''
+    return (profile['name'] == name and profile['username'] == username
+            and profile['avatar_url'] == avatar_url
+            and (profile['role'] == role or profile['role'] in PRIVILEGED_ROLES))
+
+def login_user(conn_factory, telegram_id: int, name: str, username: Optional[str],
+               avatar_url: Optional[str], role: str) -> Tuple[Dict[str, Any], bool]:
+    '''Возвращает (профиль, cached); conn_factory вызывается только при промахе кэша'''
+    profile = _cache.get(telegram_id, lambda cached: _is_current(cached, name, username, avatar_url, role))
+    if profile is not None:
+        return profile, True
+
+    with conn_factory() as conn:
+        cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+        cur.execute(f"""
+            INSERT INTO {USERS_TABLE} AS u
+                (telegram_id, name, username, avatar_url, role, last_login_at, created_at, updated_at)
+            VALUES (%s, %s, %s, %s, %s, NOW(), NOW(), NOW())
+            ON CONFLICT (telegram_id) DO UPDATE SET
+                name = EXCLUDED.name,
+                username = EXCLUDED.username,
+                avatar_url = EXCLUDED.avatar_url,
+                role = CASE WHEN u.role IN %s THEN u.role ELSE EXCLUDED.role END,
+                last_login_at = NOW(),
+                updated_at = NOW()
+            RETURNING id, telegram_id, name, username, avatar_url, role, is_active, created_at
+        """, (telegram_id, name, username, avatar_url, role, PRIVILEGED_ROLES))
+        profile = _row_to_profile(cur.fetchone())
+        conn.commit()
+        cur.close()
+
+    _cache.put(profile)
+    return profile, False
+
+def get_profile(conn_factory, telegram_id: int) -> Tuple[Optional[Dict[str, Any]], bool]:
+    '''Профиль для проверки роли и is_active (refresh токена); (None, False) если пользователя нет'''
+    profile = _cache.get(telegram_id)
+    if profile is not None:
+        return profile, True
+
+    with conn_factory() as conn:
+        cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+        cur.execute(f"""
+            SELECT id, telegram_id, name, username, avatar_url, role, is_active, created_at
+            FROM {USERS_TABLE} WHERE telegram_id = %s
+        """, (telegram_id,))
+        row = cur.fetchone()
+        cur.close()
+        conn.commit()
+
+    if row is None:
+        return None, False
+    profile = _row_to_profile(row)
+    _cache.put(profile)
+    return profile, False
@@ -0,0 +1,60 @@
+'''
+Business: Замер холодного старта функций - время импорта index.py в свежем интерпретаторе
+Args: --runs (по умолчанию 10), --top (сколько самых тяжёлых модулей показать по -X importtime), имена функций
+Returns: Медиана и минимум времени импорта в мс по каждой функции
+
+Запуск: python bench/bench_cold_start.py --runs 10 --top 5 orders-api planfix
+'''
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backend')
+FUNCTIONS = ('orders-api', 'planfix', 'send-email', 'send-feedback', 'telegram-auth')
+
+MEASURE = 'import time; started = time.perf_counter(); import index; print(time.perf_counter() - started)'
+
+def measure(function_dir: str) -> float:
+    output = subprocess.run(
+        [sys.executable, '-c', MEASURE], cwd=function_dir,
+        capture_output=True, text=True, check=True
+    ).stdout
+    return float(output.strip().splitlines()[-1])
+
+def heaviest_imports(function_dir: str, top: int) -> list:
+    '''Прямые импорты index.py по данным -X importtime, самые тяжёлые по cumulative'''
+    stderr = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import index'], cwd=function_dir,
+        capture_output=True, text=True, check=True
+    ).stderr
+    # Строки "import time: self | cumulative | module"; дети печатаются до родителя с отступом
+    children = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, module = line[len('import time:'):].split('|')
+        module = module[1:]
+        if not module.startswith(' '):
+            if module == 'index':
+                return sorted(children, reverse=True)[:top]
+            children = []
+        elif not module.startswith('   '):
+            children.append((int(cumulative), module.strip()))
+    return []
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--top', type=int, default=0)
+    parser.add_argument('functions', nargs='*', default=list(FUNCTIONS))
+    args = parser.parse_args()
+
+    for name in args.functions:
+        function_dir = os.path.join(BACKEND_DIR, name)
+        samples = [measure(function_dir) for _ in range(args.runs)]
+        print(f'{name:<16} median {statistics.median(samples) * 1000:7.1f} ms, min {min(samples) * 1000:7.1f} ms')
+        for cumulative, module in heaviest_imports(function_dir, args.top) if args.top else []:
+            print(f'    {cumulative / 1000:7.1f} ms  {module}')
@@ -0,0 +1,67 @@
+'''
+Business: Замер подбора ближайших исполнителей: сетка против полного перебора с гаверсинусом
+Args: --orders (по умолчанию 10000), --executors (500), --busy (доля занятых исполнителей, 0.3)
+Returns: Время на заявку для полного перебора и сетки, число расхождений в выдаче
+
+Запуск: python bench/bench_dispatch.py --orders 10000 --executors 500
+'''
+
+import argparse
+import heapq
+import os
+import random
+import sys
+import time
+
+# Скрипт лежит в bench/, модули функции - в backend/orders-api
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backend', 'orders-api'))
+from dispatch import ExecutorGrid, haversine_km, CANDIDATES, MAX_DISTANCE_KM
+
+# Калининград и окрестности
+CENTER_LAT, CENTER_LNG = 54.71, 20.51
+SPREAD_LAT, SPREAD_LNG = 0.25, 0.4
+
+def random_point() -> tuple:
+    return (CENTER_LAT + random.uniform(-SPREAD_LAT, SPREAD_LAT), CENTER_LNG + random.uniform(-SPREAD_LNG, SPREAD_LNG))
+
+def full_scan(rows: list, lat: float, lng: float, accept) -> list:
+    distances = (
+        (haversine_km(lat, lng, row_lat, row_lng), executor_id)
+        for executor_id, _, _, row_lat, row_lng in rows if accept is None or accept(executor_id)
+    )
+    return heapq.nsmallest(CANDIDATES, (item for item in distances if item[0] <= MAX_DISTANCE_KM))
+
+def run(label: str, orders: list, find) -> list:
+    started = time.perf_counter()
+    results = [find(lat, lng) for lat, lng in orders]
+    elapsed = time.perf_counter() - started
+    print(f'{label:<24} {elapsed * 1000:8.1f} ms total, {elapsed / len(orders) * 1e6:7.1f} us/order')
+    return results
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--orders', type=int, default=10000)
+    parser.add_argument('--executors', type=int, default=500)
+    parser.add_argument('--busy', type=float, default=0.3)
+    args = parser.parse_args()
+
+    random.seed(42)
+    rows = [(i, f'Исполнитель {i}', round(random.uniform(4, 5), 2), *random_point()) for i in range(1, args.executors + 1)]
+    orders = [random_point() for _ in range(args.orders)]
+    busy = {executor_id for executor_id, *_ in rows if random.random() < args.busy}
+    accept = lambda executor_id: executor_id not in busy
+
+    grid = ExecutorGrid()
+    started = time.perf_counter()
+    grid.load(rows)
+    print(f'grid build               {(time.perf_counter() - started) * 1000:8.1f} ms, {len(grid.cells)} cells')
+
+    for label, accept_fn in (('all executors', None), ('free executors only', accept)):
+        print(label)
+        scan = run('  full scan', orders, lambda lat, lng: full_scan(rows, lat, lng, accept_fn))
+        indexed = run('  grid', orders, lambda lat, lng: grid.nearest(lat, lng, accept=accept_fn))
+        mismatches = sum(
+            [executor_id for _, executor_id in a] != [executor_id for _, executor_id in b]
+            for a, b in zip(scan, indexed)
+        )
+        print(f'  mismatches: {mismatches}')
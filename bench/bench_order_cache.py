@@ -0,0 +1,159 @@
+'''
+Business: Замер кэша GET /?id= (order_cache.py): без кэша, локальный LRU и LRU со сверкой эпох
+          в общем хранилище; проверка, что сброс на одном инстансе виден другому
+Args: --dsn (строка подключения к Postgres, обязательно), --orders (10000), --lookups (20000),
+      --cache-size (1000), --skew (1.1 - показатель Ципфа для популярности заявок)
+Returns: Среднее время запроса заявки и счётчики кэша для каждого режима, число ответов
+         из кэша, отличающихся от БД, и заявок, устаревших на втором инстансе (оба должны быть 0)
+
+Запуск: python bench/bench_order_cache.py --dsn "$DATABASE_URL" --orders 10000
+Общее хранилище - заглушка Redis в этом же процессе (GET, INCR/INCRBY, EXPIRE, PING), клиент - redis-py.
+Заявки вставляются в одной транзакции, которая в конце откатывается.
+'''
+
+import argparse
+import itertools
+import json
+import os
+import random
+import socketserver
+import sys
+import threading
+import time
+import psycopg2
+
+# Скрипт лежит в bench/, модули функции - в backend/orders-api
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backend', 'orders-api'))
+
+SCHEMA = 't_p78209571_electric_service_aut'
+
+class RespHandler(socketserver.StreamRequestHandler):
+    '''Подмножество протокола Redis (RESP), которого хватает RedisEpochs'''
+    def handle(self) -> None:
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            args = []
+            for _ in range(int(line[1:])):
+                size = int(self.rfile.readline()[1:])
+                args.append(self.rfile.read(size + 2)[:-2].decode())
+            self.wfile.write(self.server.execute(args))
+
+class RespServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), RespHandler)
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def execute(self, args: list) -> bytes:
+        command = args[0].upper()
+        with self.lock:
+            if command == 'PING':
+                return b'+PONG\r\n'
+            if command == 'GET':
+                value = self.values.get(args[1])
+                return b'$-1\r\n' if value is None else f'${len(str(value))}\r\n{value}\r\n'.encode()
+            if command in ('INCR', 'INCRBY'):
+                self.values[args[1]] = self.values.get(args[1], 0) + int(args[2] if len(args) > 2 else 1)
+                return f':{self.values[args[1]]}\r\n'.encode()
+            if command == 'EXPIRE':
+                return b':1\r\n'
+        return f'-ERR unknown command {command}\r\n'.encode()
+
+def seed(cur, orders: int) -> None:
+    cur.execute(f"""
+        INSERT INTO {SCHEMA}.orders (
+            order_uid, customer_name, customer_phone, address, items, total_price, status, assigned_to, created_at
+        )
+        SELECT 'BENCH-' || i, 'Клиент ' || i, '+7900' || lpad(i::text, 7, '0'), 'ул. Тестовая, д. ' || i,
+               jsonb_build_array(
+                   jsonb_build_object('name', 'Розетка', 'quantity', 1 + i %% 5, 'price', 500),
+                   jsonb_build_object('name', 'Выключатель', 'quantity', 1 + i %% 3, 'price', 400)
+               ),
+               1500 + i %% 1000, 'new', 'executor-' || (i %% 20), NOW() - make_interval(mins => i)
+        FROM generate_series(1, %s) AS i
+    """, (orders,))
+
+def run(label: str, conn, cache, sample: list) -> dict:
+    import index
+    import order_cache
+    order_cache._cache = cache
+    bodies = {}
+    started = time.perf_counter()
+    for order_uid in sample:
+        bodies[order_uid] = index.handle_get(conn, {'id': order_uid}, {})['body']
+    elapsed = time.perf_counter() - started
+    stats = cache.snapshot()
+    lookups = stats['hits'] + stats['misses'] + stats['stale'] + stats['expired']
+    print(f"{label:<26} {elapsed / len(sample) * 1e6:8.0f} µs/lookup  "
+          f"hit rate {stats['hits'] / max(lookups, 1):6.1%}  hits={stats['hits']} misses={stats['misses']} "
+          f"evictions={stats['evictions']} shared_errors={stats['shared_errors']}")
+    return bodies
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--dsn', default=os.environ.get('DATABASE_URL'))
+    parser.add_argument('--orders', type=int, default=10000)
+    parser.add_argument('--lookups', type=int, default=20000)
+    parser.add_argument('--cache-size', type=int, default=1000)
+    parser.add_argument('--skew', type=float, default=1.1)
+    args = parser.parse_args()
+    if not args.dsn:
+        sys.exit('--dsn or DATABASE_URL is required')
+
+    import redis
+    import index
+    import order_cache
+    from order_cache import OrderCache, RedisEpochs
+
+    server = RespServer()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    def shared_epochs() -> RedisEpochs:
+        return RedisEpochs(redis.Redis(host='127.0.0.1', port=server.server_address[1]), 60)
+
+    conn = psycopg2.connect(args.dsn)
+    cur = conn.cursor()
+    try:
+        started = time.perf_counter()
+        seed(cur, args.orders)
+        cur.execute(f"ANALYZE {SCHEMA}.orders")
+        print(f'seed {args.orders} orders: {time.perf_counter() - started:.1f} s')
+        cur.execute(f"SELECT order_uid FROM {SCHEMA}.orders WHERE order_uid LIKE 'BENCH-%%'")
+        order_uids = [row[0] for row in cur.fetchall()]
+
+        # Популярность заявок по Ципфу: к свежим и «горячим» заявкам обращаются чаще
+        rng = random.Random(42)
+        rng.shuffle(order_uids)
+        weights = list(itertools.accumulate(1 / rank ** args.skew for rank in range(1, len(order_uids) + 1)))
+        sample = rng.choices(order_uids, cum_weights=weights, k=args.lookups)
+
+        expected = run('no cache', conn, OrderCache(max_entries=0), sample)
+        local = run(f'local LRU ({args.cache_size})', conn, OrderCache(max_entries=args.cache_size), sample)
+        shared = run('local LRU + shared epochs', conn, OrderCache(args.cache_size, shared=shared_epochs()), sample)
+        mismatches = sum(local[uid] != expected[uid] or shared[uid] != expected[uid] for uid in expected)
+        print(f'cached bodies different from DB: {mismatches}')
+
+        # Два инстанса с общим хранилищем: запись на первом, чтение на втором
+        writer = OrderCache(args.cache_size, shared=shared_epochs())
+        reader = OrderCache(args.cache_size, shared=shared_epochs())
+        hot = list(dict.fromkeys(sample))[:100]
+        order_cache._cache = reader
+        for order_uid in hot:
+            index.handle_get(conn, {'id': order_uid}, {})
+        cur.execute(f"UPDATE {SCHEMA}.orders SET status = 'confirmed', updated_at = NOW() WHERE order_uid = ANY(%s)", (hot,))
+        writer.invalidate(hot)
+        stale = 0
+        for order_uid in hot:
+            response = index.handle_get(conn, {'id': order_uid}, {})
+            stale += response['headers']['X-Order-Cache'] == 'hit' or json.loads(response['body'])['status'] != 'confirmed'
+        print(f"stale reads on second instance after invalidation: {stale}/{len(hot)} "
+              f"(reader stale={reader.snapshot()['stale']})")
+    finally:
+        conn.rollback()
+        conn.close()
+        server.shutdown()
@@ -0,0 +1,151 @@
+'''
+Business: Замер отчётов владельца: GROUP BY по orders против сводки order_daily_summary
+Args: --dsn (строка подключения к Postgres, обязательно), --orders (1000000), --days (365),
+      --executors (50), --repeat (5), --python (ещё и выборка всех заявок с подсчётом в Python)
+Returns: Время вставки заявок с триггером, время каждого отчёта обоими способами и
+         число расхождений между ними (должно быть 0)
+
+Запуск: python bench/bench_reports.py --dsn "$DATABASE_URL" --orders 1000000
+Заявки вставляются в одной транзакции, которая в конце откатывается - сводка и orders
+остаются как были. Всё равно не запускать на проде: транзакция держит блокировки.
+'''
+
+import argparse
+import os
+import sys
+import time
+from collections import defaultdict
+from decimal import Decimal
+import psycopg2
+
+SCHEMA = 't_p78209571_electric_service_aut'
+STATUSES = ('new', 'confirmed', 'in_progress', 'completed', 'cancelled')
+
+DIRECT_QUERIES = {
+    'daily': f"""
+        SELECT created_at::date AS day,
+               COUNT(*) FILTER (WHERE status <> 'cancelled'),
+               COUNT(*) FILTER (WHERE status = 'completed'),
+               COUNT(*) FILTER (WHERE status = 'cancelled'),
+               COALESCE(SUM(total_price) FILTER (WHERE status <> 'cancelled'), 0)
+        FROM {SCHEMA}.orders GROUP BY 1 ORDER BY 1
+    """,
+    'statuses': f"""
+        SELECT status, COUNT(*), COALESCE(SUM(total_price), 0) FROM {SCHEMA}.orders GROUP BY 1 ORDER BY 1
+    """,
+    'executors': f"""
+        SELECT executor_id,
+               COUNT(*) FILTER (WHERE status <> 'cancelled'),
+               COUNT(*) FILTER (WHERE status = 'completed'),
+               COALESCE(SUM(total_price) FILTER (WHERE status = 'completed'), 0)
+        FROM {SCHEMA}.orders GROUP BY 1 ORDER BY 1 NULLS FIRST
+    """
+}
+
+SUMMARY_QUERIES = {
+    'daily': f"""
+        SELECT day,
+               COALESCE(SUM(orders) FILTER (WHERE status <> 'cancelled'), 0),
+               COALESCE(SUM(orders) FILTER (WHERE status = 'completed'), 0),
+               COALESCE(SUM(orders) FILTER (WHERE status = 'cancelled'), 0),
+               COALESCE(SUM(revenue) FILTER (WHERE status <> 'cancelled'), 0)
+        FROM {SCHEMA}.order_daily_summary GROUP BY 1 HAVING SUM(orders) > 0 ORDER BY 1
+    """,
+    'statuses': f"""
+        SELECT status, SUM(orders), SUM(revenue) FROM {SCHEMA}.order_daily_summary
+        GROUP BY 1 HAVING SUM(orders) > 0 ORDER BY 1
+    """,
+    'executors': f"""
+        SELECT NULLIF(executor_id, 0),
+               COALESCE(SUM(orders) FILTER (WHERE status <> 'cancelled'), 0),
+               COALESCE(SUM(orders) FILTER (WHERE status = 'completed'), 0),
+               COALESCE(SUM(revenue) FILTER (WHERE status = 'completed'), 0)
+        FROM {SCHEMA}.order_daily_summary GROUP BY executor_id HAVING SUM(orders) > 0 ORDER BY executor_id
+    """
+}
+
+def normalize(rows: list) -> list:
+    return [tuple(int(value) if isinstance(value, Decimal) and value == value.to_integral() else value for value in row) for row in rows]
+
+def run(label: str, cur, query: str, repeat: int) -> list:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        cur.execute(query)
+        rows = cur.fetchall()
+        timings.append(time.perf_counter() - started)
+    best = min(timings)
+    print(f'  {label:<22} {best * 1000:9.1f} ms (best of {repeat}), {len(rows)} rows')
+    return normalize(rows)
+
+def python_daily(cur) -> list:
+    '''Как строился бы отчёт без SQL-агрегации: все заявки в приложение и подсчёт в цикле'''
+    cur.execute(f"SELECT created_at::date, status, total_price FROM {SCHEMA}.orders")
+    days: dict = defaultdict(lambda: [0, 0, 0, Decimal(0)])
+    for day, status, price in cur.fetchall():
+        totals = days[day]
+        if status == 'cancelled':
+            totals[2] += 1
+            continue
+        totals[0] += 1
+        totals[3] += price or 0
+        if status == 'completed':
+            totals[1] += 1
+    return normalize([(day, *totals) for day, totals in sorted(days.items())])
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--dsn', default=os.environ.get('DATABASE_URL'))
+    parser.add_argument('--orders', type=int, default=1000000)
+    parser.add_argument('--days', type=int, default=365)
+    parser.add_argument('--executors', type=int, default=50)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--python', action='store_true')
+    args = parser.parse_args()
+    if not args.dsn:
+        sys.exit('--dsn or DATABASE_URL is required')
+
+    conn = psycopg2.connect(args.dsn)
+    cur = conn.cursor()
+    try:
+        cur.execute(f"""
+            INSERT INTO {SCHEMA}.executors (name, is_active)
+            SELECT 'BENCH ' || i, true FROM generate_series(1, %s) AS i RETURNING id
+        """, (args.executors,))
+        executor_ids = [row[0] for row in cur.fetchall()]
+
+        started = time.perf_counter()
+        cur.execute(f"""
+            INSERT INTO {SCHEMA}.orders (order_uid, customer_name, customer_phone, address, status,
+                                         executor_id, total_price, created_at)
+            SELECT 'BENCH-' || i, 'Замер', '+70000000000', 'ул. Тестовая',
+                   (%s::varchar[])[1 + i %% %s],
+                   CASE WHEN i %% 10 = 0 THEN NULL ELSE (%s::int[])[1 + i %% %s] END,
+                   (500 + i %% 4500)::numeric,
+                   NOW() - ((i %% %s) || ' days')::interval
+            FROM generate_series(1, %s) AS i
+        """, (list(STATUSES), len(STATUSES), executor_ids, len(executor_ids), args.days, args.orders))
+        print(f'insert {args.orders} orders with summary trigger: {time.perf_counter() - started:.1f} s')
+        started = time.perf_counter()
+        cur.execute(f"UPDATE {SCHEMA}.orders SET status = 'completed' WHERE order_uid LIKE 'BENCH-%%' AND status = 'in_progress'")
+        print(f'update {cur.rowcount} statuses with summary trigger: {time.perf_counter() - started:.1f} s')
+        cur.execute(f"ANALYZE {SCHEMA}.orders")
+        cur.execute(f"ANALYZE {SCHEMA}.order_daily_summary")
+        cur.execute(f"SELECT COUNT(*) FROM {SCHEMA}.order_daily_summary")
+        print(f'summary rows: {cur.fetchone()[0]}')
+
+        mismatches = 0
+        for report in DIRECT_QUERIES:
+            print(report)
+            direct = run('GROUP BY orders', cur, DIRECT_QUERIES[report], args.repeat)
+            summary = run('order_daily_summary', cur, SUMMARY_QUERIES[report], args.repeat)
+            if report == 'daily' and args.python:
+                started = time.perf_counter()
+                in_python = python_daily(cur)
+                print(f'  {"Python aggregation":<22} {(time.perf_counter() - started) * 1000:9.1f} ms')
+                mismatches += in_python != direct
+            mismatches += direct != summary
+        print(f'mismatches: {mismatches}')
+    finally:
+        conn.rollback()
+        conn.close()
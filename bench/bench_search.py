@@ -0,0 +1,132 @@
+'''
+Business: Замер поиска заявок GET /?q=: индекс tsvector против ILIKE и фильтрации всего списка
+Args: --dsn (строка подключения к Postgres, обязательно), --orders (500000), --queries (200),
+      --full-list (ещё и прежний способ: весь список заявок и фильтр на клиенте, долго)
+Returns: Среднее время запроса для каждого способа и долю заявок из выдачи ILIKE,
+         которые находит и q=
+
+Запуск: python bench/bench_search.py --dsn "$DATABASE_URL" --orders 500000
+Заявки вставляются в одной транзакции, которая в конце откатывается.
+'''
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+import psycopg2
+
+# Скрипт лежит в bench/, модули функции - в backend/orders-api
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backend', 'orders-api'))
+
+SCHEMA = 't_p78209571_electric_service_aut'
+SURNAMES = ['Иванов', 'Петров', 'Смирнов', 'Кузнецов', 'Попов', 'Соколов', 'Лебедев', 'Козлов', 'Новиков',
+            'Морозов', 'Волков', 'Алексеев', 'Лебедев', 'Семёнов', 'Егоров', 'Павлов', 'Фёдоров', 'Орлов']
+NAMES = ['Иван', 'Пётр', 'Анна', 'Мария', 'Сергей', 'Ольга', 'Алексей', 'Елена', 'Дмитрий', 'Наталья']
+STREETS = ['Ленина', 'Гагарина', 'Советская', 'Мира', 'Садовая', 'Лесная', 'Школьная', 'Набережная',
+           'Пушкина', 'Молодёжная', 'Балтийская', 'Кирова', 'Зелёная', 'Победы', 'Октябрьская']
+
+def seed(cur, orders: int) -> None:
+    cur.execute(f"""
+        INSERT INTO {SCHEMA}.orders (order_uid, customer_name, customer_phone, address, created_at)
+        SELECT 'BENCH-' || i,
+               (%s::text[])[1 + (i * 7) %% %s] || ' ' || (%s::text[])[1 + (i * 13) %% %s] || ' ' || i,
+               '+79' || lpad(((i::bigint * 7919) %% 1000000000)::text, 9, '0'),
+               'г. Калининград, ул. ' || (%s::text[])[1 + (i * 31) %% %s] || ', д. ' || (1 + i %% 120)
+                   || ', кв. ' || (1 + i %% 300),
+               NOW() - make_interval(mins => i)
+        FROM generate_series(1, %s) AS i
+    """, (SURNAMES, len(SURNAMES), NAMES, len(NAMES), STREETS, len(STREETS), orders))
+
+def sample_queries(cur, count: int) -> list:
+    cur.execute(f"SELECT customer_name, customer_phone, address FROM {SCHEMA}.orders WHERE order_uid LIKE 'BENCH-%%'")
+    rows = cur.fetchall()
+    rng = random.Random(42)
+    queries = []
+    for _ in range(count):
+        name, phone, address = rng.choice(rows)
+        kind = rng.randrange(4)
+        if kind == 0:
+            queries.append(name.split()[0][:5])                      # начало фамилии
+        elif kind == 1:
+            queries.append(f'{name.split()[0][:4]} {name.split()[2]}')  # фамилия + номер
+        elif kind == 2:
+            queries.append('8' + phone[2:8])                        # начало номера с 8
+        else:
+            queries.append(phone[-4:])                               # последние цифры
+    return queries
+
+def ilike(cur, q: str) -> set:
+    '''Без индекса: подстрока по каждому слову запроса в любом из трёх полей'''
+    conditions = []
+    params = []
+    for term in q.split():
+        digits = ''.join(ch for ch in term if ch.isdigit())
+        conditions.append(
+            "(customer_name ILIKE %s OR address ILIKE %s OR regexp_replace(customer_phone, '\\D', '', 'g') LIKE %s)"
+        )
+        params.extend([f'%{term}%', f'%{term}%', f'%{digits or term}%'])
+    cur.execute(
+        f"SELECT id FROM {SCHEMA}.orders WHERE {' AND '.join(conditions)} ORDER BY created_at DESC LIMIT 50",
+        params
+    )
+    return {row[0] for row in cur.fetchall()}
+
+def run(label: str, queries: list, search) -> list:
+    started = time.perf_counter()
+    results = [search(q) for q in queries]
+    elapsed = time.perf_counter() - started
+    print(f'{label:<28} {elapsed / len(queries) * 1000:8.2f} ms/query')
+    return results
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--dsn', default=os.environ.get('DATABASE_URL'))
+    parser.add_argument('--orders', type=int, default=500000)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--full-list', action='store_true')
+    args = parser.parse_args()
+    if not args.dsn:
+        sys.exit('--dsn or DATABASE_URL is required')
+
+    import index
+    from search import build_search_query
+
+    conn = psycopg2.connect(args.dsn)
+    cur = conn.cursor()
+    try:
+        started = time.perf_counter()
+        seed(cur, args.orders)
+        cur.execute(f"ANALYZE {SCHEMA}.orders")
+        print(f'seed {args.orders} orders with search index: {time.perf_counter() - started:.1f} s')
+        queries = sample_queries(cur, args.queries)
+
+        def indexed(q: str) -> set:
+            body = json.loads(index.handle_search(conn, {'q': q, 'limit': '50', 'fields': 'id'})['body'])
+            return {row['id'] for row in body['orders']}
+
+        run('tsvector index (q=)', queries, indexed)
+        scanned = run('ILIKE without index', queries, lambda q: ilike(cur, q))
+        if args.full_list:
+            def client_side(q: str) -> list:
+                orders = json.loads(index.handle_get(conn, {}, {})['body'])
+                terms = q.lower().split()
+                return [o for o in orders if all(
+                    term in f"{o['customer_name']} {o['address']} {o['customer_phone']}".lower() for term in terms
+                )][:50]
+            run('full list + client filter', queries[:5], client_side)
+
+        # Поиск по префиксам слов: совпадения ILIKE в середине слова/номера он не находит
+        matched = total = 0
+        for q, ids in zip(queries, scanned):
+            cur.execute(
+                f"SELECT count(*) FROM {SCHEMA}.orders WHERE id = ANY(%s) AND search_vector @@ to_tsquery('simple', %s)",
+                (list(ids), build_search_query(q))
+            )
+            matched += cur.fetchone()[0]
+            total += len(ids)
+        print(f'ILIKE results also matched by q=: {matched}/{total} ({matched / max(total, 1):.1%})')
+    finally:
+        conn.rollback()
+        conn.close()
@@ -0,0 +1,113 @@
+'''
+Business: Замер сериализации списка заявок в JSON на синтетических строках
+Args: --rows (по умолчанию 50000), --dsn (необязательно: строка подключения к Postgres
+      для сравнения с json_agg на стороне БД)
+Returns: Время на весь список и на строку: прежний json.dumps(default=str),
+         stdlib-энкодер из core.py, orjson (если установлен) и json_agg
+
+Запуск: python bench/bench_serialize.py --rows 50000 --dsn "$DATABASE_URL"
+'''
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from datetime import datetime, date, time as time_of_day, timedelta
+from decimal import Decimal
+
+# Скрипт лежит в bench/, модули функции - в backend/orders-api
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backend', 'orders-api'))
+import core
+
+STATUSES = ('new', 'pending', 'confirmed', 'in_progress', 'completed', 'cancelled')
+
+def make_rows(count: int) -> list:
+    started_at = datetime(2025, 1, 1, 8, 0)
+    rows = []
+    for i in range(count):
+        created_at = started_at + timedelta(minutes=i * 7, microseconds=i)
+        items = [{'name': f'Розетка {j}', 'quantity': j + 1, 'price': 350, 'total': 350 * (j + 1)} for j in range(random.randint(1, 5))]
+        rows.append({
+            'id': i + 1, 'order_uid': f'ORD-{i:08d}', 'client_id': None, 'executor_id': random.randint(1, 50),
+            'status': random.choice(STATUSES), 'customer_name': f'Клиент {i}', 'customer_phone': f'+7900{i:07d}',
+            'customer_email': None, 'address': f'г. Калининград, ул. Ленина, д. {i % 300}',
+            'location_lat': Decimal('54.71042600') + Decimal(i % 1000) / 100000,
+            'location_lng': Decimal('20.45226100') + Decimal(i % 1000) / 100000,
+            'scheduled_date': date(2025, 1, 1) + timedelta(days=i % 365), 'scheduled_time': time_of_day(8 + i % 10, 0),
+            'preferred_date': None, 'time_slot': None, 'items': items,
+            'total_price': Decimal(sum(item['total'] for item in items)).quantize(Decimal('0.01')),
+            'total_switches': i % 7, 'total_outlets': i % 11, 'total_points': i % 18,
+            'estimated_cable': i % 18 * 8, 'estimated_frames': i % 18,
+            'assigned_to': None, 'assigned_to_name': None, 'client_notes': None,
+            'payment_status': 'pending', 'paid_amount': Decimal('0.00'), 'payments': [],
+            'planfix_task_id': None, 'google_task_id': None, 'created_at': created_at, 'updated_at': created_at
+        })
+    return rows
+
+def run(label: str, rows_count: int, encode) -> None:
+    started = time.perf_counter()
+    body = encode()
+    elapsed = time.perf_counter() - started
+    print(f'{label:<26} {elapsed * 1000:8.1f} ms total, {elapsed / rows_count * 1e6:6.2f} us/row, {len(body) / 1e6:6.1f} MB')
+
+def run_database(dsn: str, rows: list) -> None:
+    '''Полный путь от запроса до тела ответа: SELECT * + кодирование в Python против json_agg'''
+    import psycopg2
+    import psycopg2.extras
+
+    conn = psycopg2.connect(dsn)
+    cur = conn.cursor()
+    cur.execute("""
+        CREATE TEMP TABLE bench_orders (
+            id INT, order_uid TEXT, status TEXT, customer_name TEXT, address TEXT,
+            location_lat DECIMAL(10,8), location_lng DECIMAL(11,8), scheduled_date DATE, scheduled_time TIME,
+            items JSONB, total_price DECIMAL(10,2), paid_amount DECIMAL(10,2), created_at TIMESTAMP, updated_at TIMESTAMP
+        )
+    """)
+    columns = ('id', 'order_uid', 'status', 'customer_name', 'address', 'location_lat', 'location_lng',
+               'scheduled_date', 'scheduled_time', 'items', 'total_price', 'paid_amount', 'created_at', 'updated_at')
+    psycopg2.extras.execute_values(
+        cur, f"INSERT INTO bench_orders ({', '.join(columns)}) VALUES %s",
+        [tuple(json.dumps(row[name]) if name == 'items' else row[name] for name in columns) for row in rows],
+        page_size=1000
+    )
+    cur.execute("ANALYZE bench_orders")
+
+    def python_encoded() -> str:
+        dict_cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+        dict_cur.execute("SELECT * FROM bench_orders ORDER BY created_at DESC, id DESC")
+        body = core.json_dumps(dict_cur.fetchall())
+        dict_cur.close()
+        return body
+
+    def database_encoded() -> str:
+        cur.execute("""
+            SELECT COALESCE(json_agg(o ORDER BY o.created_at DESC, o.id DESC), '[]')::text
+            FROM bench_orders o
+        """)
+        return cur.fetchone()[0]
+
+    run('db: SELECT + json_dumps', len(rows), python_encoded)
+    run('db: json_agg', len(rows), database_encoded)
+    conn.close()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=50000)
+    parser.add_argument('--dsn')
+    args = parser.parse_args()
+
+    random.seed(42)
+    rows = make_rows(args.rows)
+    stdlib_encode = json.JSONEncoder(default=core._to_json, ensure_ascii=False, separators=(',', ':')).encode
+
+    run('json.dumps(default=str)', len(rows), lambda: json.dumps([dict(row) for row in rows], default=str))
+    run('stdlib JSONEncoder', len(rows), lambda: stdlib_encode(rows))
+    if core.orjson is not None:
+        run('orjson', len(rows), lambda: core.json_dumps(rows))
+    else:
+        print('orjson не установлен - core.json_dumps использует stdlib JSONEncoder')
+    if args.dsn:
+        run_database(args.dsn, rows)
@@ -0,0 +1,63 @@
+'''
+Business: Замер поиска свободных окон по индексу занятости исполнителей
+Args: --executors (по умолчанию 100), --days (60), --busy (доля занятых слотов, 0.3), --repeat (50)
+Returns: Время загрузки индекса и одного запроса find_slots по всему диапазону
+
+Запуск: python bench/bench_slots.py --executors 100 --days 60
+'''
+
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import date, timedelta
+
+# Скрипт лежит в bench/, модули функции - в backend/orders-api
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backend', 'orders-api'))
+from availability import AvailabilityIndex, SLOTS_PER_DAY, SLOT_MINUTES, SLOT_TIMES, duration_slots
+
+def make_index(executors: int, days: int, busy_share: float) -> AvailabilityIndex:
+    start = date.today()
+    busy_rows = [
+        (executor_id, start + timedelta(days=offset), SLOT_TIMES[slot])
+        for offset in range(days)
+        for executor_id in range(1, executors + 1)
+        for slot in range(SLOTS_PER_DAY)
+        if random.random() < busy_share
+    ]
+    index = AvailabilityIndex()
+    started = time.perf_counter()
+    index.load(list(range(1, executors + 1)), busy_rows)
+    print(f'load {len(busy_rows)} busy slots    {(time.perf_counter() - started) * 1000:7.2f} ms')
+    index.range = (start, start + timedelta(days=days - 1))
+    return index
+
+def run(label: str, repeat: int, find) -> None:
+    started = time.perf_counter()
+    for _ in range(repeat):
+        slots = find()
+    elapsed = (time.perf_counter() - started) / repeat
+    print(f'{label:<28} {elapsed * 1000:7.2f} ms/query, {len(slots)} windows')
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--executors', type=int, default=100)
+    parser.add_argument('--days', type=int, default=60)
+    parser.add_argument('--busy', type=float, default=0.3)
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    random.seed(42)
+    index = make_index(args.executors, args.days, args.busy)
+    date_from, date_to = index.range
+
+    for minutes in (SLOT_MINUTES, SLOT_MINUTES * 2, SLOT_MINUTES * 4):
+        length = duration_slots(minutes)
+        run(f'duration {minutes} min', args.repeat, lambda: index.find_slots(date_from, date_to, length))
+    run('duration 120 min, 5 executors', args.repeat,
+        lambda: index.find_slots(date_from, date_to, duration_slots(120), [1, 2, 3, 4, 5]))
+    run('duration 120 min, with ids', args.repeat,
+        lambda: index.find_slots(date_from, date_to, duration_slots(120), with_executors=True))
+    run('first 20 windows, with ids', args.repeat,
+        lambda: index.find_slots(date_from, date_to, duration_slots(120), limit=20, with_executors=True))
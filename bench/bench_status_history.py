@@ -0,0 +1,138 @@
+'''
+Business: Замер отчёта о времени в статусах и ленты заявки по order_status_history
+Args: --dsn (строка подключения к Postgres, обязательно), --orders (100000), --lookups (1000)
+Returns: Время отчёта status_times по previous_seconds, оконным запросом по всему журналу
+         и в Python, среднее время ленты одной заявки и число расхождений перцентилей (должно быть 0)
+
+Запуск: python bench/bench_status_history.py --dsn "$DATABASE_URL" --orders 100000
+Заявки и журнал вставляются в одной транзакции, которая в конце откатывается.
+'''
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from collections import defaultdict
+import psycopg2
+
+# Скрипт лежит в bench/, модули функции - в backend/orders-api
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backend', 'orders-api'))
+
+SCHEMA = 't_p78209571_electric_service_aut'
+PATH = ('new', 'confirmed', 'in_progress', 'completed')
+PERCENTILES = (0.5, 0.9, 0.95)
+
+# Без previous_seconds: интервалы восстанавливаются оконной функцией по всему журналу
+WINDOW_QUERY = f"""
+    SELECT status, (percentile_cont(0.5) WITHIN GROUP (ORDER BY seconds))::bigint,
+           (percentile_cont(0.9) WITHIN GROUP (ORDER BY seconds))::bigint,
+           (percentile_cont(0.95) WITHIN GROUP (ORDER BY seconds))::bigint
+    FROM (
+        SELECT status, EXTRACT(EPOCH FROM LEAD(created_at) OVER w - created_at) AS seconds
+        FROM {SCHEMA}.order_status_history
+        WINDOW w AS (PARTITION BY order_id ORDER BY created_at, id)
+    ) AS t
+    WHERE seconds IS NOT NULL GROUP BY status
+"""
+
+def percentile(values: list, fraction: float) -> float:
+    '''Как percentile_cont в Postgres: линейная интерполяция между соседними значениями'''
+    position = (len(values) - 1) * fraction
+    lower = int(position)
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * (position - lower)
+
+def python_status_times(cur) -> dict:
+    '''Прежний способ: весь журнал в приложение, интервалы и перцентили в цикле'''
+    cur.execute(f"SELECT order_id, status, created_at FROM {SCHEMA}.order_status_history ORDER BY order_id, created_at, id")
+    durations = defaultdict(list)
+    previous = None
+    for order_id, status, created_at in cur.fetchall():
+        if previous and previous[0] == order_id:
+            durations[previous[1]].append((created_at - previous[2]).total_seconds())
+        previous = (order_id, status, created_at)
+    result = {}
+    for status, values in durations.items():
+        values.sort()
+        result[status] = [round(percentile(values, fraction)) for fraction in PERCENTILES]
+    return result
+
+def seed(cur, orders: int) -> None:
+    cur.execute(f"""
+        INSERT INTO {SCHEMA}.orders (order_uid, customer_name, customer_phone, address, status, created_at)
+        SELECT 'BENCH-' || i, 'Замер', '+70000000000', 'ул. Тестовая', 'new', NOW() - interval '30 days'
+        FROM generate_series(1, %s) AS i
+    """, (orders,))
+    # Путь заявки: new -> confirmed -> in_progress -> completed, часть заявок не доходит до конца
+    cur.execute(f"""
+        INSERT INTO {SCHEMA}.order_status_history (order_id, status, changed_by, created_at)
+        SELECT o.id, (%s::varchar[])[step], 'bench',
+               o.created_at + make_interval(secs => step * (600 + (o.id * 7919 + step * 104729) %% 86400))
+        FROM {SCHEMA}.orders o
+        CROSS JOIN generate_series(1, 4) AS step
+        WHERE o.order_uid LIKE 'BENCH-%%' AND step <= 1 + o.id %% 4
+    """, (list(PATH),))
+    cur.execute(f"""
+        UPDATE {SCHEMA}.order_status_history h
+        SET previous_status = p.previous_status, previous_seconds = p.previous_seconds
+        FROM (
+            SELECT id, LAG(status) OVER w AS previous_status,
+                   EXTRACT(EPOCH FROM created_at - LAG(created_at) OVER w)::integer AS previous_seconds
+            FROM {SCHEMA}.order_status_history WHERE changed_by = 'bench'
+            WINDOW w AS (PARTITION BY order_id ORDER BY created_at, id)
+        ) p
+        WHERE p.id = h.id AND p.previous_status IS NOT NULL
+    """)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--dsn', default=os.environ.get('DATABASE_URL'))
+    parser.add_argument('--orders', type=int, default=100000)
+    parser.add_argument('--lookups', type=int, default=1000)
+    args = parser.parse_args()
+    if not args.dsn:
+        sys.exit('--dsn or DATABASE_URL is required')
+
+    import index
+
+    conn = psycopg2.connect(args.dsn)
+    cur = conn.cursor()
+    try:
+        started = time.perf_counter()
+        seed(cur, args.orders)
+        cur.execute(f"ANALYZE {SCHEMA}.order_status_history")
+        cur.execute(f"SELECT COUNT(*) FROM {SCHEMA}.order_status_history")
+        print(f'seed {args.orders} orders, {cur.fetchone()[0]} history rows: {time.perf_counter() - started:.1f} s')
+
+        started = time.perf_counter()
+        in_python = python_status_times(cur)
+        print(f'status_times in Python   {(time.perf_counter() - started) * 1000:9.1f} ms')
+        started = time.perf_counter()
+        cur.execute(WINDOW_QUERY)
+        by_window = {status: list(values) for status, *values in cur.fetchall()}
+        print(f'status_times by window   {(time.perf_counter() - started) * 1000:9.1f} ms')
+        started = time.perf_counter()
+        report = json.loads(index.handle_status_times_report(conn, None, None)['body'])['rows']
+        print(f'status_times by previous {(time.perf_counter() - started) * 1000:9.1f} ms')
+        in_sql = {
+            row['status']: [row['p50_seconds'], row['p90_seconds'], row['p95_seconds']]
+            for row in report if row['transitions']
+        }
+        mismatches = sum(
+            in_sql.get(status) != values or by_window.get(status) != values for status, values in in_python.items()
+        )
+
+        cur.execute(f"SELECT order_uid FROM {SCHEMA}.orders WHERE order_uid LIKE 'BENCH-%%'")
+        order_uids = [row[0] for row in cur.fetchall()]
+        sample = random.Random(42).sample(order_uids, min(args.lookups, len(order_uids)))
+        started = time.perf_counter()
+        for order_uid in sample:
+            index.handle_history(conn, {'id': order_uid})
+        elapsed = time.perf_counter() - started
+        print(f'timeline per order       {elapsed / len(sample) * 1000:9.3f} ms ({len(sample)} lookups)')
+        print(f'mismatches: {mismatches}')
+    finally:
+        conn.rollback()
+        conn.close()
@@ -0,0 +1,87 @@
+'''
+Business: Замер рендера писем из серверных шаблонов на пачке сообщений
+Args: --messages (по умолчанию 10000)
+Returns: Время на письмо: с кэшем скомпилированных шаблонов, с разбором на каждое письмо
+         и для прежнего f-string в send-feedback (без экранирования)
+
+Запуск: python bench/bench_templates.py --messages 10000
+'''
+
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime
+
+# Скрипт лежит в bench/, модули функции - в backend/send-email
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backend', 'send-email'))
+from email_templates import TEMPLATES, compile_template, render_email
+
+def legacy_feedback(variables: dict) -> str:
+    return f"""
+    <html>
+      <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333;">
+        <h2 style="color: #f59e0b;">💡 Новая идея от пользователя</h2>
+        <div style="background-color: #fef3c7; padding: 15px; border-radius: 8px; margin: 20px 0;">
+          <p style="font-size: 16px; margin: 0;">{variables['feedback_text']}</p>
+        </div>
+        <hr style="border: none; border-top: 1px solid #e5e7eb; margin: 20px 0;">
+        <p style="color: #6b7280; font-size: 14px;">
+          <strong>Время получения:</strong> {datetime.now().strftime("%d.%m.%Y в %H:%M:%S")}<br>
+          <strong>Request ID:</strong> {variables['request_id']}
+        </p>
+      </body>
+    </html>
+    """
+
+def make_messages(count: int) -> list:
+    messages = []
+    for i in range(count):
+        items = [
+            {'name': f'Розетка <{j}>', 'quantity': j + 1, 'price': 350, 'total': 350 * (j + 1), 'description': 'С заземлением'}
+            for j in range(random.randint(1, 8))
+        ]
+        messages.append(random.choice([
+            ('order-created', {
+                'order_number': f'{i:06d}', 'customer_name': f'Клиент {i}', 'phone': '+7 900 000-00-00',
+                'address': f'ул. Ленина, д. {i} & кв. 5', 'date': '2026-10-17', 'time': '10:00',
+                'total_amount': sum(item['total'] for item in items), 'items': items, 'status': 'pending',
+                'total_switches': 3, 'total_outlets': 5, 'total_points': 8, 'estimated_cable': 64, 'estimated_frames': 8
+            }),
+            ('status-changed', {
+                'order_number': f'{i:06d}', 'old_status': 'pending', 'status': 'in_progress',
+                'phone': '+7 900 000-00-00', 'address': f'ул. Ленина, д. {i}', 'total_amount': 12500.5,
+                'electrician_name': 'Иван <Электрик>'
+            }),
+            ('feedback', {
+                'feedback_text': f'Идея номер {i}: <b>онлайн-оплата</b>', 'received_at': '17.10.2026 в 10:00:00',
+                'received_at_short': '17.10.2026 10:00', 'request_id': f'req-{i}'
+            })
+        ]))
+    return messages
+
+def run(label: str, messages: list, render) -> None:
+    started = time.perf_counter()
+    for name, variables in messages:
+        render(name, variables)
+    elapsed = time.perf_counter() - started
+    print(f'{label:<22} {elapsed * 1000:8.2f} ms total, {elapsed / len(messages) * 1e6:7.2f} us/message')
+
+def render_uncached(name: str, variables: dict) -> tuple:
+    subject, html = TEMPLATES[name]
+    return compile_template(subject, autoescape=False)(variables), compile_template(html)(variables)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--messages', type=int, default=10000)
+    args = parser.parse_args()
+
+    random.seed(42)
+    messages = make_messages(args.messages)
+    feedback = [message for message in messages if message[0] == 'feedback']
+
+    run('cached templates', messages, render_email)
+    run('parse per message', messages, render_uncached)
+    run('feedback: f-string', feedback, lambda name, variables: legacy_feedback(variables))
+    run('feedback: cached', feedback, render_email)
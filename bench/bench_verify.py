@@ -0,0 +1,74 @@
+'''
+Business: Замер проверки initData Telegram: прежняя реализация против TelegramVerifier
+Args: --logins (по умолчанию 20000), --unique (сколько разных initData, по умолчанию 500)
+Returns: Проверок в секунду: прежняя, новая без попаданий в кэш, новая с повторными входами
+
+Запуск: python bench/bench_verify.py --logins 20000
+'''
+
+import argparse
+import hashlib
+import hmac
+import json
+import os
+import random
+import sys
+import time
+from urllib.parse import parse_qs, urlencode
+
+# Скрипт лежит в bench/, модули функции - в backend/telegram-auth
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backend', 'telegram-auth'))
+from index import TelegramVerifier, TelegramUser
+
+BOT_TOKEN = '123456789:AAHdqTcvCH1vGWJxfSeofSAs0K5PALDsaw'
+
+def legacy_verify(init_data: str, bot_token: str):
+    params = parse_qs(init_data)
+    data_check_string = '\n'.join(f'{key}={params[key][0]}' for key in sorted(params.keys()) if key != 'hash')
+    secret_key = hmac.new('WebAppData'.encode(), bot_token.encode(), hashlib.sha256).digest()
+    calculated_hash = hmac.new(secret_key, data_check_string.encode(), hashlib.sha256).hexdigest()
+    if calculated_hash != params.get('hash', [''])[0]:
+        return False
+    user_data = json.loads(params.get('user', ['{}'])[0])
+    return TelegramUser(
+        id=user_data.get('id'),
+        first_name=user_data.get('first_name', ''),
+        last_name=user_data.get('last_name'),
+        username=user_data.get('username'),
+        photo_url=user_data.get('photo_url')
+    )
+
+def make_init_data(user_id: int) -> str:
+    params = {
+        'query_id': f'AAH{user_id:010d}',
+        'user': json.dumps({'id': user_id, 'first_name': 'Иван', 'last_name': 'Петров', 'username': f'user{user_id}'}),
+        'auth_date': str(int(time.time())),
+    }
+    data_check_string = '\n'.join(f'{key}={params[key]}' for key in sorted(params))
+    secret_key = hmac.new(b'WebAppData', BOT_TOKEN.encode(), hashlib.sha256).digest()
+    params['hash'] = hmac.new(secret_key, data_check_string.encode(), hashlib.sha256).hexdigest()
+    return urlencode(params)
+
+def run(label: str, logins: list, verify) -> None:
+    started = time.perf_counter()
+    for init_data in logins:
+        assert verify(init_data)
+    elapsed = time.perf_counter() - started
+    print(f'{label:<22} {len(logins) / elapsed:10.0f} verifications/s, {elapsed / len(logins) * 1e6:6.2f} us each')
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--logins', type=int, default=20000)
+    parser.add_argument('--unique', type=int, default=500)
+    args = parser.parse_args()
+
+    random.seed(42)
+    pool = [make_init_data(100000 + i) for i in range(args.unique)]
+    unique_logins = [make_init_data(200000 + i) for i in range(args.logins)]
+    repeated_logins = [random.choice(pool) for _ in range(args.logins)]
+
+    run('legacy', unique_logins, lambda init_data: legacy_verify(init_data, BOT_TOKEN))
+    run('verifier, cache miss', unique_logins, TelegramVerifier(BOT_TOKEN, cache_size=0).verify)
+    verifier = TelegramVerifier(BOT_TOKEN)
+    run('verifier, repeated', repeated_logins, verifier.verify)
+    print(f'cache stats: {verifier.stats}')
@@ -0,0 +1,60 @@
+'''
+Business: Замер стоимости разбора webhook Планфикса (ID заявки + статус) на пачке событий
+Args: --events (по умолчанию 10000)
+Returns: Время на событие для прежней реализации и для status_mapping
+
+Запуск: python bench/bench_webhook.py --events 10000
+'''
+
+import argparse
+import os
+import random
+import re
+import sys
+import time
+
+# Скрипт лежит в bench/, модули функции - в backend/planfix
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backend', 'planfix'))
+from status_mapping import StatusMapper, extract_order_id
+
+STATUSES = ['Новая', 'В работе', 'Выполняется', 'Принято', 'Завершена', 'Закрыта', 'Отменена', 'На паузе']
+
+def legacy_extract_order_id(title: str) -> str:
+    match = re.search(r'Заявка #([A-Z]+-\d+)', title)
+    if match:
+        return match.group(1)
+    return ''
+
+def legacy_map_status(planfix_status: str) -> str:
+    status_mapping = {
+        'новая': 'new', 'новое': 'new', 'в работе': 'in_progress', 'выполняется': 'in_progress',
+        'принято': 'confirmed', 'подтверждено': 'confirmed', 'завершена': 'completed',
+        'завершено': 'completed', 'выполнена': 'completed', 'закрыта': 'completed',
+        'отменена': 'cancelled', 'отменено': 'cancelled'
+    }
+    return status_mapping.get(planfix_status.lower(), 'new')
+
+def make_events(count: int) -> list:
+    # Повторяющиеся задачи, как при массовом переносе задач менеджером
+    tasks = [f'Заявка #ORD-{1700000000000 + i} - Клиент {i}' for i in range(max(1, count // 5))]
+    return [(random.choice(tasks), random.choice(STATUSES)) for _ in range(count)]
+
+def run(label: str, events: list, extract, map_status) -> None:
+    started = time.perf_counter()
+    for title, status in events:
+        extract(title)
+        map_status(status)
+    elapsed = time.perf_counter() - started
+    print(f'{label:<16} {elapsed * 1000:8.2f} ms total, {elapsed / len(events) * 1e6:6.2f} us/event')
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--events', type=int, default=10000)
+    args = parser.parse_args()
+
+    random.seed(42)
+    events = make_events(args.events)
+    mapper = StatusMapper()
+
+    run('legacy', events, legacy_extract_order_id, legacy_map_status)
+    run('status_mapping', events, extract_order_id, mapper.map)
@@ -0,0 +1,135 @@
+'''
+Business: Нагрузочный тест бронирования: много потоков назначают заявки на одни и те же слоты
+Args: --dsn (строка подключения к Postgres, обязательно), --threads (32), --attempts (200 на поток),
+      --orders (200), --executors (3), --slots (4), --legacy (прежний PUT без брони для сравнения)
+Returns: Число успешных назначений, конфликтов и двойных броней (должно быть 0)
+
+Запуск: python bench/loadtest_reservations.py --dsn "$DATABASE_URL" --threads 32
+ВНИМАНИЕ: создаёт заявки LOADTEST-* и исполнителей, в конце удаляет их - не запускать на проде.
+'''
+
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import date
+import psycopg2
+
+# Скрипт лежит в bench/, модули функции - в backend/orders-api
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backend', 'orders-api'))
+
+SCHEMA = 't_p78209571_electric_service_aut'
+DAY = date(2099, 1, 1)
+
+lock = threading.Lock()
+
+def setup(dsn: str, orders: int, executors: int) -> list:
+    conn = psycopg2.connect(dsn)
+    cur = conn.cursor()
+    cur.execute(f"""
+        INSERT INTO {SCHEMA}.executors (name, is_active)
+        SELECT 'LOADTEST ' || i, true FROM generate_series(1, %s) AS i RETURNING id
+    """, (executors,))
+    executor_ids = [row[0] for row in cur.fetchall()]
+    cur.execute(f"""
+        INSERT INTO {SCHEMA}.orders (order_uid, customer_name, customer_phone, address)
+        SELECT 'LOADTEST-' || i, 'Нагрузка', '+70000000000', 'ул. Тестовая' FROM generate_series(1, %s) AS i
+    """, (orders,))
+    conn.commit()
+    conn.close()
+    return executor_ids
+
+def cleanup(dsn: str, executor_ids: list) -> None:
+    conn = psycopg2.connect(dsn)
+    cur = conn.cursor()
+    cur.execute(f"DELETE FROM {SCHEMA}.executor_calendar WHERE executor_id = ANY(%s)", (executor_ids,))
+    cur.execute(f"DELETE FROM {SCHEMA}.orders WHERE order_uid LIKE 'LOADTEST-%%'")
+    cur.execute(f"DELETE FROM {SCHEMA}.executors WHERE id = ANY(%s)", (executor_ids,))
+    conn.commit()
+    conn.close()
+
+def legacy_put(conn, order_uid: str, body: dict) -> int:
+    '''Прежний handle_put: UPDATE без проверки занятости'''
+    cur = conn.cursor()
+    cur.execute(f"""
+        UPDATE {SCHEMA}.orders SET executor_id = %s, scheduled_date = %s, scheduled_time = %s, updated_at = NOW()
+        WHERE order_uid = %s
+    """, (body['executor_id'], body['scheduled_date'], body['scheduled_time'], order_uid))
+    conn.commit()
+    cur.close()
+    return 200
+
+def worker(dsn: str, attempts: int, orders: int, executor_ids: list, slot_times: list, legacy: bool, results: Counter) -> None:
+    conn = psycopg2.connect(dsn)
+    local = Counter()
+    for _ in range(attempts):
+        order_uid = f'LOADTEST-{random.randint(1, orders)}'
+        body = {
+            'executor_id': random.choice(executor_ids),
+            'scheduled_date': DAY.isoformat(),
+            'scheduled_time': random.choice(slot_times)
+        }
+        status = legacy_put(conn, order_uid, body) if legacy else index.handle_put(conn, {'id': order_uid}, body)['statusCode']
+        local[status] += 1
+    conn.close()
+    with lock:
+        results.update(local)
+
+def double_bookings(dsn: str) -> int:
+    '''Пары заявок на одного исполнителя в одно время'''
+    conn = psycopg2.connect(dsn)
+    cur = conn.cursor()
+    cur.execute(f"""
+        SELECT COALESCE(SUM(cnt - 1), 0) FROM (
+            SELECT COUNT(*) AS cnt FROM {SCHEMA}.orders
+            WHERE order_uid LIKE 'LOADTEST-%%' AND executor_id IS NOT NULL AND status <> 'cancelled'
+            GROUP BY executor_id, scheduled_date, scheduled_time HAVING COUNT(*) > 1
+        ) AS t
+    """)
+    doubles = int(cur.fetchone()[0])
+    conn.close()
+    return doubles
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--dsn', default=os.environ.get('DATABASE_URL'))
+    parser.add_argument('--threads', type=int, default=32)
+    parser.add_argument('--attempts', type=int, default=200)
+    parser.add_argument('--orders', type=int, default=200)
+    parser.add_argument('--executors', type=int, default=3)
+    parser.add_argument('--slots', type=int, default=4)
+    parser.add_argument('--legacy', action='store_true')
+    args = parser.parse_args()
+    if not args.dsn:
+        sys.exit('--dsn or DATABASE_URL is required')
+
+    import index
+    from availability import SLOT_TIMES
+
+    random.seed(42)
+    executor_ids = setup(args.dsn, args.orders, args.executors)
+    results: Counter = Counter()
+    try:
+        threads = [
+            threading.Thread(target=worker, args=(
+                args.dsn, args.attempts, args.orders, executor_ids, list(SLOT_TIMES[:args.slots]), args.legacy, results
+            ))
+            for _ in range(args.threads)
+        ]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        total = sum(results.values())
+        print(f"{'legacy PUT' if args.legacy else 'PUT with reservation'}: {args.threads} threads, "
+              f"{args.executors * args.slots} slots, {total} attempts in {elapsed:.1f} s ({total / elapsed:.0f}/s)")
+        print(f'  statuses: {dict(sorted(results.items()))}')
+        print(f'  double bookings: {double_bookings(args.dsn)}')
+    finally:
+        cleanup(args.dsn, executor_ids)
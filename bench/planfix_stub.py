@@ -0,0 +1,95 @@
+'''
+Business: Локальная заглушка REST API Планфикса для нагрузочной проверки воркера очереди
+Args: --port, --fail-rate (доля ответов 503), --latency-ms (задержка ответа),
+      --lose-rate (доля задач, которые создаются, но ответ приходит без id)
+Returns: POST /rest/task/create -> {"result": "success", "id": N};
+         POST /rest/task/list -> {"result": "success", "tasks": [{id, name}]} (фильтр по названию);
+         GET /stats - счётчики
+
+Запуск: python bench/planfix_stub.py --port 8099 --fail-rate 0.2 --latency-ms 150
+Затем PLANFIX_BASE_URL=http://localhost:8099 и вызовы POST /?drain=true.
+В /stats поле duplicates показывает, сколько задач пришло повторно с тем же name.
+'''
+
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+class StubState:
+    def __init__(self, fail_rate: float, latency_ms: int, lose_rate: float = 0.0):
+        self.fail_rate = fail_rate
+        self.latency_ms = latency_ms
+        self.lose_rate = lose_rate
+        self.lock = threading.Lock()
+        self.next_id = 1
+        self.requests = 0
+        self.failures = 0
+        self.names: dict = {}
+        self.tasks: dict = {}
+
+def make_handler(state: StubState):
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            length = int(self.headers.get('Content-Length') or 0)
+            payload = json.loads(self.rfile.read(length) or b'{}')
+            time.sleep(state.latency_ms / 1000)
+
+            with state.lock:
+                state.requests += 1
+                if self.path == '/rest/task/list':
+                    names = {f.get('value') for f in payload.get('filters') or []}
+                    tasks = [{'id': task_id, 'name': name} for task_id, name in state.tasks.items() if name in names]
+                    return self._reply(200, {'result': 'success', 'tasks': tasks})
+                if self.path != '/rest/task/create':
+                    return self._reply(404, {'result': 'fail', 'error': 'Unknown method'})
+                if random.random() < state.fail_rate:
+                    state.failures += 1
+                    return self._reply(503, {'result': 'fail', 'error': 'Service unavailable'})
+                task_id = state.next_id
+                state.next_id += 1
+                name = payload.get('name', '')
+                state.names[name] = state.names.get(name, 0) + 1
+                state.tasks[task_id] = name
+                lost = random.random() < state.lose_rate
+
+            # Задача создана, но клиент не узнает её id - как при оборванном ответе
+            self._reply(200, {'result': 'success'} if lost else {'result': 'success', 'id': task_id})
+
+        def do_GET(self):
+            with state.lock:
+                stats = {
+                    'requests': state.requests,
+                    'failures': state.failures,
+                    'tasks_created': state.next_id - 1,
+                    'duplicates': sum(count - 1 for count in state.names.values())
+                }
+            self._reply(200, stats)
+
+        def log_message(self, format, *args):
+            pass
+
+        def _reply(self, status: int, body: dict):
+            data = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+    return Handler
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--port', type=int, default=8099)
+    parser.add_argument('--fail-rate', type=float, default=0.0)
+    parser.add_argument('--latency-ms', type=int, default=50)
+    parser.add_argument('--lose-rate', type=float, default=0.0)
+    args = parser.parse_args()
+
+    state = StubState(args.fail_rate, args.latency_ms, args.lose_rate)
+    server = ThreadingHTTPServer(('127.0.0.1', args.port), make_handler(state))
+    print(f'Planfix stub listening on http://127.0.0.1:{args.port}')
+    server.serve_forever()
@@ -0,0 +1,10 @@
+-- Составной индекс для keyset-пагинации списка заявок (ORDER BY created_at DESC, id DESC)
+CREATE INDEX IF NOT EXISTS idx_orders_created_at_id
+    ON t_p78209571_electric_service_aut.orders(created_at DESC, id DESC);
+
+-- Те же фильтры, что и в handle_get, с сохранением порядка выдачи
+CREATE INDEX IF NOT EXISTS idx_orders_status_created_at_id
+    ON t_p78209571_electric_service_aut.orders(status, created_at DESC, id DESC);
+
+CREATE INDEX IF NOT EXISTS idx_orders_assigned_to_created_at_id
+    ON t_p78209571_electric_service_aut.orders(assigned_to, created_at DESC, id DESC);
@@ -0,0 +1,3 @@
+-- Индекс для дельта-опроса (GET /?since=...) и расчёта ETag по max(updated_at)
+CREATE INDEX IF NOT EXISTS idx_orders_updated_at_id
+    ON t_p78209571_electric_service_aut.orders(updated_at, id);
@@ -0,0 +1,24 @@
+-- Очередь (outbox) создания задач в Планфиксе: одна строка на заявку
+CREATE TABLE IF NOT EXISTS t_p78209571_electric_service_aut.planfix_task_queue (
+    id SERIAL PRIMARY KEY,
+    order_id VARCHAR(100) NOT NULL UNIQUE,
+    payload JSONB NOT NULL,
+    status VARCHAR(20) NOT NULL DEFAULT 'pending' CHECK (status IN ('pending', 'processing', 'done', 'failed')),
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    locked_at TIMESTAMP,
+    last_error TEXT,
+    planfix_task_id VARCHAR(100),
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Выборка воркером: готовые к отправке и зависшие в processing
+CREATE INDEX IF NOT EXISTS idx_planfix_queue_pending
+    ON t_p78209571_electric_service_aut.planfix_task_queue(next_attempt_at)
+    WHERE status = 'pending';
+CREATE INDEX IF NOT EXISTS idx_planfix_queue_processing
+    ON t_p78209571_electric_service_aut.planfix_task_queue(locked_at)
+    WHERE status = 'processing';
+
+COMMENT ON TABLE t_p78209571_electric_service_aut.planfix_task_queue IS 'Outbox задач Планфикса; order_id уникален, чтобы повторы не создавали дубликатов';
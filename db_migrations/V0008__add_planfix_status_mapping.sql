@@ -0,0 +1,24 @@
+-- Настраиваемое соответствие статусов Планфикса статусам заявок (читается функцией planfix с TTL)
+CREATE TABLE IF NOT EXISTS t_p78209571_electric_service_aut.planfix_status_mapping (
+    planfix_status VARCHAR(100) PRIMARY KEY,
+    order_status VARCHAR(50) NOT NULL CHECK (order_status IN ('new', 'confirmed', 'in_progress', 'completed', 'cancelled')),
+    is_active BOOLEAN NOT NULL DEFAULT true,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+COMMENT ON COLUMN t_p78209571_electric_service_aut.planfix_status_mapping.planfix_status IS 'Название статуса в Планфиксе в нижнем регистре';
+
+INSERT INTO t_p78209571_electric_service_aut.planfix_status_mapping (planfix_status, order_status) VALUES
+('новая', 'new'),
+('новое', 'new'),
+('в работе', 'in_progress'),
+('выполняется', 'in_progress'),
+('принято', 'confirmed'),
+('подтверждено', 'confirmed'),
+('завершена', 'completed'),
+('завершено', 'completed'),
+('выполнена', 'completed'),
+('закрыта', 'completed'),
+('отменена', 'cancelled'),
+('отменено', 'cancelled')
+ON CONFLICT (planfix_status) DO NOTHING;
@@ -0,0 +1,30 @@
+-- Очередь исходящих писем: обработчики send-email и send-feedback только ставят письмо,
+-- отправляет воркер send-email ?drain=true
+CREATE TABLE IF NOT EXISTS t_p78209571_electric_service_aut.email_outbox (
+    id SERIAL PRIMARY KEY,
+    source VARCHAR(50) NOT NULL,
+    provider VARCHAR(50) NOT NULL DEFAULT 'yandex',
+    to_email VARCHAR(255) NOT NULL,
+    subject VARCHAR(500) NOT NULL,
+    html TEXT NOT NULL,
+    status VARCHAR(20) NOT NULL DEFAULT 'pending' CHECK (status IN ('pending', 'processing', 'sent', 'dead')),
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    locked_at TIMESTAMP,
+    last_error TEXT,
+    send_ms NUMERIC(10,2),
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    sent_at TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_email_outbox_pending
+    ON t_p78209571_electric_service_aut.email_outbox(next_attempt_at)
+    WHERE status = 'pending';
+CREATE INDEX IF NOT EXISTS idx_email_outbox_processing
+    ON t_p78209571_electric_service_aut.email_outbox(locked_at)
+    WHERE status = 'processing';
+CREATE INDEX IF NOT EXISTS idx_email_outbox_sent_at
+    ON t_p78209571_electric_service_aut.email_outbox(sent_at)
+    WHERE status = 'sent';
+
+COMMENT ON COLUMN t_p78209571_electric_service_aut.email_outbox.status IS 'pending → processing → sent; dead - исчерпаны попытки или постоянная ошибка SMTP';
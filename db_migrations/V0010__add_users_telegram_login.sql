@@ -0,0 +1,11 @@
+-- Вход через Telegram: пользователь идентифицируется telegram_id, телефона может не быть
+ALTER TABLE t_p78209571_electric_service_aut.users
+    ADD COLUMN IF NOT EXISTS telegram_id BIGINT,
+    ADD COLUMN IF NOT EXISTS username VARCHAR(255),
+    ADD COLUMN IF NOT EXISTS last_login_at TIMESTAMP;
+
+ALTER TABLE t_p78209571_electric_service_aut.users ALTER COLUMN phone DROP NOT NULL;
+
+-- Цель ON CONFLICT (telegram_id) для upsert при входе
+CREATE UNIQUE INDEX IF NOT EXISTS idx_users_telegram_id
+    ON t_p78209571_electric_service_aut.users(telegram_id);
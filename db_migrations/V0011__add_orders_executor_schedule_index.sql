@@ -0,0 +1,4 @@
+-- Индекс для расчёта занятости исполнителей (GET /?slots=true): назначенные заявки по датам
+CREATE INDEX IF NOT EXISTS idx_orders_executor_scheduled_date
+    ON t_p78209571_electric_service_aut.orders(executor_id, scheduled_date)
+    WHERE executor_id IS NOT NULL;
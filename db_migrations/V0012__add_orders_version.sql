@@ -0,0 +1,4 @@
+-- Версия заявки для оптимистичной блокировки: каждое изменение увеличивает version,
+-- PUT с устаревшей version получает 409 вместо перезаписи чужих правок
+ALTER TABLE t_p78209571_electric_service_aut.orders
+    ADD COLUMN IF NOT EXISTS version INTEGER NOT NULL DEFAULT 1;
@@ -0,0 +1,55 @@
+-- Позиции заявки: order_services заполняется вместе с заявкой (orders-api), items в orders
+-- остаётся для фронтенда. Позиция может не ссылаться на services - тогда название и
+-- категория хранятся в самой строке
+ALTER TABLE t_p78209571_electric_service_aut.order_services
+    ADD COLUMN IF NOT EXISTS name VARCHAR(255),
+    ADD COLUMN IF NOT EXISTS category VARCHAR(100),
+    ADD COLUMN IF NOT EXISTS slots INTEGER,
+    ADD COLUMN IF NOT EXISTS line_total DECIMAL(12,2);
+
+CREATE INDEX IF NOT EXISTS idx_order_services_order_id
+    ON t_p78209571_electric_service_aut.order_services(order_id);
+
+-- Выручка по категориям: группировка без чтения строк таблицы (index-only scan)
+CREATE INDEX IF NOT EXISTS idx_order_services_category
+    ON t_p78209571_electric_service_aut.order_services(category, order_id, line_total);
+
+-- Позиции заявок, созданных до миграции: разворачиваем orders.items, иначе отчёт по категориям
+-- их не видит. Цена - та, что записана в заявке (как было на момент заказа); услуга и категория
+-- находятся по service_id или точному названию, как в orders-api. Нечисловые quantity/price
+-- считаются 1 и 0, элементы без названия пропускаются
+INSERT INTO t_p78209571_electric_service_aut.order_services (
+    order_id, service_id, name, category, quantity, price, slots, line_total, notes
+)
+SELECT i.order_id, s.id, i.name, COALESCE(i.category, s.category), i.quantity, i.price, i.slots,
+       i.price * i.quantity, i.notes
+FROM (
+    SELECT o.id AS order_id,
+           item->>'name' AS name,
+           NULLIF(item->>'category', '') AS category,
+           CASE WHEN jsonb_typeof(item->'quantity') = 'number' THEN (item->>'quantity')::numeric::integer ELSE 1 END AS quantity,
+           CASE WHEN jsonb_typeof(item->'price') = 'number' THEN round((item->>'price')::numeric, 2) ELSE 0 END AS price,
+           CASE WHEN jsonb_typeof(item->'slots') = 'number' THEN (item->>'slots')::numeric::integer END AS slots,
+           CASE WHEN jsonb_typeof(item->'service_id') = 'number' THEN (item->>'service_id')::numeric::integer END AS service_id,
+           item->>'description' AS notes
+    FROM t_p78209571_electric_service_aut.orders o
+    CROSS JOIN LATERAL jsonb_array_elements(CASE WHEN jsonb_typeof(o.items) = 'array' THEN o.items ELSE '[]'::jsonb END) AS item
+    WHERE jsonb_typeof(item) = 'object' AND COALESCE(item->>'name', '') <> ''
+      AND NOT EXISTS (
+          SELECT 1 FROM t_p78209571_electric_service_aut.order_services os WHERE os.order_id = o.id
+      )
+) i
+LEFT JOIN LATERAL (
+    SELECT sv.id, sv.category FROM t_p78209571_electric_service_aut.services sv
+    WHERE sv.is_active AND (sv.id = i.service_id OR (i.service_id IS NULL AND lower(btrim(sv.name)) = lower(btrim(i.name))))
+    ORDER BY sv.id LIMIT 1
+) s ON true;
+
+-- Строки, записанные раньше без line_total и категории
+UPDATE t_p78209571_electric_service_aut.order_services os
+SET line_total = COALESCE(os.line_total, os.price * COALESCE(os.quantity, 1)),
+    category = COALESCE(os.category, sv.category),
+    name = COALESCE(os.name, sv.name)
+FROM t_p78209571_electric_service_aut.order_services o2
+LEFT JOIN t_p78209571_electric_service_aut.services sv ON sv.id = o2.service_id
+WHERE o2.id = os.id AND (os.line_total IS NULL OR os.category IS NULL OR os.name IS NULL);
@@ -0,0 +1,83 @@
+-- Сводка заявок по дням для отчётов владельца (orders-api ?report=daily|statuses|executors):
+-- число заявок и сумма по (день создания, статус, исполнитель). Ведётся триггерами на orders,
+-- поэтому учитывает любые записи - orders-api, пакетный импорт, вебхук Планфикса.
+-- executor_id = 0 - заявка без исполнителя
+CREATE TABLE IF NOT EXISTS t_p78209571_electric_service_aut.order_daily_summary (
+    day DATE NOT NULL,
+    status VARCHAR(50) NOT NULL,
+    executor_id INTEGER NOT NULL DEFAULT 0,
+    orders INTEGER NOT NULL DEFAULT 0,
+    revenue DECIMAL(14,2) NOT NULL DEFAULT 0,
+    PRIMARY KEY (day, status, executor_id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_order_daily_summary_executor
+    ON t_p78209571_electric_service_aut.order_daily_summary(executor_id, day);
+
+-- Триггеры уровня оператора с таблицами переходов: пакетный импорт на тысячи строк
+-- обновляет сводку одним агрегирующим запросом, а не upsert на каждую строку.
+-- Ключи сводки обновляются по возрастанию, чтобы параллельные транзакции не взаимоблокировались.
+CREATE OR REPLACE FUNCTION t_p78209571_electric_service_aut.order_daily_summary_trigger()
+RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO t_p78209571_electric_service_aut.order_daily_summary AS s (day, status, executor_id, orders, revenue)
+        SELECT created_at::date, COALESCE(status, 'new'), COALESCE(executor_id, 0), COUNT(*), COALESCE(SUM(total_price), 0)
+        FROM new_rows WHERE created_at IS NOT NULL
+        GROUP BY 1, 2, 3 ORDER BY 1, 2, 3
+        ON CONFLICT (day, status, executor_id) DO UPDATE
+            SET orders = s.orders + EXCLUDED.orders, revenue = s.revenue + EXCLUDED.revenue;
+    ELSIF TG_OP = 'DELETE' THEN
+        INSERT INTO t_p78209571_electric_service_aut.order_daily_summary AS s (day, status, executor_id, orders, revenue)
+        SELECT created_at::date, COALESCE(status, 'new'), COALESCE(executor_id, 0), -COUNT(*), -COALESCE(SUM(total_price), 0)
+        FROM old_rows WHERE created_at IS NOT NULL
+        GROUP BY 1, 2, 3 ORDER BY 1, 2, 3
+        ON CONFLICT (day, status, executor_id) DO UPDATE
+            SET orders = s.orders + EXCLUDED.orders, revenue = s.revenue + EXCLUDED.revenue;
+    ELSE
+        -- UPDATE: разница новых и старых строк; нулевые разницы (меняли другие поля) пропускаются
+        INSERT INTO t_p78209571_electric_service_aut.order_daily_summary AS s (day, status, executor_id, orders, revenue)
+        SELECT day, status, executor_id, SUM(orders), SUM(revenue)
+        FROM (
+            SELECT created_at::date AS day, COALESCE(status, 'new') AS status, COALESCE(executor_id, 0) AS executor_id,
+                   1 AS orders, COALESCE(total_price, 0) AS revenue
+            FROM new_rows WHERE created_at IS NOT NULL
+            UNION ALL
+            SELECT created_at::date, COALESCE(status, 'new'), COALESCE(executor_id, 0), -1, -COALESCE(total_price, 0)
+            FROM old_rows WHERE created_at IS NOT NULL
+        ) AS d
+        GROUP BY 1, 2, 3
+        HAVING SUM(orders) <> 0 OR SUM(revenue) <> 0
+        ORDER BY 1, 2, 3
+        ON CONFLICT (day, status, executor_id) DO UPDATE
+            SET orders = s.orders + EXCLUDED.orders, revenue = s.revenue + EXCLUDED.revenue;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_orders_daily_summary_insert ON t_p78209571_electric_service_aut.orders;
+CREATE TRIGGER trg_orders_daily_summary_insert
+    AFTER INSERT ON t_p78209571_electric_service_aut.orders
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION t_p78209571_electric_service_aut.order_daily_summary_trigger();
+
+DROP TRIGGER IF EXISTS trg_orders_daily_summary_update ON t_p78209571_electric_service_aut.orders;
+CREATE TRIGGER trg_orders_daily_summary_update
+    AFTER UPDATE ON t_p78209571_electric_service_aut.orders
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION t_p78209571_electric_service_aut.order_daily_summary_trigger();
+
+DROP TRIGGER IF EXISTS trg_orders_daily_summary_delete ON t_p78209571_electric_service_aut.orders;
+CREATE TRIGGER trg_orders_daily_summary_delete
+    AFTER DELETE ON t_p78209571_electric_service_aut.orders
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION t_p78209571_electric_service_aut.order_daily_summary_trigger();
+
+-- Начальное заполнение по уже существующим заявкам
+TRUNCATE t_p78209571_electric_service_aut.order_daily_summary;
+INSERT INTO t_p78209571_electric_service_aut.order_daily_summary (day, status, executor_id, orders, revenue)
+SELECT created_at::date, COALESCE(status, 'new'), COALESCE(executor_id, 0), COUNT(*), COALESCE(SUM(total_price), 0)
+FROM t_p78209571_electric_service_aut.orders
+WHERE created_at IS NOT NULL
+GROUP BY 1, 2, 3;
@@ -0,0 +1,33 @@
+-- Журнал смен статуса: orders-api и вебхук Планфикса пишут строку на каждую смену
+-- в той же транзакции. Лента заявки читается по (order_id, created_at)
+CREATE INDEX IF NOT EXISTS idx_order_status_history_order_created
+    ON t_p78209571_electric_service_aut.order_status_history(order_id, created_at, id);
+
+-- Прежний статус и сколько секунд заявка в нём пробыла - считаются при записи смены,
+-- поэтому отчёт о времени в статусах - простая агрегация за период без оконной сортировки журнала
+ALTER TABLE t_p78209571_electric_service_aut.order_status_history
+    ADD COLUMN IF NOT EXISTS previous_status VARCHAR(50),
+    ADD COLUMN IF NOT EXISTS previous_seconds INTEGER;
+
+CREATE INDEX IF NOT EXISTS idx_order_status_history_created
+    ON t_p78209571_electric_service_aut.order_status_history(created_at);
+
+-- Начальная запись для заявок без истории: текущий статус с момента последнего изменения
+INSERT INTO t_p78209571_electric_service_aut.order_status_history (order_id, status, comment, changed_by, created_at)
+SELECT o.id, COALESCE(o.status, 'new'), 'Начальная запись при миграции', 'migration', COALESCE(o.updated_at, o.created_at)
+FROM t_p78209571_electric_service_aut.orders o
+WHERE NOT EXISTS (
+    SELECT 1 FROM t_p78209571_electric_service_aut.order_status_history h WHERE h.order_id = o.id
+);
+
+-- previous_* для уже записанных строк
+UPDATE t_p78209571_electric_service_aut.order_status_history h
+SET previous_status = p.previous_status, previous_seconds = p.previous_seconds
+FROM (
+    SELECT id,
+           LAG(status) OVER w AS previous_status,
+           EXTRACT(EPOCH FROM created_at - LAG(created_at) OVER w)::integer AS previous_seconds
+    FROM t_p78209571_electric_service_aut.order_status_history
+    WINDOW w AS (PARTITION BY order_id ORDER BY created_at, id)
+) p
+WHERE p.id = h.id AND p.previous_status IS NOT NULL AND h.previous_status IS NULL;
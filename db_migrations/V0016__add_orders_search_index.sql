@@ -0,0 +1,38 @@
+-- Поиск заявок GET /?q= по имени клиента, телефону и адресу (orders-api/search.py).
+-- Встроенный полнотекстовый поиск без расширений: хранимая колонка search_vector
+-- (вычисляется при записи) и GIN-индекс по ней. Хранимая колонка, а не индекс по выражению:
+-- префиксный поиск перепроверяет каждую строку-кандидата, а ранжирование читает вектор -
+-- с выражением оба раза пересчитывались бы regexp_replace и to_tsvector.
+-- В индекс попадают имя, все цифры телефона и последние 10, 7 и 4 из них, адрес; ё = е.
+
+-- Телефоны к единому виду +79161234567, как теперь пишет orders-api
+UPDATE t_p78209571_electric_service_aut.orders o
+SET customer_phone = n.phone
+FROM (
+    SELECT id,
+           CASE
+               WHEN digits ~ '^8\d{10}$' THEN '+7' || substr(digits, 2)
+               WHEN digits ~ '^9\d{9}$' THEN '+7' || digits
+               WHEN digits ~ '^\d{11,15}$' THEN '+' || digits
+               ELSE customer_phone
+           END AS phone
+    FROM (
+        SELECT id, customer_phone, regexp_replace(COALESCE(customer_phone, ''), '\D', '', 'g') AS digits
+        FROM t_p78209571_electric_service_aut.orders
+    ) AS p
+) AS n
+WHERE n.id = o.id AND n.phone IS DISTINCT FROM o.customer_phone;
+
+ALTER TABLE t_p78209571_electric_service_aut.orders
+    ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('simple', translate(COALESCE(customer_name, ''), 'ёЁ', 'еЕ')), 'A')
+        || setweight(to_tsvector('simple',
+               regexp_replace(COALESCE(customer_phone, ''), '\D', '', 'g')
+               || ' ' || right(regexp_replace(COALESCE(customer_phone, ''), '\D', '', 'g'), 10)
+               || ' ' || right(regexp_replace(COALESCE(customer_phone, ''), '\D', '', 'g'), 7)
+               || ' ' || right(regexp_replace(COALESCE(customer_phone, ''), '\D', '', 'g'), 4)), 'A')
+        || setweight(to_tsvector('simple', translate(COALESCE(address, ''), 'ёЁ', 'еЕ')), 'B')
+    ) STORED;
+
+CREATE INDEX IF NOT EXISTS idx_orders_search
+    ON t_p78209571_electric_service_aut.orders USING GIN (search_vector);
@@ -0,0 +1,15 @@
+-- Письма по шаблону: send-feedback ставит в очередь имя шаблона и переменные,
+-- тему и HTML рендерит воркер send-email ?drain=true - модуль шаблонов живёт в одной функции
+ALTER TABLE t_p78209571_electric_service_aut.email_outbox
+    ADD COLUMN IF NOT EXISTS template VARCHAR(100),
+    ADD COLUMN IF NOT EXISTS variables JSONB;
+
+ALTER TABLE t_p78209571_electric_service_aut.email_outbox ALTER COLUMN subject DROP NOT NULL;
+ALTER TABLE t_p78209571_electric_service_aut.email_outbox ALTER COLUMN html DROP NOT NULL;
+
+ALTER TABLE t_p78209571_electric_service_aut.email_outbox
+    DROP CONSTRAINT IF EXISTS email_outbox_html_or_template;
+ALTER TABLE t_p78209571_electric_service_aut.email_outbox
+    ADD CONSTRAINT email_outbox_html_or_template CHECK (html IS NOT NULL OR template IS NOT NULL);
+
+COMMENT ON COLUMN t_p78209571_electric_service_aut.email_outbox.template IS 'Шаблон email_templates (send-email); subject/html пустые - рендерятся при отправке';
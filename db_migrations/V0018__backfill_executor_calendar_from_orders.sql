@@ -0,0 +1,18 @@
+-- Заявки, назначенные до брони в executor_calendar: исполнитель и время есть только в orders,
+-- поэтому PUT мог занять их слот повторно. Переносим начальный слот каждой такой заявки
+-- в календарь (длительность прежних заявок неизвестна - один слот); занятые строки не трогаем.
+INSERT INTO t_p78209571_electric_service_aut.executor_calendar AS c (executor_id, date, time_slot, is_available, order_id)
+SELECT DISTINCT ON (o.executor_id, o.scheduled_date, to_char(o.scheduled_time, 'HH24:MI'))
+       o.executor_id, o.scheduled_date, to_char(o.scheduled_time, 'HH24:MI'), false, o.id
+FROM t_p78209571_electric_service_aut.orders o
+WHERE o.executor_id IS NOT NULL
+  AND o.scheduled_date IS NOT NULL
+  AND o.scheduled_time IS NOT NULL
+  AND o.status <> 'cancelled'
+  AND NOT EXISTS (
+      SELECT 1 FROM t_p78209571_electric_service_aut.executor_calendar e WHERE e.order_id = o.id
+  )
+ORDER BY o.executor_id, o.scheduled_date, to_char(o.scheduled_time, 'HH24:MI'), o.id
+ON CONFLICT (executor_id, date, time_slot) DO UPDATE
+    SET is_available = false, order_id = EXCLUDED.order_id
+    WHERE c.order_id IS NULL AND c.is_available;
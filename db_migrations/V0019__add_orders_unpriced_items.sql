@@ -0,0 +1,19 @@
+-- Позиции заявки, не найденные в прайсе services (orders-api/pricing.py): их цена взята из
+-- тела заявки, то есть итог заявки по ним назначил клиент. Ненулевое значение - заявку
+-- нужно перепроверить; такие позиции в order_services лежат с service_id = NULL.
+ALTER TABLE t_p78209571_electric_service_aut.orders
+    ADD COLUMN IF NOT EXISTS unpriced_items INTEGER NOT NULL DEFAULT 0;
+
+UPDATE t_p78209571_electric_service_aut.orders o
+SET unpriced_items = s.unpriced
+FROM (
+    SELECT order_id, COUNT(*) AS unpriced
+    FROM t_p78209571_electric_service_aut.order_services
+    WHERE service_id IS NULL
+    GROUP BY order_id
+) s
+WHERE s.order_id = o.id AND o.unpriced_items <> s.unpriced;
+
+CREATE INDEX IF NOT EXISTS idx_orders_unpriced_items
+    ON t_p78209571_electric_service_aut.orders (created_at DESC)
+    WHERE unpriced_items > 0;
@@ -13,7 +13,8 @@ export const createOrderFromCart = (
       : cartItem.product.priceWithWiring,
     quantity: cartItem.quantity,
     category: cartItem.product.category,
-    description: cartItem.product.description
+    description: cartItem.product.description,
+    slots: cartItem.product.slots
   }));
   
   const totalAmount = electricalItems.reduce((sum, item) => sum + (item.price * item.quantity), 0);
@@ -118,29 +118,29 @@ export default function Checkout() {
     });
 
     try {
-      const emailHtml = `
-        <h2>Новая заявка #${order.id.slice(0, 8)}</h2>
-        <p><strong>Клиент:</strong> ${formData.customerName}</p>
-        <p><strong>Телефон:</strong> ${formData.phone}</p>
-        <p><strong>Адрес:</strong> ${formData.address}</p>
-        <p><strong>Дата:</strong> ${formData.date}</p>
-        <p><strong>Время:</strong> ${formData.time}</p>
-        ${formData.comments ? `<p><strong>Комментарии:</strong> ${formData.comments}</p>` : ''}
-        <p><strong>Сумма:</strong> ${finalTotal.toLocaleString('ru-RU')} ₽</p>
-        <hr>
-        <h3>Состав заказа:</h3>
-        <ul>
-          ${cart.map(item => `<li>${item.product.name} x ${item.quantity} - ${calculateItemPrice(item).toLocaleString('ru-RU')} ₽</li>`).join('')}
-        </ul>
-      `;
-      
       await fetch('https://functions.poehali.dev/844c657d-c59c-4e46-a6dc-f58689204e01', {
         method: 'POST',
         headers: { 'Content-Type': 'application/json' },
         body: JSON.stringify({
           to: 'electro.me@yandex.ru',
           subject: `NEW Заявка: ${formData.address}`,
-          html: emailHtml
+          template: 'order-created',
+          variables: {
+            order_number: order.id.slice(0, 8),
+            customer_name: formData.customerName,
+            phone: formData.phone,
+            address: formData.address,
+            date: formData.date,
+            time: formData.time,
+            comments: formData.comments,
+            total_amount: finalTotal,
+            items: cart.map(item => ({
+              name: item.product.name,
+              quantity: item.quantity,
+              total: calculateItemPrice(item)
+            })),
+            status: order.status
+          }
         })
       });
     } catch (error) {
@@ -56,6 +56,7 @@ export interface ElectricalItem {
   quantity: number;
   category?: string;
   description?: string;
+  slots?: number;
   isElectricalWork?: boolean;
 }
 
@@ -0,0 +1,51 @@
+'''
+Business: Общие заготовки pytest для облачных функций из backend/
+Args: TEST_DATABASE_URL - Postgres со всеми миграциями db_migrations (необязательно)
+Returns: Фикстуры function (загрузка модулей функции), call (вызов handler) и database_url
+
+Модули функций называются одинаково (index, core, db...), поэтому перед загрузкой
+другой функции её модули убираются из sys.modules. Тесты с БД пропускаются,
+если TEST_DATABASE_URL не задан; данные они создают с префиксом TEST-PYTEST- и удаляют.
+Запуск: TEST_DATABASE_URL=postgresql://... python -m pytest -q tests
+'''
+
+import importlib
+import json
+import os
+import sys
+import pytest
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backend')
+
+def load_module(function: str, module: str = 'index'):
+    function_dir = os.path.join(BACKEND_DIR, function)
+    for name, loaded in list(sys.modules.items()):
+        if (getattr(loaded, '__file__', None) or '').startswith(BACKEND_DIR + os.sep):
+            del sys.modules[name]
+    sys.path[:] = [path for path in sys.path if not path.startswith(BACKEND_DIR + os.sep)]
+    sys.path.insert(0, function_dir)
+    return importlib.import_module(module)
+
+@pytest.fixture
+def function():
+    '''function('orders-api') -> index.py функции, function('send-email', 'smtp_pool') -> модуль'''
+    return load_module
+
+@pytest.fixture
+def database_url(monkeypatch):
+    url = os.environ.get('TEST_DATABASE_URL')
+    if not url:
+        pytest.skip('TEST_DATABASE_URL is not set')
+    monkeypatch.setenv('DATABASE_URL', url)
+    return url
+
+def call_handler(index, method: str = 'GET', query: dict = None, body=None, headers: dict = None) -> dict:
+    event = {'httpMethod': method, 'queryStringParameters': query or {}, 'headers': headers or {}}
+    if body is not None:
+        event['body'] = body if isinstance(body, str) else json.dumps(body)
+    return index.handler(event, None)
+
+@pytest.fixture
+def call():
+    '''call(index, 'GET', {'id': ...}, body, headers) - событие платформы в handler функции'''
+    return call_handler
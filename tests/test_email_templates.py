@@ -0,0 +1,67 @@
+import json
+import psycopg2
+import pytest
+
+SCHEMA = 't_p78209571_electric_service_aut'
+FEEDBACK_TO = 'test-pytest-feedback@example.com'
+
+@pytest.fixture
+def templates(function):
+    return function('send-email', 'email_templates')
+
+@pytest.mark.parametrize('source, variables, html', [
+    ('{% if a %}{% else %}нет{% endif %}', {}, 'нет'),
+    ('{% if a %}{% else %}нет{% endif %}', {'a': 1}, ''),
+    ('{% if a %}да{% else %}{% endif %}', {}, ''),
+    ('{% if a %}{% endif %}', {'a': 1}, ''),
+    ('[{% for item in items %}{% endfor %}]', {'items': [1, 2]}, '[]'),
+    ('{% for item in items %}{% if item.x %}{% else %}-{% endif %}{% endfor %}', {'items': [{'x': 1}, {}]}, '-'),
+    ('{% if a %}{{ a }}{% else %}<{{ b }}>{% endif %}', {'b': '<i>'}, '<&lt;i&gt;>')
+])
+def test_empty_blocks_render(templates, source, variables, html):
+    assert templates.compile_template(source)(variables) == html
+
+def test_bad_tags_are_template_errors(templates):
+    for source in ('{% else %}', '{% if a %}', '{% endfor %}', '{% if a %}{% endfor %}'):
+        with pytest.raises(templates.TemplateError):
+            templates.compile_template(source)
+
+class Context:
+    request_id = 'test-request'
+
+class RecordingSender:
+    stats = {}
+
+    def __init__(self):
+        self.messages = []
+
+    def send(self, msg):
+        self.messages.append(msg)
+
+@pytest.fixture
+def feedback_outbox(database_url, monkeypatch):
+    monkeypatch.setenv('YANDEX_SMTP_USER', FEEDBACK_TO)
+    monkeypatch.setenv('YANDEX_SMTP_PASSWORD', 'password')
+    monkeypatch.setenv('WORKER_SECRET', 'worker-secret')
+    yield
+    conn = psycopg2.connect(database_url)
+    conn.cursor().execute(f"DELETE FROM {SCHEMA}.email_outbox WHERE to_email = %s", (FEEDBACK_TO,))
+    conn.commit()
+    conn.close()
+
+def test_feedback_is_rendered_by_send_email_drain(feedback_outbox, function, call, monkeypatch):
+    send_feedback = function('send-feedback')
+    event = {'httpMethod': 'POST', 'body': json.dumps({'feedback': 'Идея <b>'})}
+    assert send_feedback.handler(event, Context())['statusCode'] == 200
+
+    send_email = function('send-email')
+    import smtp_pool
+    sender = RecordingSender()
+    monkeypatch.setattr(smtp_pool, 'get_sender', lambda user, password: sender)
+    drained = call(send_email, 'POST', {'drain': 'true', 'limit': '100'}, headers={'X-Worker-Secret': 'worker-secret'})
+    assert drained['statusCode'] == 200, drained['body']
+
+    [msg] = [msg for msg in sender.messages if msg['To'] == FEEDBACK_TO]
+    assert msg['Subject'].startswith('💡 Новая идея от пользователя - ')
+    html = msg.get_payload()[0].get_payload(decode=True).decode('utf-8')
+    assert 'Идея &lt;b&gt;' in html and 'test-request' in html
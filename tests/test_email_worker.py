@@ -0,0 +1,29 @@
+import json
+import pytest
+
+@pytest.fixture
+def send_email(function, monkeypatch):
+    monkeypatch.setenv('DATABASE_URL', 'postgresql://unused')
+    monkeypatch.setenv('YANDEX_SMTP_USER', 'robot@example.com')
+    monkeypatch.setenv('YANDEX_SMTP_PASSWORD', 'password')
+    monkeypatch.setenv('WORKER_SECRET', 'worker-secret')
+    return function('send-email')
+
+@pytest.mark.parametrize('headers, status', [
+    ({}, 401),
+    ({'X-Worker-Secret': 'wrong'}, 401),
+    ({'x-worker-secret': 'ж'}, 401)
+])
+def test_drain_requires_worker_secret(send_email, call, headers, status):
+    assert call(send_email, 'POST', {'drain': 'true'}, headers=headers)['statusCode'] == status
+
+def test_drain_without_configured_secret_is_500(send_email, call, monkeypatch):
+    monkeypatch.delenv('WORKER_SECRET')
+    response = call(send_email, 'POST', {'drain': 'true'}, headers={'X-Worker-Secret': ''})
+    assert (response['statusCode'], json.loads(response['body'])) == (500, {'error': 'WORKER_SECRET not configured'})
+
+@pytest.mark.parametrize('limit', ['0', '-1', '101', 'abc'])
+def test_drain_limit_out_of_range_is_400(send_email, call, limit):
+    # Отказ до обращения к БД и SMTP
+    response = call(send_email, 'POST', {'drain': 'true', 'limit': limit}, headers={'X-Worker-Secret': 'worker-secret'})
+    assert response['statusCode'] == 400
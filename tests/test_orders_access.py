@@ -0,0 +1,80 @@
+import json
+import psycopg2
+import pytest
+
+SCHEMA = 't_p78209571_electric_service_aut'
+TELEGRAM_ID = 990000001
+ORDER_UID = 'TEST-PYTEST-ASSIGN'
+
+@pytest.fixture
+def orders_api(function, monkeypatch):
+    monkeypatch.setenv('SESSION_TOKEN_SECRET', 'test-secret')
+    return function('orders-api')
+
+@pytest.fixture
+def token(orders_api):
+    '''token(uid, role) -> заголовки с токеном сессии'''
+    from session_token import issue_token
+    return lambda uid, role: {'X-Auth-Token': issue_token(uid, role)['token']}
+
+@pytest.mark.parametrize('query, method', [
+    ({'report': 'daily'}, 'GET'),
+    ({'report': 'categories'}, 'GET'),
+    ({'cache': 'stats'}, 'GET'),
+    ({'history': 'true', 'id': ORDER_UID}, 'GET'),
+    ({'assign': 'true', 'id': ORDER_UID}, 'POST')
+])
+def test_privileged_endpoints_require_token(orders_api, token, call, monkeypatch, query, method):
+    monkeypatch.setenv('DATABASE_URL', 'postgresql://unused')
+    assert call(orders_api, method, query)['statusCode'] == 401
+    assert call(orders_api, method, query, headers=token('tg_1', 'client'))['statusCode'] == 403
+
+@pytest.fixture
+def remote_order(database_url):
+    '''Заявка и исполнитель с Telegram-аккаунтом вдали от тестовых исполнителей из миграций'''
+    conn = psycopg2.connect(database_url)
+    cur = conn.cursor()
+    cur.execute(f"INSERT INTO {SCHEMA}.users (name, role, telegram_id) VALUES ('Тест', 'executor', %s) RETURNING id",
+                (TELEGRAM_ID,))
+    user_id = cur.fetchone()[0]
+    cur.execute(f"""
+        INSERT INTO {SCHEMA}.executors (name, user_id, is_active, rating, current_location_lat, current_location_lng)
+        VALUES ('Тестовый мастер', %s, true, 5, 10.0, 10.0) RETURNING id
+    """, (user_id,))
+    executor_id = cur.fetchone()[0]
+    cur.execute(f"""
+        INSERT INTO {SCHEMA}.orders (order_uid, customer_name, customer_phone, address, location_lat, location_lng)
+        VALUES (%s, 'Клиент', '+79990000000', 'ул. Тестовая', 10.01, 10.01)
+    """, (ORDER_UID,))
+    conn.commit()
+    yield executor_id
+    cur.execute(f"DELETE FROM {SCHEMA}.order_status_history WHERE order_id IN "
+                f"(SELECT id FROM {SCHEMA}.orders WHERE order_uid = %s)", (ORDER_UID,))
+    cur.execute(f"DELETE FROM {SCHEMA}.orders WHERE order_uid = %s", (ORDER_UID,))
+    cur.execute(f"DELETE FROM {SCHEMA}.executors WHERE id = %s", (executor_id,))
+    cur.execute(f"DELETE FROM {SCHEMA}.users WHERE id = %s", (user_id,))
+    conn.commit()
+    conn.close()
+
+def test_assigned_order_is_listed_for_executor(orders_api, token, call, remote_order):
+    assigned = call(orders_api, 'POST', {'assign': 'true', 'id': ORDER_UID}, headers=token('tg_1', 'admin'))
+    assert assigned['statusCode'] == 200, assigned['body']
+    executor = json.loads(assigned['body'])['executor']
+    assert (executor['executor_id'], executor['assigned_to']) == (remote_order, f'tg_{TELEGRAM_ID}')
+
+    listed = call(orders_api, 'GET', headers=token(f'tg_{TELEGRAM_ID}', 'executor'))
+    assert listed['statusCode'] == 200
+    assert ORDER_UID in [order['order_uid'] for order in json.loads(listed['body'])]
+
+    other = call(orders_api, 'GET', headers=token('tg_2', 'executor'))
+    assert ORDER_UID not in [order['order_uid'] for order in json.loads(other['body'])]
+
+@pytest.mark.parametrize('query', [
+    {'report': 'daily'},
+    {'report': 'categories'},
+    {'cache': 'stats'},
+    {'history': 'true', 'id': ORDER_UID}
+])
+def test_privileged_endpoints_with_admin_token(orders_api, token, call, remote_order, query):
+    response = call(orders_api, 'GET', query, headers=token('tg_1', 'admin'))
+    assert response['statusCode'] == 200, response['body']
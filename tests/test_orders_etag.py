@@ -0,0 +1,37 @@
+import psycopg2
+import pytest
+
+SCHEMA = 't_p78209571_electric_service_aut'
+
+@pytest.fixture
+def orders(database_url, function):
+    index = function('orders-api')
+    conn = psycopg2.connect(database_url)
+    cur = conn.cursor()
+    cur.execute(f"""
+        INSERT INTO {SCHEMA}.orders (order_uid, customer_name, customer_phone, address, assigned_to)
+        SELECT 'TEST-PYTEST-ETAG-' || i, 'Клиент', '+79990000000', 'ул. Тестовая', 'tg_etag' FROM generate_series(1, 3) AS i
+    """)
+    conn.commit()
+    yield index, conn
+    cur.execute(f"DELETE FROM {SCHEMA}.orders WHERE order_uid LIKE 'TEST-PYTEST-ETAG-%%'")
+    conn.commit()
+    conn.close()
+
+@pytest.mark.parametrize('query', [{'limit': '2'}, {'since': '2000-01-01T00:00:00'}])
+def test_page_etag_comes_from_returned_rows(orders, monkeypatch, query):
+    index, conn = orders
+    # Страница и since= не должны считать max/count по всей выборке
+    monkeypatch.setattr(index, 'list_etag', lambda *args: pytest.fail('list_etag scans the whole filtered set'))
+    query = dict(query, assigned_to='tg_etag')
+
+    first = index.handle_get(conn, query, {})
+    assert first['statusCode'] == 200
+    assert index.handle_get(conn, query, {'If-None-Match': first['headers']['ETag']})['statusCode'] == 304
+
+    cur = conn.cursor()
+    cur.execute(f"UPDATE {SCHEMA}.orders SET status = 'confirmed', updated_at = NOW() WHERE order_uid LIKE 'TEST-PYTEST-ETAG-%%'")
+    conn.commit()
+    changed = index.handle_get(conn, query, {'If-None-Match': first['headers']['ETag']})
+    assert changed['statusCode'] == 200
+    assert changed['headers']['ETag'] != first['headers']['ETag']
@@ -0,0 +1,46 @@
+import base64
+import gzip
+import json
+import psycopg2
+import pytest
+
+SCHEMA = 't_p78209571_electric_service_aut'
+
+@pytest.fixture
+def orders(database_url, function):
+    index = function('orders-api')
+    conn = psycopg2.connect(database_url)
+    cur = conn.cursor()
+    cur.execute(f"""
+        INSERT INTO {SCHEMA}.orders (order_uid, customer_name, customer_phone, address, assigned_to)
+        SELECT 'TEST-PYTEST-EXPORT-' || i, 'Клиент', '+79990000000', 'ул. Тестовая', 'tg_export'
+        FROM generate_series(1, 50) AS i
+    """)
+    conn.commit()
+    yield index, conn
+    cur.execute(f"DELETE FROM {SCHEMA}.orders WHERE order_uid LIKE 'TEST-PYTEST-EXPORT-%%'")
+    conn.commit()
+    conn.close()
+
+QUERY = {'format': 'ndjson', 'assigned_to': 'tg_export', 'fields': 'order_uid,address'}
+
+@pytest.mark.parametrize('headers', [{}, {'Accept-Encoding': 'gzip'}])
+def test_export_within_limit(orders, headers):
+    index, conn = orders
+    response = index.handle_export(conn, QUERY, headers)
+    assert response['statusCode'] == 200
+    body = response['body']
+    if response['isBase64Encoded']:
+        body = gzip.decompress(base64.b64decode(body)).decode('utf-8')
+    assert len(body.splitlines()) == 50
+    assert response['headers']['X-Export-Rows'] == '50'
+
+@pytest.mark.parametrize('headers', [{}, {'Accept-Encoding': 'gzip'}])
+def test_export_over_limit_is_413(orders, monkeypatch, headers):
+    index, conn = orders
+    monkeypatch.setattr(index, 'EXPORT_MAX_BYTES', 100)
+    monkeypatch.setattr(index, 'EXPORT_CHUNK_SIZE', 10)
+    response = index.handle_export(conn, QUERY, headers)
+    assert response['statusCode'] == 413
+    # Выгрузка прерывается на первой порции сверх лимита, а не дочитывает всё
+    assert 'stopped at 10 rows' in json.loads(response['body'])['error']
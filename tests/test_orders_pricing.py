@@ -0,0 +1,81 @@
+import json
+import psycopg2
+import pytest
+
+SCHEMA = 't_p78209571_electric_service_aut'
+OUTLET = {'id': 1, 'name': 'Установка розетки', 'price': 500, 'category': 'outlet'}
+
+@pytest.fixture
+def pricing(function):
+    module = function('orders-api', 'pricing')
+    catalog = module.ServiceCatalog()
+    catalog.by_id = {OUTLET['id']: OUTLET}
+    catalog.by_name = {OUTLET['name'].lower(): OUTLET}
+    return module, catalog
+
+def item(name, price, quantity=2):
+    return {'name': name, 'price': price, 'quantity': quantity, 'category': 'outlet', 'slots': 1}
+
+def test_catalog_price_replaces_client_price(pricing):
+    module, catalog = pricing
+    lines, totals = module.price_items([item('установка розетки ', 0)], catalog)
+    assert (lines[0]['service_id'], str(lines[0]['price'])) == (1, '500.00')
+    assert str(totals['total_price']) == '1000.00'
+    assert totals['unpriced_items'] == []
+
+def test_renamed_item_with_zero_price_is_flagged(pricing):
+    module, catalog = pricing
+    lines, totals = module.price_items([item('Розетка (переименована)', 0), item('Установка розетки', 0, 1)], catalog)
+    # Названия нет в прайсе - цена клиента остаётся, но позиция помечена
+    assert lines[0]['service_id'] is None
+    assert str(totals['total_price']) == '500.00'
+    assert totals['unpriced_items'] == ['Розетка (переименована)']
+
+@pytest.fixture
+def orders_api(database_url, function):
+    index = function('orders-api')
+    yield index
+    conn = psycopg2.connect(database_url)
+    cur = conn.cursor()
+    for table in ('order_status_history', 'order_services'):
+        cur.execute(f"DELETE FROM {SCHEMA}.{table} WHERE order_id IN "
+                    f"(SELECT id FROM {SCHEMA}.orders WHERE order_uid LIKE 'TEST-PYTEST-PRICING-%%')")
+    cur.execute(f"DELETE FROM {SCHEMA}.orders WHERE order_uid LIKE 'TEST-PYTEST-PRICING-%%'")
+    conn.commit()
+    conn.close()
+
+def order(order_uid, items):
+    return {'order_uid': order_uid, 'customer_name': 'Клиент', 'customer_phone': '+79990000000',
+            'address': 'ул. Тестовая', 'items': items}
+
+def stored(database_url, order_uid):
+    conn = psycopg2.connect(database_url)
+    cur = conn.cursor()
+    cur.execute(f"SELECT total_price, unpriced_items FROM {SCHEMA}.orders WHERE order_uid = %s", (order_uid,))
+    row = cur.fetchone()
+    conn.close()
+    return str(row[0]), row[1]
+
+def test_post_flags_order_with_unpriced_items(orders_api, call, database_url, capsys):
+    body = order('TEST-PYTEST-PRICING-1', [item('Розетка (переименована)', 0), item('Установка розетки', 0, 1)])
+    response = call(orders_api, 'POST', {}, body)
+    assert response['statusCode'] == 201
+    assert json.loads(response['body'])['unpriced_items'] == ['Розетка (переименована)']
+    assert stored(database_url, 'TEST-PYTEST-PRICING-1') == ('500.00', 1)
+    assert 'TEST-PYTEST-PRICING-1: 1 items not in services' in capsys.readouterr().out
+
+    response = call(orders_api, 'POST', {}, order('TEST-PYTEST-PRICING-2', [item('Установка розетки', 0)]))
+    assert json.loads(response['body'])['unpriced_items'] == []
+    assert stored(database_url, 'TEST-PYTEST-PRICING-2') == ('1000.00', 0)
+
+def test_batch_reports_unpriced_orders(orders_api, call, database_url):
+    rows = [order('TEST-PYTEST-PRICING-3', [item('Розетка (переименована)', 0)]),
+            order('TEST-PYTEST-PRICING-4', [item('Установка розетки', 0)])]
+    conn = psycopg2.connect(database_url)
+    response = orders_api.handle_batch_post(conn, json.dumps(rows))
+    conn.close()
+    assert response['statusCode'] == 200
+    assert json.loads(response['body'])['unpriced'] == [
+        {'order_uid': 'TEST-PYTEST-PRICING-3', 'items': ['Розетка (переименована)']}
+    ]
+    assert stored(database_url, 'TEST-PYTEST-PRICING-3') == ('0.00', 1)
@@ -0,0 +1,83 @@
+import json
+import psycopg2
+import pytest
+
+SCHEMA = 't_p78209571_electric_service_aut'
+DAY = '2099-03-02'
+
+@pytest.fixture
+def schedule(database_url, function):
+    '''Исполнитель и две заявки TEST-PYTEST-RESERVE-*; удаляются после теста'''
+    index = function('orders-api')
+    conn = psycopg2.connect(database_url)
+    cur = conn.cursor()
+    cur.execute(f"INSERT INTO {SCHEMA}.executors (name, is_active, rating) VALUES ('Тестовый мастер', true, 5) RETURNING id")
+    executor_id = cur.fetchone()[0]
+    cur.execute(f"""
+        INSERT INTO {SCHEMA}.orders (order_uid, customer_name, customer_phone, address)
+        SELECT 'TEST-PYTEST-RESERVE-' || i, 'Клиент', '+79990000000', 'ул. Тестовая' FROM generate_series(1, 2) AS i
+    """)
+    conn.commit()
+    yield index, conn, executor_id
+    cur.execute(f"DELETE FROM {SCHEMA}.executor_calendar WHERE executor_id = %s", (executor_id,))
+    cur.execute(f"DELETE FROM {SCHEMA}.order_status_history WHERE order_id IN "
+                f"(SELECT id FROM {SCHEMA}.orders WHERE order_uid LIKE 'TEST-PYTEST-RESERVE-%%')")
+    cur.execute(f"DELETE FROM {SCHEMA}.orders WHERE order_uid LIKE 'TEST-PYTEST-RESERVE-%%'")
+    cur.execute(f"DELETE FROM {SCHEMA}.executors WHERE id = %s", (executor_id,))
+    conn.commit()
+    conn.close()
+
+def put(call, index, order_uid, body):
+    return call(index, 'PUT', {'id': order_uid}, body)
+
+def calendar(conn, order_uid):
+    cur = conn.cursor()
+    cur.execute(f"""
+        SELECT c.time_slot FROM {SCHEMA}.executor_calendar c JOIN {SCHEMA}.orders o ON o.id = c.order_id
+        WHERE o.order_uid = %s ORDER BY c.time_slot
+    """, (order_uid,))
+    conn.commit()
+    return [row[0] for row in cur.fetchall()]
+
+def test_legacy_scheduled_order_blocks_its_slot(schedule, call):
+    index, conn, executor_id = schedule
+    # Назначена в обход календаря: исполнитель и время есть только в orders
+    cur = conn.cursor()
+    cur.execute(f"""
+        UPDATE {SCHEMA}.orders SET executor_id = %s, scheduled_date = %s, scheduled_time = '10:00'
+        WHERE order_uid = 'TEST-PYTEST-RESERVE-1'
+    """, (executor_id, DAY))
+    conn.commit()
+
+    body = {'executor_id': executor_id, 'scheduled_date': DAY, 'scheduled_time': '09:00', 'duration': 120}
+    response = put(call, index, 'TEST-PYTEST-RESERVE-2', body)
+    assert response['statusCode'] == 409
+    assert json.loads(response['body'])['conflicts'] == ['10:00']
+    assert calendar(conn, 'TEST-PYTEST-RESERVE-2') == []
+
+    body = dict(body, scheduled_time='11:00')
+    assert put(call, index, 'TEST-PYTEST-RESERVE-2', body)['statusCode'] == 200
+    assert calendar(conn, 'TEST-PYTEST-RESERVE-2') == ['11:00', '12:00']
+
+def test_move_without_duration_keeps_length(schedule, call):
+    index, conn, executor_id = schedule
+    body = {'executor_id': executor_id, 'scheduled_date': DAY, 'scheduled_time': '09:00', 'duration': 180}
+    assert put(call, index, 'TEST-PYTEST-RESERVE-1', body)['statusCode'] == 200
+    assert calendar(conn, 'TEST-PYTEST-RESERVE-1') == ['09:00', '10:00', '11:00']
+
+    moved = put(call, index, 'TEST-PYTEST-RESERVE-1', {'scheduled_time': '13:00'})
+    assert moved['statusCode'] == 200, moved['body']
+    assert calendar(conn, 'TEST-PYTEST-RESERVE-1') == ['13:00', '14:00', '15:00']
+
+    # Новой заявке без duration - один слот, как раньше
+    body = {'executor_id': executor_id, 'scheduled_date': DAY, 'scheduled_time': '09:00'}
+    assert put(call, index, 'TEST-PYTEST-RESERVE-2', body)['statusCode'] == 200
+    assert calendar(conn, 'TEST-PYTEST-RESERVE-2') == ['09:00']
+
+@pytest.mark.parametrize('scheduled_date', [20991106, ['2099-11-06'], '06.11.2099'])
+def test_put_with_bad_scheduled_date_is_400(schedule, call, scheduled_date):
+    index, conn, executor_id = schedule
+    body = {'executor_id': executor_id, 'scheduled_date': scheduled_date, 'scheduled_time': '09:00'}
+    response = put(call, index, 'TEST-PYTEST-RESERVE-1', body)
+    assert response['statusCode'] == 400
+    assert json.loads(response['body']) == {'error': 'scheduled_date must be a date in YYYY-MM-DD format'}
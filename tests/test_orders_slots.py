@@ -0,0 +1,24 @@
+import json
+import pytest
+
+@pytest.fixture
+def orders_api(function):
+    return function('orders-api')
+
+@pytest.mark.parametrize('query, error', [
+    ({'executor_id': 'abc'}, 'executor_id must be a comma-separated list of integers'),
+    ({'executor_id': '1,,2'}, 'executor_id must be a comma-separated list of integers'),
+    ({'duration': '1e9'}, 'duration must be an integer'),
+    ({'duration': '-5'}, 'duration must be positive'),
+    ({'limit': 'x'}, 'limit must be an integer'),
+    ({'limit': '0'}, 'limit must be positive')
+])
+def test_bad_slot_params_are_400(orders_api, query, error):
+    # Ошибка разбора возвращается до обращения к БД
+    response = orders_api.handle_slots(None, dict(query, slots='true'))
+    assert response['statusCode'] == 400
+    assert json.loads(response['body']) == {'error': error}
+
+def test_bad_assign_duration_is_400(orders_api):
+    response = orders_api.handle_assign(None, {'id': 'TEST-PYTEST-SLOTS', 'duration': 'abc'})
+    assert (response['statusCode'], json.loads(response['body'])) == (400, {'error': 'duration must be an integer'})
@@ -0,0 +1,138 @@
+import importlib.util
+import json
+import os
+import sys
+import threading
+import psycopg2
+import pytest
+from http.server import ThreadingHTTPServer
+
+SCHEMA = 't_p78209571_electric_service_aut'
+ORDER_UID = 'TEST-PYTEST-PLANFIX'
+STUB_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'bench', 'planfix_stub.py')
+
+def load_stub():
+    spec = importlib.util.spec_from_file_location('planfix_stub', STUB_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+@pytest.fixture
+def stub(monkeypatch):
+    planfix_stub = load_stub()
+    state = planfix_stub.StubState(fail_rate=0.0, latency_ms=0)
+    server = ThreadingHTTPServer(('127.0.0.1', 0), planfix_stub.make_handler(state))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.setenv('PLANFIX_BASE_URL', f'http://127.0.0.1:{server.server_address[1]}')
+    monkeypatch.setenv('PLANFIX_API_KEY', 'key')
+    yield state
+    server.shutdown()
+
+@pytest.fixture
+def queue(database_url, stub, function):
+    '''Строка очереди и заявка ORDER_UID; удаляются после теста'''
+    index = function('planfix')
+    from task_queue import enqueue_task
+    conn = psycopg2.connect(database_url)
+    cur = conn.cursor()
+    cur.execute(f"""
+        INSERT INTO {SCHEMA}.orders (order_uid, customer_name, customer_phone, address)
+        VALUES (%s, 'Клиент', '+79990000000', 'ул. Тестовая')
+    """, (ORDER_UID,))
+    enqueue_task(conn, ORDER_UID, {'name': f'Заявка #{ORDER_UID} - Клиент', 'description': '', 'template': 1})
+    yield index, conn
+    cur.execute(f"DELETE FROM {SCHEMA}.planfix_task_queue WHERE order_id = %s", (ORDER_UID,))
+    cur.execute(f"DELETE FROM {SCHEMA}.orders WHERE order_uid = %s", (ORDER_UID,))
+    conn.commit()
+    conn.close()
+
+def queue_row(conn):
+    cur = conn.cursor()
+    cur.execute(f"SELECT status, planfix_task_id FROM {SCHEMA}.planfix_task_queue WHERE order_id = %s", (ORDER_UID,))
+    row = cur.fetchone()
+    conn.commit()
+    return row
+
+def drain(index, database_url):
+    return json.loads(index.handle_drain(database_url, {'limit': '10'})['body'])
+
+def test_lost_response_does_not_create_duplicate(queue, stub, database_url):
+    index, conn = queue
+    stub.lose_rate = 1.0
+    assert drain(index, database_url)['retry'] == 1
+    # 200 без id - ошибка, а не задача "None"
+    assert queue_row(conn) == ('pending', None)
+
+    stub.lose_rate = 0.0
+    cur = conn.cursor()
+    cur.execute(f"UPDATE {SCHEMA}.planfix_task_queue SET next_attempt_at = NOW() WHERE order_id = %s", (ORDER_UID,))
+    conn.commit()
+    stats = drain(index, database_url)
+
+    assert (stats['done'], stats['found_existing']) == (1, 1)
+    assert queue_row(conn) == ('done', '1')
+    assert stub.next_id - 1 == 1
+    assert sum(count - 1 for count in stub.names.values()) == 0
+
+class SharedEpochs:
+    '''Общее хранилище эпох в памяти, как RedisEpochs'''
+    def __init__(self):
+        self.epochs = {}
+
+    def read(self, order_uid):
+        return self.epochs.get(order_uid, 0)
+
+    def bump(self, order_uids):
+        for order_uid in order_uids:
+            self.epochs[order_uid] = self.epochs.get(order_uid, 0) + 1
+
+def test_mark_done_bumps_version_and_invalidates_order_cache(queue, function, database_url):
+    _, conn = queue
+    shared = SharedEpochs()
+    orders_api = function('orders-api')
+    # Модули одной функции делят order_cache; следующая загрузка их выгрузит, объекты останутся
+    orders_cache = sys.modules['order_cache']
+    orders_cache._cache = orders_cache.OrderCache(shared=shared)
+
+    first = orders_api.handle_get(conn, {'id': ORDER_UID}, {})
+    assert orders_api.handle_get(conn, {'id': ORDER_UID}, {})['headers']['X-Order-Cache'] == 'hit'
+
+    task_queue = function('planfix', 'task_queue')
+    planfix_cache = sys.modules['order_cache']
+    planfix_cache._cache = planfix_cache.OrderCache(shared=shared)
+    task_queue.mark_done(conn, 0, ORDER_UID, '77')
+
+    after = orders_api.handle_get(conn, {'id': ORDER_UID}, {})
+    assert after['headers']['X-Order-Cache'] == 'miss'
+    assert after['headers']['ETag'] != first['headers']['ETag']
+    order = json.loads(after['body'])
+    assert order['planfix_task_id'] == '77'
+    assert order['version'] == json.loads(first['body'])['version'] + 1
+
+@pytest.fixture
+def planfix_worker(function, monkeypatch):
+    monkeypatch.setenv('DATABASE_URL', 'postgresql://unused')
+    monkeypatch.setenv('PLANFIX_API_KEY', 'key')
+    monkeypatch.setenv('PLANFIX_BASE_URL', 'http://127.0.0.1:9')
+    monkeypatch.setenv('WORKER_SECRET', 'worker-secret')
+    return function('planfix')
+
+@pytest.mark.parametrize('headers', [{}, {'X-Worker-Secret': 'wrong'}])
+def test_drain_requires_worker_secret(planfix_worker, call, headers):
+    assert call(planfix_worker, 'POST', {'drain': 'true'}, headers=headers)['statusCode'] == 401
+
+@pytest.mark.parametrize('query', [
+    {'limit': '0'}, {'limit': '-1'}, {'limit': '201'}, {'limit': 'abc'},
+    {'concurrency': '0'}, {'concurrency': '100'}
+])
+def test_drain_params_out_of_range_are_400(planfix_worker, call, query):
+    # Отказ до обращения к БД и Планфиксу
+    response = call(planfix_worker, 'POST', dict(query, drain='true'), headers={'X-Worker-Secret': 'worker-secret'})
+    assert response['statusCode'] == 400
+
+def test_authorized_drain_runs(queue, database_url, call, monkeypatch):
+    index, conn = queue
+    monkeypatch.setenv('WORKER_SECRET', 'worker-secret')
+    response = call(index, 'POST', {'drain': 'true', 'limit': '10'}, headers={'X-Worker-Secret': 'worker-secret'})
+    assert response['statusCode'] == 200, response['body']
+    assert queue_row(conn) == ('done', '1')
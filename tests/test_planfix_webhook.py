@@ -0,0 +1,24 @@
+import pytest
+
+@pytest.fixture
+def planfix(function):
+    return function('planfix')
+
+@pytest.mark.parametrize('value, seconds', [
+    (1762423200, 1762423200.0),
+    ('1762423200', 1762423200.0),
+    (1762423200500, 1762423200.5),
+    ('2025-11-06T10:00:00Z', 1762423200.0),
+    ('2025-11-06T13:00:00+03:00', 1762423200.0),
+    ('2025-11-06 10:00:00', 1762423200.0),
+    ('06-11-2025 10:00', 1762423200.0),
+    (None, None), ('', None), ('вчера', None), (True, None), ('nan', None)
+])
+def test_event_time(planfix, value, seconds):
+    assert planfix.event_time(value) == seconds
+
+def test_events_sort_by_time_then_missing_in_arrival_order(planfix):
+    timestamps = [None, '1762423300', 999999999, '2025-11-06T10:00:00Z', 'мусор', 1762423250000]
+    ordered = sorted(range(len(timestamps)), key=lambda position: planfix.event_order(timestamps[position], position))
+    # 999999999 (2001 год) раньше ISO-даты, хотя как строка '999...' больше '2025...'
+    assert ordered == [2, 3, 5, 1, 0, 4]
@@ -0,0 +1,37 @@
+import pytest
+
+@pytest.fixture(autouse=True)
+def secret(monkeypatch):
+    monkeypatch.setenv('SESSION_TOKEN_SECRET', 'test-secret')
+
+@pytest.mark.parametrize('function_name', ['orders-api', 'planfix', 'telegram-auth'])
+@pytest.mark.parametrize('token', ['v1.b.ж', 'v1.ж.c', 'v1.b.\udcff', 'a.b.ж'])
+def test_non_ascii_token_is_rejected(function, function_name, token):
+    session_token = function(function_name, 'session_token')
+    with pytest.raises(session_token.TokenError):
+        session_token.verify_token(token)
+
+def test_issued_token_verifies(function):
+    session_token = function('orders-api', 'session_token')
+    claims = session_token.verify_token(session_token.issue_token('42', 'executor')['token'])
+    assert (claims['uid'], claims['role']) == ('42', 'executor')
+
+@pytest.mark.parametrize('function_name, method', [('orders-api', 'GET'), ('planfix', 'POST')])
+def test_non_ascii_bearer_header_returns_401(function, call, monkeypatch, function_name, method):
+    monkeypatch.setenv('DATABASE_URL', 'postgresql://unused')
+    monkeypatch.setenv('PLANFIX_API_KEY', 'key')
+    monkeypatch.setenv('PLANFIX_BASE_URL', 'http://127.0.0.1:9')
+    index = function(function_name)
+    response = call(index, method, headers={'Authorization': 'Bearer v1.b.ж'}, body={})
+    assert response['statusCode'] == 401
+
+def test_login_without_secret_fails_before_db_write(function, call, monkeypatch):
+    monkeypatch.delenv('SESSION_TOKEN_SECRET')
+    monkeypatch.setenv('TELEGRAM_BOT_TOKEN', '123:token')
+    monkeypatch.setenv('DATABASE_URL', 'postgresql://unused')
+    index = function('telegram-auth')
+    monkeypatch.setattr(index, 'verify_telegram_auth', lambda *args: index.TelegramUser(42, 'Тест', None, None, None))
+    monkeypatch.setattr(index, 'login_user', lambda *args, **kwargs: pytest.fail('user written without a secret'))
+    response = call(index, 'POST', body={'initData': 'hash=0', 'role': 'client'})
+    assert response['statusCode'] == 500
+    assert 'SESSION_TOKEN_SECRET' in response['body']
@@ -0,0 +1,75 @@
+import smtplib
+import pytest
+from email.message import EmailMessage
+
+class FakeSMTP:
+    '''Сессия SMTP без сети: fail - исключение на первой отправке, after_data - после DATA'''
+    instances = []
+
+    def __init__(self, fail=None, after_data=False):
+        self.fail = fail
+        self.after_data = after_data
+        self.data_started = False
+        self.sent = 0
+        FakeSMTP.instances.append(self)
+
+    def send_message(self, msg):
+        if self.fail is not None:
+            error, self.fail = self.fail, None
+            if self.after_data:
+                self.data_started = True
+            raise error
+        self.sent += 1
+
+    def noop(self):
+        return 250, b'OK'
+
+    def close(self):
+        pass
+
+@pytest.fixture
+def sender(function, monkeypatch):
+    smtp_pool = function('send-email', 'smtp_pool')
+    FakeSMTP.instances = []
+    monkeypatch.setattr(smtp_pool, 'TrackingSMTP', lambda *args, **kwargs: FakeSMTP())
+    return smtp_pool, smtp_pool.SmtpSender('localhost', 25, '', '', use_starttls=False)
+
+def message():
+    msg = EmailMessage()
+    msg['To'] = 'client@example.com'
+    msg.set_content('test')
+    return msg
+
+def test_disconnect_before_data_is_resent_once(sender):
+    smtp_pool, smtp = sender
+    smtp._server = FakeSMTP(fail=smtplib.SMTPServerDisconnected('gone'))
+    smtp._last_used = float('inf')
+
+    smtp.send(message())
+
+    assert [instance.sent for instance in FakeSMTP.instances] == [0, 1]
+    assert smtp.stats['reconnects'] == 1
+
+@pytest.mark.parametrize('code', [550, 552, 451])
+def test_smtp_reply_is_not_resent(sender, code):
+    smtp_pool, smtp = sender
+    refused = smtplib.SMTPDataError(code, b'refused')
+    smtp._server = FakeSMTP(fail=refused, after_data=True)
+    smtp._last_used = float('inf')
+
+    with pytest.raises(smtplib.SMTPDataError):
+        smtp.send(message())
+
+    assert len(FakeSMTP.instances) == 1
+    assert smtp.stats['reconnects'] == 0
+
+def test_disconnect_after_data_is_uncertain(sender):
+    smtp_pool, smtp = sender
+    smtp._server = FakeSMTP(fail=TimeoutError('timed out'), after_data=True)
+    smtp._last_used = float('inf')
+
+    with pytest.raises(smtp_pool.DeliveryUncertain):
+        smtp.send(message())
+
+    assert len(FakeSMTP.instances) == 1
+    assert smtp._server is None